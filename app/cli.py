@@ -0,0 +1,199 @@
+"""
+Motor por lotes sin interfaz gráfica (no importa PyQt5).
+
+Ejemplos:
+    python -m app.cli merge salida.pdf a.pdf b.pdf --quality standard
+    python -m app.cli reorder entrada.pdf salida.pdf --order 3,1-2,10-5 --rotate 3:90
+    python -m app.cli compress entrada.pdf salida.pdf --quality low
+    python -m app.cli compress escaneos.pdf salida.pdf --quality auto
+    python -m app.cli split facturas/ lote.pdf --by bookmarks
+    python -m app.cli split partes/ a.pdf b.pdf --by pages --pages 2 --prefix factura
+    python -m app.cli batch trabajos.json --jobs 4
+
+El archivo de `batch` es una lista JSON (o un trabajo JSON por línea) con
+objetos como:
+    {"command": "merge", "inputs": ["a.pdf", "b.pdf"], "output": "ab.pdf",
+     "quality": "standard", "order": "1-10", "rotate": {"2": 90}}
+En los trabajos `split`, "output" es la carpeta de destino y se admiten
+"by" (pages, bookmarks o source), "pages" y "prefix".
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+QUALITIES = ('high', 'standard', 'low', 'auto')
+
+
+def parse_order(spec, page_count):
+    """Convierte '3,1-2,10-5' (páginas base 1, rangos inversos permitidos) en índices base 0."""
+    if not spec:
+        return list(range(page_count))
+    order = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (int(value) for value in part.split("-", 1))
+            step = 1 if last >= first else -1
+            numbers = range(first, last + step, step)
+        else:
+            numbers = [int(part)]
+        for number in numbers:
+            if not 1 <= number <= page_count:
+                raise ValueError(f"Página fuera de rango: {number} (hay {page_count})")
+            order.append(number - 1)
+    return order
+
+
+def run_job(job, image_workers=None):
+    """Ejecuta un trabajo (merge/reorder/compress/split) y devuelve sus estadísticas."""
+    # Importación diferida: el arranque de la CLI no paga el coste de PyMuPDF
+    from app.model.pdf_manager import PDFModel
+
+    start = time.perf_counter()
+    model = PDFModel(image_workers=image_workers)
+    try:
+        for path in job["inputs"]:
+            model.load_pdf(path)
+        for page, degrees in (job.get("rotate") or {}).items():
+            index = int(page) - 1
+            for _ in range((int(degrees) // 90) % 4):
+                model.rotate_page(index, clockwise=True)
+        order = parse_order(job.get("order"), model.get_page_count())
+        if job.get("command") == "split":
+            groups = model.split_order(order, job.get("by", "pages"), int(job.get("pages", 1)),
+                                       job.get("prefix", "parte"))
+            os.makedirs(job["output"], exist_ok=True)
+            message = model.split_and_save(groups, job["output"], job.get("quality", "standard"))
+        else:
+            message = model.reorder_and_save(order, job["output"], job.get("quality", "standard"))
+    finally:
+        model.clear()
+    return {
+        "output": job["output"],
+        "pages": len(order),
+        "seconds": time.perf_counter() - start,
+        "message": message,
+    }
+
+
+def _job_from_args(args):
+    if args.command in ("merge", "split"):
+        inputs, output = args.inputs, args.output
+    else:
+        inputs, output = [args.input], args.output
+    rotate = {}
+    for item in getattr(args, "rotate", None) or []:
+        page, degrees = item.split(":")
+        rotate[page] = int(degrees)
+    job = {
+        "command": args.command,
+        "inputs": inputs,
+        "output": output,
+        "quality": args.quality,
+        "order": getattr(args, "order", None),
+        "rotate": rotate,
+    }
+    if args.command == "split":
+        job.update({"by": args.by, "pages": args.pages, "prefix": args.prefix})
+    return job
+
+
+def load_jobs(path):
+    """Lee trabajos desde una lista JSON o desde JSON por líneas."""
+    with open(path, encoding="utf-8") as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def run_batch(jobs, workers):
+    """Ejecuta los trabajos en paralelo (un proceso por trabajo) e informa el rendimiento."""
+    start = time.perf_counter()
+    failures = 0
+    total_pages = 0
+    # Dentro de cada trabajo no se crean más procesos: el paralelismo es por trabajo
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {executor.submit(run_job, job, 0): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"ERROR  {job.get('output', '?')}: {e}", file=sys.stderr)
+                continue
+            total_pages += result["pages"]
+            print(f"OK     {result['output']}: {result['pages']} páginas en {result['seconds']:.2f}s")
+
+    elapsed = time.perf_counter() - start
+    done = len(jobs) - failures
+    print(f"\n{done}/{len(jobs)} trabajos en {elapsed:.2f}s "
+          f"({done / elapsed:.2f} trabajos/s, {total_pages / elapsed:.1f} páginas/s)")
+    return 1 if failures else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    merge = commands.add_parser("merge", help="combina varios PDFs")
+    merge.add_argument("output")
+    merge.add_argument("inputs", nargs="+")
+    merge.add_argument("--order", help="orden de páginas (base 1), p. ej. 1-3,7,5")
+
+    reorder = commands.add_parser("reorder", help="reordena/rota las páginas de un PDF")
+    reorder.add_argument("input")
+    reorder.add_argument("output")
+    reorder.add_argument("--order", required=True, help="orden de páginas (base 1), p. ej. 3,1-2,10-5")
+
+    compress = commands.add_parser("compress", help="recomprime un PDF")
+    compress.add_argument("input")
+    compress.add_argument("output")
+
+    split = commands.add_parser("split", help="divide PDFs en varios archivos")
+    split.add_argument("output", help="carpeta de destino")
+    split.add_argument("inputs", nargs="+")
+    split.add_argument("--by", choices=("pages", "bookmarks", "source"), default="pages",
+                       help="cada N páginas, por marcador de primer nivel o por archivo de origen")
+    split.add_argument("--pages", type=int, default=1, help="páginas por archivo (con --by pages)")
+    split.add_argument("--prefix", default="parte", help="nombre de los archivos (con --by pages)")
+    split.add_argument("--order", help="páginas a repartir (base 1), p. ej. 1-3,7,5")
+
+    for command in (merge, reorder, compress, split):
+        command.add_argument("--quality", choices=QUALITIES, default="standard")
+    for command in (merge, reorder, split):
+        command.add_argument("--rotate", action="append", metavar="PÁGINA:GRADOS",
+                             help="rota una página de la entrada (repetible)")
+
+    batch = commands.add_parser("batch", help="ejecuta muchos trabajos en paralelo")
+    batch.add_argument("jobs_file")
+    batch.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="procesos en paralelo")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "batch":
+        return run_batch(load_jobs(args.jobs_file), args.jobs)
+
+    try:
+        result = run_job(_job_from_args(args))
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{result['message']}: {result['output']} ({result['pages']} páginas, {result['seconds']:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
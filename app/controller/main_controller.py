@@ -1,15 +1,56 @@
-from PyQt5.QtCore import Qt
+import os
+from bisect import bisect_right
+from PyQt5.QtCore import Qt, QSettings, QTimer, QThread
 from PyQt5.QtWidgets import QApplication
 # Importamos los workers
-from .workers import PDFLoaderThread, PDFSaverThread
+from .workers import (PDFLoaderThread, PDFSaverThread, PDFSplitThread, ThumbnailRenderThread, DuplicateScanThread,
+                      TextIndexThread, CompressionAnalysisThread)
+from app.model.thumbnail_cache import ThumbnailCache, DEFAULT_MAX_BYTES
+from app.model.memory import MemoryBudget, DEFAULT_BUDGET_MB, process_memory
+from app.model.metrics import metrics
+from app.model.render import scale_for_height
+from app.model.project import default_session_path
+from app.model.history import History, Operation
+
+# Alto por defecto de las miniaturas (px)
+DEFAULT_ZOOM = 180
+
+
+def _pages_text(count):
+    return "1 página" if count == 1 else f"{count} páginas"
+
 
 class MainController:
-    def __init__(self):
+    def __init__(self, render_workers=None):
         self.model = None
+        # Procesos para renderizar miniaturas (None = núcleos - 1, 0 = sin pool)
+        self.render_workers = render_workers
         self.view = None
         # Referencias a los hilos para evitar que el recolector de basura los elimine
         self.loader_thread = None
+        # Carga en cola: clave de cada archivo -> claves de sus marcadores en la vista
+        self._next_load_key = 0
+        self._loading = False
+        self._reserved = {}
+        self._load_progress = {'files': 0, 'files_done': 0, 'pages': 0, 'pages_done': 0}
+        self._load_errors = []
         self.saver_thread = None
+        self.analysis_thread = None
+        self.thumbnail_thread = None
+        self.duplicate_thread = None
+        self.text_thread = None
+        # Búsqueda de texto activa y filas que coinciden (en orden); None si no hay búsqueda
+        self._search_query = ""
+        self._search_rows = None
+        # Atlas de miniaturas del proyecto abierto (ver ProjectAtlas)
+        self.project_atlas = None
+        # Deshacer/rehacer: registro de operaciones sobre la lista de páginas
+        self.history = History()
+        # Preferencias persistentes del usuario (carpeta de caché, etc.)
+        self.settings = QSettings("PDFMaster", "PDFMasterApp")
+        self.thumbnail_cache = None
+        self.memory_budget = None
+        self.memory_timer = None
 
     def set_model(self, model):
         self.model = model
@@ -17,6 +58,97 @@ class MainController:
     def set_view(self, view):
         self.view = view
 
+        # Renderizador perezoso: la vista pide solo las miniaturas visibles
+        self.thumbnail_cache = self._create_thumbnail_cache()
+        self.thumbnail_thread = ThumbnailRenderThread(self.model, workers=self.render_workers,
+                                                      cache=self.thumbnail_cache)
+        self.thumbnail_thread.thumbnail_ready.connect(self.view.pages_list.set_thumbnail)
+        self.view.pages_list.thumbnailsRequested.connect(self.thumbnail_thread.request)
+        self.thumbnail_thread.start()
+
+        # Zoom guardado (setValue no avisa si no cambia, por eso se aplica a mano)
+        zoom = int(self.settings.value("view/zoom", DEFAULT_ZOOM))
+        self.view.slider_zoom.setValue(zoom)
+        self.handle_zoom(self.view.slider_zoom.value())
+
+        # Presupuesto de memoria y su indicador en la barra de estado
+        self._apply_memory_budget()
+        self.memory_timer = QTimer()
+        self.memory_timer.setInterval(2000)
+        self.memory_timer.timeout.connect(self.update_memory_status)
+        self.memory_timer.start()
+        self.update_memory_status()
+
+    def _apply_memory_budget(self):
+        budget_mb = int(self.settings.value("memory/budget_mb", DEFAULT_BUDGET_MB))
+        self.memory_budget = MemoryBudget.from_mb(budget_mb)
+        self.view.pages_list.set_pixmap_budget(self.memory_budget.thumbnail_bytes)
+        self.model.set_memory_limits(self.memory_budget.store_bytes)
+        self.thumbnail_thread.store_limit = self.memory_budget.render_process_bytes(self.thumbnail_thread.pool.workers)
+
+    def update_memory_status(self):
+        """Refresca el uso de memoria mostrado en la barra de estado."""
+        self.model.trim_memory()
+        process_bytes = process_memory()
+        thumbnail_bytes = self.view.pages_list.pixmap_bytes()
+        self.view.show_memory_usage(thumbnail_bytes, self.model.get_open_source_count(),
+                                    process_bytes, self.memory_budget.total_bytes)
+        # Los medidores guardan el máximo: sirven como memoria pico
+        metrics.gauge("memoria.miniaturas", thumbnail_bytes)
+        if process_bytes is not None:
+            metrics.gauge("memoria.proceso", process_bytes)
+        self.update_debug_panel()
+
+    def update_debug_panel(self):
+        if self.view.debug_panel.isVisible():
+            self.view.debug_panel.show_snapshot(metrics.snapshot())
+
+    def handle_export_trace(self):
+        path = self.view.show_trace_dialog()
+        if not path:
+            return
+        try:
+            count = metrics.export_chrome_trace(path)
+        except OSError as e:
+            self.view.show_message("Error", f"No se pudo exportar la traza: {e}", "error")
+            return
+        self.view.show_message("Traza exportada", f"{count} eventos guardados en {path}\n"
+                               "Se puede abrir en chrome://tracing o en ui.perfetto.dev.")
+
+    def handle_reset_metrics(self):
+        metrics.reset()
+        self.update_debug_panel()
+
+    def _create_thumbnail_cache(self):
+        directory = self.settings.value("thumbnail_cache/dir", "") or None
+        max_mb = int(self.settings.value("thumbnail_cache/max_mb", DEFAULT_MAX_BYTES // (1024 * 1024)))
+        try:
+            return ThumbnailCache(directory, max_bytes=max_mb * 1024 * 1024)
+        except OSError as e:
+            # Sin caché la aplicación sigue funcionando, solo rasteriza siempre
+            print(f"No se pudo crear la caché de miniaturas: {e}")
+            return None
+
+    def shutdown(self):
+        """Guarda la sesión y detiene los hilos en segundo plano al cerrar la ventana."""
+        self._save_session()
+        if self.memory_timer:
+            self.memory_timer.stop()
+        if self.loader_thread and self.loader_thread.isRunning():
+            self.loader_thread.stop()
+            self.loader_thread.wait()
+        self._stop_duplicate_scan()
+        self._stop_text_index()
+        if self.analysis_thread and self.analysis_thread.isRunning():
+            self.analysis_thread.cancel()
+            self.analysis_thread.wait()
+        if self.thumbnail_thread:
+            self.thumbnail_thread.stop()
+            self.thumbnail_thread.wait()
+        if self.saver_thread and self.saver_thread.isRunning():
+            # Un guardado en curso se termina: cancelar aquí perdería el trabajo del usuario
+            self.saver_thread.wait()
+
     # --- CARGA DE ARCHIVOS ---
     def handle_add_pdf(self):
         files = self.view.show_file_dialog()
@@ -29,51 +161,142 @@ class MainController:
             self.add_files_by_paths(pdf_files)
 
     def add_files_by_paths(self, file_list):
-        """Inicia la carga en segundo plano."""
+        """Encola los archivos para cargarlos en segundo plano.
+
+        Si ya hay una carga en curso los archivos se suman a su cola; si no,
+        se inicia un hilo de carga nuevo.
+        """
+        entries = []
+        for file_path in file_list:
+            entries.append((self._next_load_key, file_path))
+            self._next_load_key += 1
+
+        if self.loader_thread and self.loader_thread.isRunning() and self.loader_thread.enqueue(entries):
+            self._load_progress['files'] += len(entries)
+            self._update_load_status()
+            return
+
         # Feedback visual: Cursor de espera
         QApplication.setOverrideCursor(Qt.WaitCursor)
-        
-        # Evitamos solapamiento de hilos de carga
-        if self.loader_thread and self.loader_thread.isRunning():
-            self.view.show_message("Ocupado", "Espere a que termine la carga actual.")
-            QApplication.restoreOverrideCursor()
-            return
+        if self._loading:
+            # El hilo anterior está terminando: sus últimos avisos cuentan en el mismo progreso
+            self._load_progress['files'] += len(entries)
+        else:
+            self._load_progress = {'files': len(entries), 'files_done': 0, 'pages': 0, 'pages_done': 0}
 
-        # Configuramos e iniciamos el hilo
-        self.loader_thread = PDFLoaderThread(file_list)
+        # Configuramos e iniciamos el hilo; el pre-escaneo usa el pool de las miniaturas
+        loader_thread = PDFLoaderThread(self.model, entries, pool=self.thumbnail_thread.pool)
+        self.loader_thread = loader_thread
+        self.loader_thread.scanned.connect(self.on_files_scanned)
         self.loader_thread.file_processed.connect(self.on_file_processed)
-        self.loader_thread.finished_all.connect(self.on_loading_finished)
-        self.loader_thread.error_occurred.connect(lambda err: self.view.show_message("Error", err, "error"))
-        
+        self.loader_thread.finished_all.connect(lambda: self.on_loading_finished(loader_thread))
+        self.loader_thread.error_occurred.connect(self.on_file_failed)
+
+        self._loading = True
         self.loader_thread.start()
+        self._update_load_status()
 
-    def on_file_processed(self, file_path, pages_data):
-        """Se llama cuando un archivo ha sido procesado por el hilo."""
+    def on_files_scanned(self, scanned):
+        """Reserva los marcadores de cada archivo según el pre-escaneo."""
+        for key, info in scanned:
+            if info['error']:
+                continue
+            self._reserved[key] = self.view.pages_list.reserve_pages(info['pages'])
+            self._load_progress['pages'] += info['pages']
+        self._update_load_status()
+
+    def on_file_processed(self, key, file_path, start_index, page_count):
+        """Se llama cuando un archivo ya fue fusionado en el modelo por el hilo."""
+        keys = self._reserved.pop(key, None)
+        if keys is None:
+            # La lista se vació mientras se cargaba este archivo
+            return
         try:
-            # Actualizamos modelo lógico
-            self.model.load_pdf(file_path)
-            
-            # Actualizamos vista
-            import os
-            filename = os.path.basename(file_path)
-            # Calculamos dónde empiezan las nuevas páginas
-            start_index = self.model.get_page_count() - len(pages_data)
-            
-            for i, (img_bytes, page_num) in enumerate(pages_data):
-                # Lógica de etiqueta (Label)
-                label = f"{filename}\nPág {page_num}"
-                if len(filename) > 15:
-                    label = f"{filename[:12]}...\nPág {page_num}"
-                
-                # Agregamos a la lista visual
-                self.view.pages_list.add_pdf_page(img_bytes, label, start_index + i)
-                
+            # Rellenamos los marcadores; las miniaturas llegan al hacerse visibles
+            with metrics.span("carga.vista", paginas=page_count):
+                indices = list(range(start_index, start_index + page_count))
+                records = [(None, self.model.get_page_label(index), index) for index in indices]
+                rows = self.view.pages_list.fill_reserved_pages(keys, records)
+            pages = self.model.get_pages(indices)
+            self._record(Operation('insertar', rows, f"cargar {os.path.basename(file_path)}",
+                                   indices=indices, pages=pages))
+            # El texto se indexa en segundo plano mientras siguen cargándose los demás archivos
+            if pages:
+                self._index_sources([pages[0][0]])
         except Exception as e:
             print(f"Error actualizando UI: {e}")
+        self._load_progress['files_done'] += 1
+        self._load_progress['pages_done'] += page_count
+        self._update_load_status()
+
+    def on_file_failed(self, key, message):
+        keys = self._reserved.pop(key, None)
+        if keys:
+            self.view.pages_list.release_reserved_pages(keys)
+        self._load_errors.append(message)
+        self._load_progress['files_done'] += 1
+        self._update_load_status()
 
-    def on_loading_finished(self):
+    def _update_load_status(self):
+        progress = self._load_progress
+        self.view.show_status(f"Cargando archivos {progress['files_done']}/{progress['files']}"
+                              f" · páginas {progress['pages_done']}/{progress['pages']}")
+
+    def on_loading_finished(self, loader_thread):
         QApplication.restoreOverrideCursor()
-        self.view.show_message("Completado", "Carga de archivos finalizada.", "info")
+        if loader_thread is not self.loader_thread:
+            # Un hilo anterior terminó después de que se iniciara otra carga:
+            # el estado (marcadores, errores) pertenece ahora al hilo nuevo
+            return
+        self._loading = False
+        self.view.show_status("")
+        # Marcadores de archivos que no se llegaron a cargar (carga detenida)
+        for keys in self._reserved.values():
+            self.view.pages_list.release_reserved_pages(keys)
+        self._reserved = {}
+        errors, self._load_errors = self._load_errors, []
+        if not loader_thread.is_running:
+            # Carga detenida (p. ej. al limpiar la lista)
+            return
+        if errors:
+            shown = "\n".join(errors[:10])
+            if len(errors) > 10:
+                shown += f"\n... y {len(errors) - 10} más"
+            self.view.show_message("Error", shown, "error")
+        else:
+            self.view.show_message("Completado", "Carga de archivos finalizada.", "info")
+
+    # --- CACHÉ DE MINIATURAS ---
+    def handle_choose_cache_dir(self):
+        current = self.thumbnail_cache.directory if self.thumbnail_cache else ""
+        directory = self.view.show_directory_dialog("Carpeta de caché de miniaturas", current)
+        if not directory:
+            return
+        self.settings.setValue("thumbnail_cache/dir", directory)
+        self.thumbnail_cache = self._create_thumbnail_cache()
+        self.thumbnail_thread.set_cache(self.thumbnail_cache)
+
+    def handle_zoom(self, icon_height):
+        """Cambia el alto de las miniaturas; la escala de render sigue al zoom y a la densidad de la pantalla."""
+        self.settings.setValue("view/zoom", icon_height)
+        scale = scale_for_height(icon_height * self.view.devicePixelRatioF())
+        self.view.pages_list.set_zoom(icon_height, scale)
+
+    def handle_memory_budget(self):
+        current = self.memory_budget.total_bytes // (1024 * 1024)
+        budget_mb = self.view.ask_integer("Presupuesto de memoria",
+                                          "Memoria máxima para miniaturas y documentos (MB):",
+                                          current, 128, 65536)
+        if budget_mb is None:
+            return
+        self.settings.setValue("memory/budget_mb", budget_mb)
+        self._apply_memory_budget()
+        self.update_memory_status()
+
+    def handle_clear_cache(self):
+        if self.thumbnail_cache:
+            self.thumbnail_cache.clear()
+        self.view.show_message("Caché", "Se vació la caché de miniaturas.")
 
     # --- EDICIÓN ---
     def handle_rotate_left(self):
@@ -84,40 +307,431 @@ class MainController:
 
     def _rotate_selected_pages(self, clockwise):
         list_widget = self.view.pages_list
-        selected_items = list_widget.selectedItems()
-        if not selected_items: return
+        selected_rows = list_widget.selected_rows()
+        if not selected_rows: return
 
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        for item in selected_items:
-            original_index = item.data(Qt.UserRole + 1)
-            self.model.rotate_page(original_index, clockwise)
-            # Obtenemos la nueva imagen rotada (usará la optimización 0.3 del modelo)
-            new_img = self.model.get_page_image(original_index)
-            
-            current_row = list_widget.row(item)
-            list_widget.update_item_image_data(current_row, new_img)
-        QApplication.restoreOverrideCursor()
+        self._rotate_rows(selected_rows, clockwise)
+        self._record(Operation('rotar', selected_rows, f"girar {_pages_text(len(selected_rows))}",
+                               clockwise=clockwise))
+
+    def _rotate_rows(self, rows, clockwise):
+        # Una sola operación sobre el modelo; las miniaturas se giran en la
+        # vista a partir de sus píxeles, sin volver a rasterizar
+        list_widget = self.view.pages_list
+        with metrics.span("accion.rotar", paginas=len(rows)):
+            indices = [list_widget.get_original_index(row) for row in rows]
+            self.model.rotate_pages(indices, clockwise)
+            list_widget.rotate_pages(rows, clockwise)
 
     def handle_delete_page(self):
-        indices_to_delete = self.view.get_selected_indices()
-        if not indices_to_delete: return
+        self._delete_rows(self.view.pages_list.selected_rows())
+
+    def _delete_rows(self, rows, label=None):
+        if self._loading:
+            # Los archivos que aún no llegaron a la vista traen índices del
+            # modelo calculados antes de este borrado. Mover no cambia esos
+            # índices: solo reordena la vista.
+            self.view.show_status("Espere a que termine la carga de archivos para borrar páginas.")
+            return
+        list_widget = self.view.pages_list
+        # Los marcadores de páginas aún no cargadas no se borran
+        rows = [row for row in sorted(set(rows)) if list_widget.get_original_index(row) >= 0]
+        if not rows: return
 
-        for idx in indices_to_delete:
-            self.model.delete_page(idx)
-        self._refresh_preview()
+        indices = [list_widget.get_original_index(row) for row in rows]
+        # Para deshacer basta con las entradas del modelo: las miniaturas
+        # vuelven desde la caché al reinsertar
+        operation = Operation('borrar', rows, label or f"borrar {_pages_text(len(rows))}",
+                              indices=indices, pages=self.model.get_pages(indices))
+        self._remove_rows(rows, indices)
+        self._record(operation)
+
+    def _remove_rows(self, rows, indices):
+        # Borrado incremental: solo se quitan las filas afectadas y el resto
+        # conserva su orden y sus miniaturas
+        with metrics.span("accion.borrar", paginas=len(rows)):
+            self.model.delete_pages(indices)
+            self.view.pages_list.remove_pages(rows, indices)
+
+    def _insert_rows(self, rows, indices, pages):
+        with metrics.span("accion.insertar", paginas=len(rows)):
+            self.model.insert_pages(indices, pages)
+            records = [(None, self.model.get_page_label(index), index) for index in indices]
+            self.view.pages_list.restore_pages(rows, records, indices)
+
+    def on_pages_moved(self, rows, target, position):
+        """La vista reordenó páginas arrastrándolas."""
+        if rows != list(range(position, position + len(rows))):
+            self._record(Operation('mover', rows, f"mover {_pages_text(len(rows))}",
+                                   target=target, position=position))
 
     def handle_clear(self):
-        import fitz
-        self.model.current_doc = fitz.open()
-        self.model.page_mapping = [] 
+        """Vacía la lista. Sin una carga en curso se puede deshacer como un borrado más."""
+        if self._loading:
+            self._reset_workspace()
+            return
+        self._stop_duplicate_scan()
+        self._delete_rows(range(self.view.pages_list.count()), "limpiar la lista")
+
+    def _reset_workspace(self):
+        """Descarta todo el espacio de trabajo, incluida la carga en curso y el historial."""
+        # Se detiene la carga en curso: sus archivos pendientes se descartan
+        if self.loader_thread and self.loader_thread.isRunning():
+            self.loader_thread.stop()
+            self.loader_thread.wait()
+        self._stop_duplicate_scan()
+        self._stop_text_index()
+        self._reserved = {}
+        self._release_project_atlas()
+        self.model.clear()
         self.view.pages_list.clear()
+        self._clear_history()
+
+    # --- DESHACER / REHACER ---
+    def handle_undo(self):
+        self._step_history(undo=True)
+
+    def handle_redo(self):
+        self._step_history(undo=False)
+
+    def _step_history(self, undo):
+        if self._loading:
+            # Los marcadores de la carga ocupan filas que el historial no conoce
+            self.view.show_status("Espere a que termine la carga de archivos para deshacer.")
+            return
+        operation = self.history.undo() if undo else self.history.redo()
+        if operation is None:
+            return
+        self._stop_duplicate_scan()
+        self.view.pages_list.mark_pages({})
+        self._apply(operation, forward=not undo)
+        self._update_history_actions()
+        self._refresh_search()
+        self.view.show_status(f"{'Deshecho' if undo else 'Rehecho'}: {operation.label}")
+
+    def _apply(self, operation, forward):
+        """Aplica una operación del historial (forward=False la deshace) y selecciona sus filas."""
+        list_widget = self.view.pages_list
+        kind = operation.kind
+        rows = operation.rows
+        if kind == 'rotar':
+            self._rotate_rows(rows, operation.clockwise == forward)
+        elif kind == 'mover':
+            if forward:
+                list_widget.move_pages(rows, operation.target)
+                rows = range(operation.position, operation.position + len(rows))
+            else:
+                list_widget.unmove_pages(operation.position, rows)
+        elif (kind == 'borrar') == forward:
+            self._remove_rows(rows, operation.indices)
+            rows = []
+        else:
+            self._insert_rows(rows, operation.indices, operation.pages)
+        list_widget.select_rows(rows)
+
+    def _record(self, operation):
+        self.history.record(operation)
+        self._update_history_actions()
+
+    def _clear_history(self):
+        self.history.clear()
+        self._update_history_actions()
+
+    def _update_history_actions(self):
+        undo, redo = self.history.peek_undo(), self.history.peek_redo()
+        self.view.set_history_actions(undo.label if undo else None, redo.label if redo else None)
+
+    # --- PROYECTOS ---
+    def handle_open_project(self):
+        path = self.view.show_project_open_dialog()
+        if path:
+            self.open_project(path)
+
+    def handle_restore_session(self):
+        path = default_session_path()
+        if not os.path.exists(path):
+            self.view.show_message("Aviso", "No hay ninguna sesión guardada.")
+            return
+        self.open_project(path)
+
+    def open_project(self, path):
+        """Reemplaza el espacio de trabajo por un proyecto; las miniaturas salen de su atlas."""
+        self._reset_workspace()
+        try:
+            atlas, warnings = self.model.load_project(path)
+        except (OSError, ValueError, KeyError) as e:
+            self.view.show_message("Error", f"No se pudo abrir el proyecto: {e}", "error")
+            return
+        self.project_atlas = atlas
+        self.thumbnail_thread.set_atlas(atlas)
+        with metrics.span("carga.vista", paginas=self.model.get_page_count()):
+            records = [(None, self.model.get_page_label(index), index)
+                       for index in range(self.model.get_page_count())]
+            self.view.pages_list.add_pdf_pages(records)
+        self._index_sources(self.model.get_source_ids())
+        if warnings:
+            self.view.show_message("Proyecto abierto con avisos", "\n".join(warnings[:10]))
+
+    def handle_save_project(self):
+        if self._loading:
+            self.view.show_message("Aviso", "Espere a que termine la carga de archivos.")
+            return
+        if self.model.get_page_count() == 0:
+            self.view.show_message("Aviso", "No hay páginas para guardar.")
+            return
+        path = self.view.show_project_save_dialog()
+        if not path:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self._write_project(path)
+        except OSError as e:
+            self.view.show_message("Error", f"No se pudo guardar el proyecto: {e}", "error")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.view.show_status(f"Proyecto guardado en {path}")
+
+    def _write_project(self, path):
+        if self.project_atlas and os.path.abspath(self.project_atlas.path) == os.path.abspath(path):
+            # El atlas mapea el archivo que se va a reemplazar (en Windows no se podría)
+            self._release_project_atlas()
+        self.model.save_project(path, self.view.get_current_order(), self.view.pages_list.get_thumbnails())
 
-    def _refresh_preview(self):
-        count = self.model.get_page_count()
-        pages_data = []
-        for i in range(count):
-            pages_data.append((self.model.get_page_image(i), self.model.get_page_label(i)))
-        self.view.update_pages_view(pages_data)
+    def _save_session(self):
+        """Guarda el espacio de trabajo al cerrar para poder restaurarlo después."""
+        if self.model is None or self.model.get_page_count() == 0 or self._loading:
+            return
+        path = default_session_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_project(path)
+        except OSError as e:
+            print(f"No se pudo guardar la sesión: {e}")
+
+    def _release_project_atlas(self):
+        if self.project_atlas:
+            self.thumbnail_thread.set_atlas(None)
+            self.project_atlas.close()
+            self.project_atlas = None
+
+    # --- BÚSQUEDA DE TEXTO ---
+    def _index_sources(self, source_ids):
+        """Encola fuentes para el índice de texto (segundo plano, baja prioridad)."""
+        if self.text_thread and self.text_thread.isRunning() and self.text_thread.enqueue(source_ids):
+            return
+        text_thread = TextIndexThread(self.model, source_ids)
+        self.text_thread = text_thread
+        text_thread.progress.connect(lambda done, total: self.on_text_indexed(text_thread, done, total))
+        text_thread.start(QThread.LowPriority)
+
+    def _stop_text_index(self):
+        if self.text_thread and self.text_thread.isRunning():
+            self.text_thread.stop()
+            self.text_thread.wait()
+
+    def on_text_indexed(self, text_thread, done, total):
+        if text_thread is not self.text_thread:
+            # Aviso atrasado de un índice ya descartado
+            return
+        if not self._loading:
+            self.view.show_status(f"Indexando texto: {done}/{total} páginas" if done < total else "")
+        # Las páginas recién indexadas pueden coincidir con la búsqueda activa
+        self._refresh_search()
+
+    def handle_search(self, text):
+        """Resalta las páginas que contienen el texto y salta a la primera."""
+        self._search_query = text.strip()
+        self._refresh_search()
+        if self._search_rows:
+            self.view.pages_list.select_rows(self._search_rows[:1])
+            self.view.show_search_result(f"1 de {len(self._search_rows)}")
+
+    def handle_search_next(self):
+        """Salta a la siguiente página que coincide, a partir de la selección actual."""
+        self._refresh_search()
+        rows = self._search_rows
+        if not rows:
+            return
+        selected = self.view.pages_list.selected_rows()
+        position = bisect_right(rows, selected[0] if selected else -1) % len(rows)
+        self.view.pages_list.select_rows([rows[position]])
+        self.view.show_search_result(f"{position + 1} de {len(rows)}")
+
+    def _refresh_search(self):
+        """Vuelve a resolver la búsqueda activa sobre las filas actuales."""
+        if not self._search_query and self._search_rows is None:
+            return
+        list_widget = self.view.pages_list
+        indices = self.model.search_text(self._search_query) if self._search_query else None
+        if indices is None:
+            self._search_rows = None
+            list_widget.highlight_rows([])
+            self.view.show_search_result("")
+            return
+        rows = list_widget.rows_by_original_index()
+        self._search_rows = sorted(rows[index] for index in indices if index in rows)
+        list_widget.highlight_rows(self._search_rows)
+        count = len(self._search_rows)
+        self.view.show_search_result("Sin resultados" if not count else
+                                     "1 página" if count == 1 else f"{count} páginas")
+
+    # --- DUPLICADOS ---
+    def handle_find_duplicates(self):
+        """Busca páginas y archivos repetidos; ofrece quitar las páginas idénticas."""
+        if self._loading:
+            self.view.show_message("Aviso", "Espere a que termine la carga de archivos.")
+            return
+        if self.duplicate_thread and self.duplicate_thread.isRunning():
+            self.view.show_message("Aviso", "Ya se están buscando duplicados.")
+            return
+        order = self.view.get_current_order()
+        if not order:
+            self.view.show_message("Aviso", "No hay páginas cargadas.")
+            return
+
+        QApplication.setOverrideCursor(Qt.BusyCursor)
+        self.view.pages_list.mark_pages({})
+        self.view.show_status("Buscando duplicados...")
+        # Las firmas visuales se calculan en el pool de las miniaturas
+        self.duplicate_thread = DuplicateScanThread(self.model, order, pool=self.thumbnail_thread.pool)
+        self.duplicate_thread.progress.connect(
+            lambda done, total: self.view.show_status(f"Buscando duplicados: {done}/{total} páginas"))
+        self.duplicate_thread.finished_scan.connect(
+            lambda pages, files: self.on_duplicates_found(order, pages, files))
+        self.duplicate_thread.error_occurred.connect(
+            lambda err: self.view.show_message("Error", f"No se pudieron buscar duplicados: {err}", "error"))
+        self.duplicate_thread.finished.connect(self.on_duplicate_scan_finished)
+        self.duplicate_thread.start()
+
+    def on_duplicate_scan_finished(self):
+        QApplication.restoreOverrideCursor()
+        self.view.show_status("")
+
+    def _stop_duplicate_scan(self):
+        if self.duplicate_thread and self.duplicate_thread.isRunning():
+            self.duplicate_thread.cancel()
+            self.duplicate_thread.wait()
+
+    def on_duplicates_found(self, order, duplicates, duplicate_files):
+        list_widget = self.view.pages_list
+        if self.view.get_current_order() != order:
+            self.view.show_message("Aviso", "La lista cambió durante la búsqueda. Vuelva a buscar duplicados.")
+            return
+        if not duplicates and not duplicate_files:
+            self.view.show_message("Duplicados", "No se encontraron páginas repetidas.")
+            return
+
+        rows = list_widget.rows_by_original_index()
+        notes = {}
+        identical_rows = []
+        for index, original_index, kind in duplicates:
+            original = self.model.get_page_label(original_index).replace("\n", ", ")
+            if kind == 'identica':
+                notes[rows[index]] = f"Idéntica a {original}"
+                identical_rows.append(rows[index])
+            else:
+                notes[rows[index]] = f"Parecida a {original}"
+        list_widget.mark_pages(notes)
+
+        summary = (f"Páginas idénticas: {len(identical_rows)}\n"
+                   f"Páginas parecidas: {len(duplicates) - len(identical_rows)}")
+        if duplicate_files:
+            summary += "\n\nArchivos repetidos:\n" + "\n".join(f"{name} (= {original})"
+                                                               for name, original in duplicate_files[:10])
+            if len(duplicate_files) > 10:
+                summary += f"\n... y {len(duplicate_files) - 10} más"
+
+        if identical_rows and self.view.ask_confirmation(
+                "Páginas duplicadas", f"{summary}\n\n¿Quitar las {len(identical_rows)} páginas idénticas?\n"
+                "Las parecidas quedan marcadas en naranja para revisarlas."):
+            self._delete_rows(identical_rows)
+            return
+        list_widget.select_rows(notes)
+        self.view.show_message("Duplicados", f"{summary}\n\nLas páginas repetidas quedan marcadas "
+                               "en naranja y seleccionadas.")
+
+    # --- DIVISIÓN / EXTRACCIÓN ---
+    def handle_split(self):
+        """Divide el espacio de trabajo (o extrae la selección) en varios PDFs."""
+        if self.model.get_page_count() == 0:
+            self.view.show_message("Aviso", "No hay páginas para dividir.")
+            return
+        if self._loading:
+            self.view.show_message("Aviso", "Espere a que termine la carga de archivos.")
+            return
+        if self.saver_thread and self.saver_thread.isRunning():
+            self.view.show_message("Aviso", "Espere a que termine el guardado anterior.")
+            return
+
+        list_widget = self.view.pages_list
+        selected_rows = list_widget.selected_rows()
+        options = self.view.ask_split_options(bool(selected_rows))
+        if options is None:
+            return
+        if options['selected_only']:
+            order = [list_widget.get_original_index(row) for row in selected_rows]
+        else:
+            order = self.view.get_current_order()
+        try:
+            groups = self.model.split_order(order, options['mode'], options['pages_per_file'], options['prefix'])
+        except ValueError as e:
+            self.view.show_message("Aviso", str(e))
+            return
+
+        directory = self.view.show_directory_dialog("Carpeta para los PDFs", self.settings.value("split/dir", ""))
+        if not directory:
+            return
+        self.settings.setValue("split/dir", directory)
+        existing = sum(1 for name, _ in groups if os.path.exists(os.path.join(directory, name + ".pdf")))
+        if existing and not self.view.ask_confirmation(
+                "Dividir", f"Se crearán {len(groups)} archivos y {existing} ya existen en la carpeta.\n\n"
+                "¿Desea reemplazarlos?"):
+            return
+        quality = self.view.get_selected_quality_code()
+        self._start_saver(PDFSplitThread(self.model, groups, directory, quality), self.on_split_cancelled)
+
+    def on_split_cancelled(self, written):
+        self.view.close_save_progress()
+        if written:
+            self.view.show_message("Cancelado", f"Se canceló la división. Ya se habían guardado {written} "
+                                   "archivos completos en la carpeta de destino.")
+        else:
+            self.view.show_message("Cancelado", "Se canceló la división. No se guardó ningún archivo.")
+
+    # --- ANÁLISIS DE COMPRESIÓN ---
+    def handle_analyze_compression(self):
+        """Muestra qué contienen las páginas y el tamaño y tiempo estimados en cada calidad."""
+        if self.model.get_page_count() == 0:
+            self.view.show_message("Aviso", "No hay páginas para analizar.")
+            return
+        if self.saver_thread and self.saver_thread.isRunning():
+            self.view.show_message("Aviso", "Espere a que termine el guardado anterior.")
+            return
+        self._start_analysis(self.view.get_current_order(), None)
+
+    def _start_analysis(self, order, save_path):
+        """Analiza `order` en segundo plano; con `save_path`, después pregunta si se guarda."""
+        self.analysis_thread = CompressionAnalysisThread(self.model, order)
+        self.analysis_thread.progress.connect(self.view.update_save_progress)
+        self.analysis_thread.finished_analysis.connect(
+            lambda report: self.on_compression_analyzed(report, order, save_path))
+        self.analysis_thread.cancelled.connect(self.view.close_save_progress)
+        self.analysis_thread.error_occurred.connect(self.on_analysis_failed)
+        self.view.show_save_progress(self.analysis_thread.cancel, "Analizando compresión")
+        self.analysis_thread.start()
+
+    def on_compression_analyzed(self, report, order, save_path):
+        self.view.close_save_progress()
+        quality = self.view.get_selected_quality_code()
+        if save_path is None:
+            self.view.show_compression_report(report, quality)
+        elif self.view.show_compression_report(report, quality, ask=True):
+            self._start_saver(PDFSaverThread(self.model, order, save_path, quality))
+
+    def on_analysis_failed(self, message):
+        self.view.close_save_progress()
+        self.view.show_message("Error", f"No se pudo analizar el documento: {message}", "error")
 
     # --- GUARDADO ASÍNCRONO ---
     def handle_save_pdf(self):
@@ -125,30 +739,72 @@ class MainController:
             self.view.show_message("Aviso", "No hay páginas para guardar.")
             return
 
+        if self.saver_thread and self.saver_thread.isRunning():
+            self.view.show_message("Aviso", "Espere a que termine el guardado anterior.")
+            return
+
         path = self.view.show_save_dialog()
         if not path:
             return
 
-        # 1. Bloqueo visual de la UI
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        self.view.setEnabled(False) # Evita que el usuario toque botones mientras guarda
-
-        # 2. Recopilar datos necesarios
+        # 1. Recopilar datos necesarios
         current_order = self.view.get_current_order()
         quality = self.view.get_selected_quality_code()
+        if quality == 'auto':
+            # Antes de guardar se muestra qué se va a hacer y cuánto ocupará
+            self._start_analysis(current_order, path)
+            return
+
+        # 2. Iniciar el hilo de guardado; el diálogo modal muestra el avance y permite cancelar
+        self._start_saver(PDFSaverThread(self.model, current_order, path, quality))
+
+    def handle_save_in_place(self):
+        """Guardado incremental: añade rotaciones y borrados al final del PDF original."""
+        if self.model.get_page_count() == 0:
+            self.view.show_message("Aviso", "No hay páginas para guardar.")
+            return
+        if self._loading:
+            # Al guardar se renumeran las páginas de la fuente en el modelo
+            self.view.show_message("Aviso", "Espere a que termine la carga de archivos.")
+            return
+        if self.saver_thread and self.saver_thread.isRunning():
+            self.view.show_message("Aviso", "Espere a que termine el guardado anterior.")
+            return
+
+        current_order = self.view.get_current_order()
+        if not self.model.can_save_incrementally(current_order):
+            self.view.show_message("Aviso", "Solo se puede guardar en el original si todas las páginas "
+                                   "vienen de un mismo PDF y conservan su orden (rotaciones y borrados).")
+            return
+        path, _, _ = self.model.get_page_source(current_order[0])
+        if not self.view.ask_confirmation("Guardar en Original",
+                                          f"Se modificará el archivo:\n{path}\n\n¿Desea continuar?"):
+            return
+        self._start_saver(PDFSaverThread(self.model, current_order, path, None, incremental=True))
 
-        # 3. Iniciar el hilo de guardado
-        self.saver_thread = PDFSaverThread(self.model, current_order, path, quality)
+    def _start_saver(self, saver_thread, on_cancelled=None):
+        self.saver_thread = saver_thread
+        self.saver_thread.progress.connect(self.view.update_save_progress)
         self.saver_thread.finished.connect(self.on_save_finished)
+        self.saver_thread.cancelled.connect(on_cancelled or self.on_save_cancelled)
+        self.view.show_save_progress(self.saver_thread.cancel)
         self.saver_thread.start()
 
+    def on_save_cancelled(self):
+        self.view.close_save_progress()
+        self.view.show_message("Cancelado", "Se canceló el guardado. No se modificó ningún archivo.")
+
     def on_save_finished(self, success, message):
         """Callback al terminar el guardado."""
-        # 1. Restaurar la UI
-        QApplication.restoreOverrideCursor()
-        self.view.setEnabled(True)
+        # 1. Cerrar el diálogo de progreso
+        self.view.close_save_progress()
         
         # 2. Mostrar mensaje al usuario
+        if success and isinstance(self.saver_thread, PDFSaverThread) and self.saver_thread.incremental:
+            # El original se renumeró: las páginas guardadas en el historial ya no existen
+            self._clear_history()
+            self.view.pages_list.relabel_pages({index: self.model.get_page_label(index)
+                                                for index in range(self.model.get_page_count())})
         if success:
             if "Advertencia" in message:
                 self.view.show_message("Guardado con Avisos", message, "info")
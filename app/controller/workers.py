@@ -1,68 +1,548 @@
 import os
+import threading
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
 import fitz  # PyMuPDF
 from PyQt5.QtCore import QThread, pyqtSignal
+from app.model.render import RenderPool, render_pages, THUMBNAIL_SCALE, DRAFT_SCALE
+from app.model.pdf_manager import SaveCancelled
+from app.model.prescan import scan_pdfs
+from app.model.fingerprint import page_digests, page_signatures
+from app.model.metrics import metrics
 
 class PDFLoaderThread(QThread):
-    """Hilo encargado de cargar y renderizar páginas sin bloquear la UI."""
-    file_processed = pyqtSignal(str, list) # (ruta_archivo, lista_paginas)
+    """Hilo encargado de abrir los PDFs sin bloquear la UI.
+
+    Trabaja sobre una cola: mientras carga se le pueden encolar más archivos
+    (`enqueue`). Cada tanda nueva se pre-escanea primero en paralelo (páginas
+    y cifrado, ver app.model.prescan) para que la vista reserve los
+    marcadores de posición antes de la carga completa.
+
+    Cada archivo se parsea una sola vez en este hilo: el mismo documento
+    abierto aquí se registra como fuente del modelo, y la vista solo recibe
+    el rango de páginas nuevo para rellenar sus marcadores.
+    """
+    scanned = pyqtSignal(list) # [(clave, info_pre_escaneo), ...]
+    file_processed = pyqtSignal(int, str, int, int) # (clave, ruta_archivo, indice_inicial, numero_paginas)
     finished_all = pyqtSignal()
-    error_occurred = pyqtSignal(str)
+    error_occurred = pyqtSignal(int, str) # (clave, mensaje)
 
-    def __init__(self, file_paths):
+    def __init__(self, model, entries=(), pool=None):
         super().__init__()
-        self.file_paths = file_paths
+        self.model = model
+        # Pool de procesos para el pre-escaneo (el de las miniaturas); None = en este hilo
+        self.pool = pool
         self.is_running = True
+        self._lock = threading.Lock()
+        self._queue = list(entries)
+        self._closed = False
+
+    def enqueue(self, entries):
+        """Agrega (clave, ruta) a la cola. Devuelve False si el hilo ya terminó su cola."""
+        with self._lock:
+            if self._closed:
+                return False
+            self._queue.extend(entries)
+            return True
+
+    def _take_queue(self):
+        with self._lock:
+            entries, self._queue = self._queue, []
+            if not entries or not self.is_running:
+                # A partir de aquí enqueue falla y el controlador crea otro hilo
+                self._closed = True
+                return []
+            return entries
 
     def run(self):
-        for file_path in self.file_paths:
-            if not self.is_running:
+        while True:
+            entries = self._take_queue()
+            if not entries:
                 break
-            
-            try:
-                doc = fitz.open(file_path)
-                page_data = []
 
-                for i in range(len(doc)):
-                    if not self.is_running:
-                        break
-                    
-                    page = doc.load_page(i)
-                    
-                    # Renderizamos a baja resolución (0.3) para velocidad y memoria
-                    pix = page.get_pixmap(matrix=fitz.Matrix(0.3, 0.3))
-                    
-                    # Guardamos bytes y número de página humano (i + 1)
-                    page_data.append((pix.tobytes("png"), i + 1))
-
-                doc.close()
-                
-                # Emitimos resultado parcial por archivo
-                if self.is_running:
-                    self.file_processed.emit(file_path, page_data)
-
-            except Exception as e:
-                self.error_occurred.emit(f"Error en {file_path}: {str(e)}")
+            with metrics.span("carga.preescaneo", archivos=len(entries)):
+                # Con un solo proceso el reparto solo añade latencia
+                executor = self.pool.executor if self.pool and self.pool.workers > 1 else None
+                infos = scan_pdfs([path for _, path in entries], executor)
+            self.scanned.emit([(key, info) for (key, _), info in zip(entries, infos)])
+
+            for (key, file_path), info in zip(entries, infos):
+                if not self.is_running:
+                    break
+                if info['error']:
+                    self.error_occurred.emit(key, f"Error en {file_path}: {info['error']}")
+                    continue
+
+                try:
+                    # El documento queda abierto como fuente del modelo
+                    with metrics.span("carga.archivo", archivo=os.path.basename(file_path)):
+                        doc = fitz.open(file_path)
+                        # Las huellas para duplicados no se calculan aquí: retrasarían
+                        # la primera miniatura (ver DuplicateScanThread)
+                        page_range = self.model.load_pdf(file_path, doc=doc)
+
+                    # Emitimos resultado parcial por archivo
+                    self.file_processed.emit(key, file_path, page_range.start, len(page_range))
+
+                except Exception as e:
+                    self.error_occurred.emit(key, f"Error en {file_path}: {str(e)}")
 
         self.finished_all.emit()
 
     def stop(self):
-        self.is_running = False
+        with self._lock:
+            self.is_running = False
+            self._closed = True
+
+class ThumbnailRenderThread(QThread):
+    """Hilo que reparte en un pool de procesos las miniaturas visibles.
+
+    La vista le envía, por orden de prioridad, los índices que necesita.
+    Cada nueva petición reemplaza la cola anterior, de modo que al hacer
+    scroll se descartan las páginas que ya no están cerca del viewport.
+    Las páginas consecutivas de un mismo archivo se agrupan en rangos para
+    amortizar el envío entre procesos. Si hay caché en disco, las páginas ya
+    vistas se sirven desde ella sin rasterizar.
+
+    El render es progresivo: primero se atienden los borradores (escala
+    mínima, sin anotaciones ni antialiasing) y después las versiones nítidas
+    a la escala pedida por la vista. Los borradores no se guardan en caché.
+    """
+    thumbnail_ready = pyqtSignal(int, int, object, float) # (generacion, indice_original, miniatura cruda, escala)
+
+    def __init__(self, model, workers=None, max_pending=256, batch_size=4, cancel_on_stop=True, cache=None):
+        super().__init__()
+        self.model = model
+        self.cache = cache
+        self.atlas = None
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.cancel_on_stop = cancel_on_stop
+        self.pool = RenderPool(workers)
+        # Memoria de cada proceso de render a partir de la que se vacía la caché de MuPDF (bytes)
+        self.store_limit = None
+        self.is_running = True
+        self._generation = 0
+        self._scale = THUMBNAIL_SCALE
+        self._pending = [] # [(indice_original, es_borrador), ...]
+        # Índices ya servidos en nitidez (desde la caché) en esta petición
+        self._served = set()
+        self._condition = threading.Condition()
+
+    def request(self, generation, scale, drafts, sharps):
+        """Reemplaza la cola pendiente: primero los borradores y luego los nítidos a `scale`."""
+        with self._condition:
+            self._generation = generation
+            self._scale = scale
+            pending = [(index, True) for index in drafts] + [(index, False) for index in sharps]
+            self._pending = pending[:self.max_pending]
+            self._served = set()
+            self._condition.notify()
+
+    def set_cache(self, cache):
+        with self._condition:
+            self.cache = cache
+
+    def set_atlas(self, atlas):
+        """Atlas de miniaturas del proyecto abierto (ver ProjectAtlas), o None."""
+        with self._condition:
+            self.atlas = atlas
+
+    def _split_cached(self, generation, batch):
+        """Emite las miniaturas que ya están en caché o en el atlas y devuelve el resto del lote.
+
+        Si la versión nítida está en caché tampoco hace falta el borrador.
+        Una miniatura del atlas del proyecto sirve de borrador, y también de
+        nítida si se guardó a la escala pedida o mayor.
+        """
+        path, indices, page_numbers, rotations, scale, draft = batch
+        with self._condition:
+            cache, atlas = self.cache, self.atlas
+        if cache is None and atlas is None:
+            return batch
+        missing = ([], [], [])
+        for index, page_number, rotation in zip(indices, page_numbers, rotations):
+            thumbnail = None
+            thumbnail_scale = scale
+            if cache is not None:
+                with metrics.span("render.cache"):
+                    thumbnail = cache.get(path, page_number, rotation, scale)
+            if thumbnail is None and atlas is not None:
+                with metrics.span("render.atlas"):
+                    stored = atlas.get(path, page_number, rotation)
+                if stored and (draft or stored[1] >= scale):
+                    thumbnail, thumbnail_scale = stored
+            if thumbnail:
+                self.thumbnail_ready.emit(generation, index, thumbnail, thumbnail_scale)
+                if thumbnail_scale >= scale:
+                    with self._condition:
+                        self._served.add(index)
+            else:
+                missing[0].append(index)
+                missing[1].append(page_number)
+                missing[2].append(rotation)
+        return (path,) + missing + (scale, draft)
+
+    def _take_batch(self):
+        """Saca de la cola un rango de páginas consecutivas del mismo archivo y la misma pasada."""
+        indices, page_numbers, rotations = [], [], []
+        path = None
+        draft = None
+        while self._pending and len(indices) < self.batch_size:
+            index, is_draft = self._pending[0]
+            source = self.model.get_page_source(index)
+            if source is None or (not is_draft and index in self._served):
+                self._pending.pop(0)
+                continue
+            if indices and (index != indices[-1] + 1 or source[0] != path or is_draft != draft):
+                break
+            self._pending.pop(0)
+            path = source[0]
+            draft = is_draft
+            indices.append(index)
+            page_numbers.append(source[1])
+            rotations.append(source[2])
+        return path, indices, page_numbers, rotations, self._scale, draft
+
+    def run(self):
+        self.pool.warm_up()
+        in_flight = {} # future -> (generacion, lote)
+        max_in_flight = max(1, self.pool.workers * 2)
+
+        while True:
+            with self._condition:
+                while self.is_running and not self._pending and not in_flight:
+                    self._condition.wait()
+                if not self.is_running:
+                    break
+                generation = self._generation
+                batches = []
+                while self._pending and len(in_flight) + len(batches) < max_in_flight:
+                    batch = self._take_batch()
+                    if batch[1]:
+                        batches.append(batch)
+                metrics.gauge("render.cola", len(self._pending))
+
+            for batch in batches:
+                batch = self._split_cached(generation, batch)
+                path, indices, page_numbers, rotations, scale, draft = batch
+                if not indices:
+                    continue
+                render_scale = DRAFT_SCALE if draft else scale
+
+                if self.pool.executor is not None:
+                    try:
+                        future = self.pool.submit(path, page_numbers, rotations, render_scale,
+                                                  store_limit=self.store_limit, draft=draft)
+                        in_flight[future] = (generation, batch, time.perf_counter())
+                        continue
+                    except Exception as e:
+                        # Pool roto (p. ej. un proceso murió): seguimos sin procesos
+                        print(f"Pool de render no disponible ({e}). Se renderiza en el hilo.")
+                        self.pool.shutdown()
+
+                # Sin pool: renderizamos en este mismo hilo
+                started = time.perf_counter()
+                try:
+                    images = render_pages(path, page_numbers, rotations, render_scale,
+                                          store_limit=self.store_limit, draft=draft)
+                except Exception as e:
+                    print(f"Error renderizando miniaturas de {path}: {e}")
+                    continue
+                self._record_batch(batch, started)
+                self._emit_batch(generation, batch, images)
+
+            metrics.gauge("render.en_vuelo", len(in_flight))
+            if not in_flight:
+                continue
+            done, _ = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch_generation, batch, started = in_flight.pop(future)
+                try:
+                    images = future.result()
+                except Exception as e:
+                    print(f"Error renderizando miniaturas {batch[1]}: {e}")
+                    continue
+                self._record_batch(batch, started)
+                self._emit_batch(batch_generation, batch, images)
+
+        self.pool.shutdown(cancel_pending=self.cancel_on_stop)
+
+    def _record_batch(self, batch, started):
+        """Latencia del lote (envío -> resultado) y la media por página."""
+        elapsed = time.perf_counter() - started
+        pages = len(batch[1])
+        name = "render.borrador" if batch[5] else "render.pagina"
+        metrics.record("render.lote", elapsed, start=started, paginas=pages, borrador=batch[5])
+        metrics.record(name, elapsed / pages, start=started)
+
+    def _emit_batch(self, generation, batch, images):
+        path, indices, page_numbers, rotations, scale, draft = batch
+        cache = None if draft else self.cache
+        emitted_scale = DRAFT_SCALE if draft else scale
+        for index, page_number, rotation, thumbnail in zip(indices, page_numbers, rotations, images):
+            if thumbnail:
+                self.thumbnail_ready.emit(generation, index, thumbnail, emitted_scale)
+                if cache is not None:
+                    cache.put(path, page_number, rotation, scale, thumbnail)
+
+    def stop(self):
+        with self._condition:
+            self.is_running = False
+            self._pending = []
+            self._condition.notify()
 
 class PDFSaverThread(QThread):
-    """Hilo encargado de optimizar y guardar el PDF final."""
+    """Hilo encargado de optimizar y guardar el PDF final.
+
+    Informa el avance de cada etapa del guardado y se puede cancelar con
+    `cancel()`; en ese caso el archivo de destino no se toca. Con
+    `incremental=True` los cambios se añaden al PDF original (ver
+    `PDFModel.save_incremental`) y se ignoran `path` y `quality`.
+    """
     finished = pyqtSignal(bool, str) # (Éxito?, Mensaje)
+    progress = pyqtSignal(str, int, int) # (etapa, hechas, total; 0 = indeterminado)
+    cancelled = pyqtSignal()
 
-    def __init__(self, model, order, path, quality):
+    def __init__(self, model, order, path, quality, incremental=False):
         super().__init__()
         self.model = model
         self.order = order
         self.path = path
         self.quality = quality
+        self.incremental = incremental
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
 
     def run(self):
         try:
             # Ejecutamos la operación pesada del modelo aquí
-            result_msg = self.model.reorder_and_save(self.order, self.path, self.quality)
+            with metrics.span("guardado.total", paginas=len(self.order), incremental=self.incremental):
+                if self.incremental:
+                    result_msg = self.model.save_incremental(self.order, progress=self.progress.emit,
+                                                             is_cancelled=self._cancel.is_set)
+                else:
+                    result_msg = self.model.reorder_and_save(self.order, self.path, self.quality,
+                                                             progress=self.progress.emit,
+                                                             is_cancelled=self._cancel.is_set)
             self.finished.emit(True, result_msg)
+        except SaveCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+class PDFSplitThread(QThread):
+    """Hilo que divide el espacio de trabajo en varios PDFs (ver PDFModel.split_and_save).
+
+    Al cancelar se emite `cancelled` con las partes que ya quedaron escritas.
+    """
+    finished = pyqtSignal(bool, str) # (Éxito?, Mensaje)
+    progress = pyqtSignal(str, int, int) # (etapa, hechas, total)
+    cancelled = pyqtSignal(int) # partes ya escritas
+
+    def __init__(self, model, groups, directory, quality):
+        super().__init__()
+        self.model = model
+        self.groups = groups
+        self.directory = directory
+        self.quality = quality
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            result_msg = self.model.split_and_save(self.groups, self.directory, self.quality,
+                                                   progress=self.progress.emit, is_cancelled=self._cancel.is_set)
+            self.finished.emit(True, result_msg)
+        except SaveCancelled as e:
+            self.cancelled.emit(e.args[0] if e.args else 0)
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+class TextIndexThread(QThread):
+    """Hilo que extrae el texto de las páginas cargadas para el índice de búsqueda.
+
+    Trabaja sobre una cola de fuentes, como PDFLoaderThread: el controlador
+    encola cada archivo en cuanto termina de cargarse y el texto se lee del
+    mismo documento que abrió el hilo de carga. El lock del modelo se toma
+    por bloques de páginas para no frenar a la interfaz ni al guardado.
+    """
+    progress = pyqtSignal(int, int) # (páginas indexadas, total encolado)
+
+    def __init__(self, model, source_ids=(), batch_size=32):
+        super().__init__()
+        self.model = model
+        self.batch_size = batch_size
+        self.is_running = True
+        self._lock = threading.Lock()
+        self._queue = list(source_ids)
+        self._closed = False
+
+    def enqueue(self, source_ids):
+        """Agrega fuentes a la cola. Devuelve False si el hilo ya terminó su cola."""
+        with self._lock:
+            if self._closed:
+                return False
+            self._queue.extend(source_ids)
+            return True
+
+    def _take_queue(self):
+        with self._lock:
+            source_ids, self._queue = self._queue, []
+            if not source_ids or not self.is_running:
+                self._closed = True
+                return []
+            return source_ids
+
+    def run(self):
+        done = 0
+        total = 0
+        while True:
+            source_ids = self._take_queue()
+            if not source_ids:
+                break
+            work = [(source_id, self.model.get_unindexed_pages(source_id)) for source_id in source_ids]
+            total += sum(len(page_numbers) for _, page_numbers in work)
+            for source_id, page_numbers in work:
+                for start in range(0, len(page_numbers), self.batch_size):
+                    if not self.is_running:
+                        return
+                    batch = page_numbers[start:start + self.batch_size]
+                    try:
+                        with metrics.span("indice.texto", paginas=len(batch)):
+                            texts = self.model.page_texts(source_id, batch)
+                    except Exception as e:
+                        print(f"No se pudo extraer el texto para la búsqueda: {e}")
+                        texts = None
+                    if texts is None:
+                        # La fuente ya no está o no se puede leer: se salta
+                        done += len(page_numbers) - start
+                        self.progress.emit(done, total)
+                        break
+                    self.model.text_index.add(source_id, batch, texts)
+                    done += len(batch)
+                    self.progress.emit(done, total)
+
+    def stop(self):
+        with self._lock:
+            self.is_running = False
+            self._closed = True
+
+class CompressionAnalysisThread(QThread):
+    """Hilo que clasifica las páginas a guardar y estima el resultado de cada calidad.
+
+    Ver PDFModel.analyze_compression; se cancela con `cancel()`.
+    """
+    finished_analysis = pyqtSignal(dict) # ver CompressionAnalysis.report
+    progress = pyqtSignal(str, int, int) # (etapa, hechas, total)
+    cancelled = pyqtSignal()
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, model, order):
+        super().__init__()
+        self.model = model
+        self.order = order
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            report = self.model.analyze_compression(self.order, progress=self.progress.emit,
+                                                    is_cancelled=self._cancel.is_set)
+        except SaveCancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            return
+        self.finished_analysis.emit(report)
+
+
+class DuplicateScanThread(QThread):
+    """Hilo que busca páginas y archivos repetidos en el orden actual.
+
+    Aquí se calculan las huellas exactas y las firmas visuales que falten
+    (render mínimo en el pool de miniaturas) y se agrupan las páginas
+    repetidas. La carga no calcula huellas para no retrasar la primera
+    miniatura.
+    """
+    progress = pyqtSignal(int, int) # (páginas con firma, total a firmar)
+    finished_scan = pyqtSignal(list, list) # ([(indice, indice_original, tipo)], [(archivo, archivo_original)])
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, model, order, pool=None, batch_size=16):
+        super().__init__()
+        self.model = model
+        self.order = order
+        self.pool = pool
+        self.batch_size = batch_size
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _batches(self):
+        for source_id, path, page_numbers in self.model.get_missing_signatures(self.order):
+            for start in range(0, len(page_numbers), self.batch_size):
+                yield source_id, path, page_numbers[start:start + self.batch_size]
+
+    def _compute_digests(self):
+        """Huellas exactas de las fuentes que aún no las tienen, fuera del lock del modelo."""
+        missing = self.model.get_missing_digests(self.order)
+        with metrics.span("duplicados.huellas", archivos=len(missing)):
+            for source_id, path in missing:
+                if self._cancel.is_set():
+                    return
+                with fitz.open(path) as doc:
+                    self.model.set_source_digests(source_id, page_digests(doc))
+
+    def run(self):
+        try:
+            self._compute_digests()
+            batches = list(self._batches())
+            total = sum(len(page_numbers) for _, _, page_numbers in batches)
+            done = 0
+            executor = self.pool.executor if self.pool else None
+            futures = {}
+            if executor is not None:
+                try:
+                    futures = {executor.submit(page_signatures, path, page_numbers): (source_id, page_numbers)
+                               for source_id, path, page_numbers in batches}
+                except RuntimeError:
+                    # Pool cerrado o roto: se firma en este hilo
+                    futures = {}
+            with metrics.span("duplicados.firmas", paginas=total):
+                if futures:
+                    pending = set(futures)
+                    while pending and not self._cancel.is_set():
+                        finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            source_id, page_numbers = futures[future]
+                            try:
+                                self.model.set_page_signatures(source_id, page_numbers, future.result())
+                            except Exception as e:
+                                # Sin firma la página solo se compara por su huella exacta
+                                print(f"No se pudieron firmar las páginas {page_numbers}: {e}")
+                            done += len(page_numbers)
+                            self.progress.emit(done, total)
+                    for future in pending:
+                        future.cancel()
+                else:
+                    for source_id, path, page_numbers in batches:
+                        if self._cancel.is_set():
+                            break
+                        self.model.set_page_signatures(source_id, page_numbers, page_signatures(path, page_numbers))
+                        done += len(page_numbers)
+                        self.progress.emit(done, total)
+            if self._cancel.is_set():
+                return
+            self.finished_scan.emit(self.model.find_duplicate_pages(self.order),
+                                    self.model.find_duplicate_files(self.order))
         except Exception as e:
-            self.finished.emit(False, str(e))
\ No newline at end of file
+            self.error_occurred.emit(str(e))
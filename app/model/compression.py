@@ -0,0 +1,157 @@
+"""
+Análisis previo al guardado: qué contiene cada página y cuánto ocuparía y
+tardaría el archivo en cada calidad.
+
+Las páginas y las imágenes se clasifican solo por sus diccionarios (ver
+image_optimizer.classify_pages). Para estimar los tamaños se recomprimen
+de verdad unas pocas imágenes de cada tipo y se extrapola su relación
+bytes/píxel al resto.
+"""
+import time
+from collections import Counter
+
+from .image_optimizer import (QUALITY_TARGETS, MIN_IMAGES_FOR_POOL, image_payload, classify_pages,
+                              collect_images, decode_image, encode_image, object_digest, stream_length)
+
+# Calidades que se estiman
+QUALITIES = ('high', 'standard', 'low', 'auto')
+
+# Imágenes de cada tipo que se recomprimen para estimar
+SAMPLES_PER_KIND = 2
+
+# Segundos por página para montar y escribir el documento, sin contar las
+# imágenes (medido con un PDF de 2000 páginas de texto; 'high' no recolecta
+# basura a fondo ni busca imágenes)
+WRITE_SECONDS_PER_PAGE = {'high': 0.0003, 'standard': 0.001, 'low': 0.001, 'auto': 0.001}
+# Velocidad de escritura del archivo final, medida en el mismo equipo
+WRITE_BYTES_PER_SECOND = 300 * 1024 * 1024
+
+
+class CompressionAnalysis:
+    """Acumula el análisis de las páginas a guardar y estima el resultado.
+
+    Se alimenta por lotes de páginas de cada fuente (add_file, add_pages)
+    y las muestras que devuelve add_pages se miden con measure(), que se
+    puede llamar sin bloquear el documento.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.page_kinds = Counter()
+        # Bytes de lo que no son imágenes (texto, fuentes, vectores), estimados por fuente
+        self.base_bytes = 0
+        # (tipo, bytes, píxeles_origen, {calidad: (ancho_obj, alto_obj, calidad_jpeg, a_grises)})
+        self._images = []
+        # Huellas de contenido de las imágenes ya vistas (ver image_optimizer.object_digest):
+        # al guardar, dedupe_images deja una sola copia de las repetidas entre fuentes
+        self._seen = set()
+        self._memos = {}
+        self._sampled = Counter()
+        # (calidad, tipo) -> [bytes_jpeg, píxeles_objetivo]
+        self._ratios = {}
+        # calidad -> [segundos, píxeles_origen]
+        self._speeds = {}
+
+    def add_file(self, doc, file_size, used_pages):
+        """Parte del archivo que no son imágenes, en proporción a las páginas usadas."""
+        image_bytes = sum(stream_length(doc, xref) for xref in
+                          {image[0] for page_number in range(len(doc))
+                           for image in doc.get_page_images(page_number)})
+        self.base_bytes += max(0, file_size - image_bytes) * used_pages // max(1, len(doc))
+
+    def add_pages(self, source_key, doc, page_counts):
+        """Clasifica un lote de páginas {pagina: veces_que_se_guarda} de un documento.
+
+        Devuelve las muestras a medir [(posición, payload, segundos_de_lectura)];
+        el payload ya no depende del documento.
+        """
+        page_numbers = sorted(page_counts)
+        page_kinds, image_kinds, adaptive = classify_pages(doc, page_numbers)
+        for page_number, kind in page_kinds.items():
+            self.page_kinds[kind] += page_counts[page_number]
+            self.pages += page_counts[page_number]
+        fixed = {quality: collect_images(doc, dpi_target, jpeg_quality, page_numbers)
+                 for quality, (dpi_target, jpeg_quality) in QUALITY_TARGETS.items()}
+        plans = dict(fixed, auto=adaptive)
+
+        samples = []
+        xrefs = dict.fromkeys(image[0] for page_number in page_numbers
+                              for image in doc.get_page_images(page_number))
+        memo = self._memos.setdefault(source_key, {})
+        for xref in xrefs:
+            digest = object_digest(doc, xref, memo)
+            if digest in self._seen:
+                continue
+            self._seen.add(digest)
+            kind = image_kinds.get(xref)
+            image_plans = {quality: plan[xref][3:] for quality, plan in plans.items() if xref in plan}
+            if kind is None or not image_plans:
+                # Máscaras, bitonales o imágenes que no se muestran: se copian tal cual
+                self._images.append((None, stream_length(doc, xref), 0, {}))
+                continue
+            width, height, colorspace = next(iter(plan[xref] for plan in plans.values() if xref in plan))[:3]
+            self._images.append((kind, stream_length(doc, xref), width * height, image_plans))
+            if self._sampled[kind] < SAMPLES_PER_KIND:
+                self._sampled[kind] += 1
+                # Leer la imagen del documento también es parte del coste al guardar
+                started = time.perf_counter()
+                payload = image_payload(doc, xref, width, height, colorspace)
+                samples.append((len(self._images) - 1, payload, time.perf_counter() - started))
+        return samples
+
+    def measure(self, samples):
+        """Recomprime las muestras en cada calidad y guarda su relación bytes/píxel y su velocidad."""
+        for position, payload, read_seconds in samples:
+            kind, _, source_pixels, image_plans = self._images[position]
+            started = time.perf_counter()
+            try:
+                pix = decode_image(payload)
+            except Exception:
+                pix = None
+            if pix is None:
+                continue
+            decode_seconds = read_seconds + time.perf_counter() - started
+            for quality, (target_width, target_height, jpeg_quality, to_gray) in image_plans.items():
+                started = time.perf_counter()
+                jpeg = encode_image(pix, target_width, target_height, jpeg_quality, to_gray)[0]
+                seconds = decode_seconds + time.perf_counter() - started
+                ratio = self._ratios.setdefault((quality, kind), [0, 0])
+                ratio[0] += len(jpeg)
+                ratio[1] += target_width * target_height
+                speed = self._speeds.setdefault(quality, [0.0, 0])
+                speed[0] += seconds
+                speed[1] += source_pixels
+
+    def estimate(self, quality, workers=0):
+        """(bytes, segundos) estimados del archivo guardado con `quality`."""
+        size = self.base_bytes
+        pixels = 0
+        recompressed = 0
+        for kind, raw_size, source_pixels, image_plans in self._images:
+            plan = image_plans.get(quality) if quality != 'high' else None
+            ratio = self._ratios.get((quality, kind)) if plan else None
+            if not ratio or not ratio[1]:
+                size += raw_size
+                continue
+            target_width, target_height = plan[:2]
+            # Una imagen que no se reduce se deja como estaba
+            size += min(raw_size, ratio[0] * target_width * target_height // ratio[1])
+            pixels += source_pixels
+            recompressed += 1
+        seconds = self.pages * WRITE_SECONDS_PER_PAGE[quality] + size / WRITE_BYTES_PER_SECOND
+        speed = self._speeds.get(quality)
+        if recompressed and speed and speed[1]:
+            parallel = workers if workers > 0 and recompressed >= MIN_IMAGES_FOR_POOL else 1
+            seconds += pixels * speed[0] / speed[1] / parallel
+        return size, seconds
+
+    def report(self, workers=0):
+        """Resumen para mostrar: páginas por tipo, imágenes y estimación de cada calidad."""
+        image_kinds = Counter(kind for kind, _, _, _ in self._images if kind)
+        return {
+            'pages': self.pages,
+            'page_kinds': dict(self.page_kinds),
+            'images': sum(image_kinds.values()),
+            'image_kinds': dict(image_kinds),
+            'estimates': {quality: self.estimate(quality, workers) for quality in QUALITIES},
+        }
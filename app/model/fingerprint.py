@@ -0,0 +1,177 @@
+import hashlib
+
+import fitz  # PyMuPDF
+
+from .image_optimizer import expand_references
+from .render import render_pages, get_document
+
+# Formato de las huellas exactas: se sube al cambiar lo que cubre page_digest,
+# así las huellas guardadas en proyectos anteriores se descartan
+DIGEST_FORMAT = "2"
+# Niveles de referencias que se siguen desde los recursos de la página
+# (formulario -> sus recursos -> fuente -> descriptor -> archivo de fuente...)
+RESOURCE_DEPTH = 8
+
+# Escala del render usado para el hash perceptual (basta con unas decenas de píxeles)
+PERCEPTUAL_SCALE = 0.1
+# dHash de HASH_SIZE x HASH_SIZE bits (se compara cada píxel con su vecino derecho)
+HASH_SIZE = 8
+# Distancia de Hamming máxima para considerar dos páginas iguales a la vista
+SIMILAR_MAX_DISTANCE = 4
+# Bandas en que se parte el hash para buscar candidatos: con una banda más
+# que la distancia máxima, dos hashes cercanos coinciden al menos en una
+_BANDS = SIMILAR_MAX_DISTANCE + 1
+
+
+def page_digest(doc, page_number, memo=None):
+    """Huella exacta de una página: caja, rotación, streams de contenido y recursos.
+
+    Los recursos (imágenes, formularios, fuentes...) se recorren siguiendo
+    sus referencias con image_optimizer.expand_references, así dos páginas
+    que dibujan distinto a través de formularios no coinciden. Se leen los
+    streams comprimidos tal cual, sin interpretarlos. `memo` se comparte
+    entre las páginas de un documento para no volver a leer sus fuentes.
+    """
+    memo = {} if memo is None else memo
+    page = doc.load_page(page_number)
+    digest = hashlib.sha1()
+    digest.update(f"{page.cropbox} {page.rotation}".encode("ascii"))
+    for xref in page.get_contents():
+        digest.update(doc.xref_stream_raw(xref) or b"")
+    resources = _page_resources(doc, page.xref)
+    digest.update(expand_references(doc, resources.encode("latin-1", "replace"), memo, RESOURCE_DEPTH))
+    return f"{DIGEST_FORMAT}:{digest.hexdigest()}"
+
+
+def _page_resources(doc, xref):
+    """Texto de /Resources de una página; si no tiene, el que hereda del árbol de páginas."""
+    while xref:
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return value
+        kind, value = doc.xref_get_key(xref, "Parent")
+        xref = int(value.split()[0]) if kind == "xref" else 0
+    return ""
+
+
+def page_digests(doc):
+    """Huellas exactas de todas las páginas del documento (None si una no se pudo leer)."""
+    memo = {}
+    digests = []
+    for page_number in range(len(doc)):
+        try:
+            digests.append(page_digest(doc, page_number, memo))
+        except Exception as e:
+            print(f"No se pudo calcular la huella de la página {page_number + 1}: {e}")
+            digests.append(None)
+    return digests
+
+
+def current_digests(digests):
+    """Las huellas guardadas si se calcularon con el formato actual; si no, None."""
+    if digests and any(digest is not None and not digest.startswith(f"{DIGEST_FORMAT}:")
+                       for digest in digests):
+        return None
+    return digests
+
+
+def perceptual_hash(thumbnail):
+    """dHash de 64 bits de una miniatura cruda (ver render.pixmap_to_thumbnail).
+
+    Es estable frente a recompresión y pequeños cambios de escala, por eso
+    reconoce el mismo original escaneado dos veces.
+    """
+    width, height, stride, samples = thumbnail
+    pix = fitz.Pixmap(fitz.csRGB, width, height, samples, False)
+    gray = fitz.Pixmap(fitz.csGRAY, pix)
+    small = fitz.Pixmap(gray, HASH_SIZE + 1, HASH_SIZE, None)
+    values = small.samples
+    row_stride = small.stride
+    bits = 0
+    for y in range(HASH_SIZE):
+        row = values[y * row_stride:y * row_stride + HASH_SIZE + 1]
+        for x in range(HASH_SIZE):
+            bits = (bits << 1) | (row[x] > row[x + 1])
+    return bits
+
+
+def text_digest(page):
+    """Huella del texto extraíble de la página (None si no tiene, p. ej. un escaneo)."""
+    words = page.get_text("text").split()
+    if not words:
+        return None
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+
+def page_signatures(path, page_numbers):
+    """Firmas visuales (hash_perceptual, huella_texto) de varias páginas de un archivo.
+
+    El render es un borrador: en páginas vectoriales pesadas el antialiasing
+    cuesta mucho más que lo que aporta a un hash de 64 bits. Se ejecuta en
+    un trabajador del pool de render.
+    """
+    thumbnails = render_pages(path, page_numbers, [0] * len(page_numbers), scale=PERCEPTUAL_SCALE, draft=True)
+    doc = get_document(path)
+    return [(perceptual_hash(thumbnail), text_digest(doc.load_page(page_number)))
+            for page_number, thumbnail in zip(page_numbers, thumbnails)]
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _bands(value):
+    bits = HASH_SIZE * HASH_SIZE
+    width = -(-bits // _BANDS)
+    return [(band, (value >> (band * width)) & ((1 << width) - 1)) for band in range(_BANDS)]
+
+
+def _signatures_agree(a, b, max_distance):
+    """Dos páginas con la misma huella solo son idénticas si sus firmas no se contradicen.
+
+    Sin alguna de las firmas (no se pudo renderizar) basta la huella.
+    """
+    if not a or not b:
+        return True
+    return a[1] == b[1] and hamming_distance(a[0], b[0]) <= max_distance
+
+
+def find_duplicates(entries, max_distance=SIMILAR_MAX_DISTANCE):
+    """Busca páginas repetidas en `entries` [(clave, huella, firma)], en orden.
+
+    `firma` es (hash_perceptual, huella_texto) o None (ver page_signatures).
+    La primera aparición se conserva; cada repetición posterior se informa
+    como (clave, clave_original, tipo) con tipo 'identica' (misma huella,
+    mismo texto y hash perceptual cercano) o 'similar' (mismo texto y hash
+    perceptual a distancia <= max_distance).
+    Exigir el mismo texto evita confundir páginas de una misma plantilla.
+    Los hashes perceptuales nulos (páginas lisas, p. ej. en blanco) no se comparan.
+    """
+    duplicates = []
+    by_digest = {} # huella -> (clave, firma) de su primera aparición
+    buckets = {}
+    for key, digest, signature in entries:
+        if digest is not None and digest in by_digest:
+            original, original_signature = by_digest[digest]
+            if _signatures_agree(signature, original_signature, max_distance):
+                duplicates.append((key, original, 'identica'))
+                continue
+        if digest is not None:
+            by_digest.setdefault(digest, (key, signature))
+        if not signature or not signature[0]:
+            continue
+        phash, text = signature
+        match = None
+        for band in _bands(phash):
+            for other_key, other_hash in buckets.get((text, band), ()):
+                if hamming_distance(phash, other_hash) <= max_distance:
+                    match = other_key
+                    break
+            if match is not None:
+                break
+        if match is not None:
+            duplicates.append((key, match, 'similar'))
+            continue
+        for band in _bands(phash):
+            buckets.setdefault((text, band), []).append((key, phash))
+    return duplicates
@@ -0,0 +1,90 @@
+from collections import deque
+
+# Pasos que se conservan para deshacer
+MAX_STEPS = 5000
+# Elementos (filas, índices, páginas) guardados entre todos los pasos; al
+# superarse se olvidan los pasos más viejos. Acota la memoria aunque un solo
+# paso afecte a miles de páginas.
+MAX_ITEMS = 500000
+
+
+class Operation:
+    """Un paso del historial, descrito por lo mínimo para aplicarlo en ambos sentidos.
+
+    - 'rotar': `rows` girar 90° en el sentido `clockwise`.
+    - 'mover': `rows` (posiciones de origen, ordenadas) movidas antes de
+      `target`; quedaron juntas a partir de `position`.
+    - 'borrar': `rows` quitadas de la vista; `indices` y `pages` son sus
+      posiciones y entradas (fuente, página, rotación) en el modelo.
+    - 'insertar': lo contrario de 'borrar' (p. ej. un archivo cargado).
+
+    No se guardan documentos ni miniaturas: deshacer cuesta lo mismo que la
+    operación original.
+    """
+
+    __slots__ = ('kind', 'rows', 'clockwise', 'target', 'position', 'indices', 'pages', 'label')
+
+    def __init__(self, kind, rows, label, clockwise=True, target=0, position=0, indices=(), pages=()):
+        self.kind = kind
+        self.rows = rows
+        self.label = label
+        self.clockwise = clockwise
+        self.target = target
+        self.position = position
+        self.indices = indices
+        self.pages = pages
+
+    def size(self):
+        return len(self.rows) + len(self.indices) + len(self.pages)
+
+
+class History:
+    """Pilas de deshacer/rehacer sobre la lista de páginas, con memoria acotada."""
+
+    def __init__(self, max_steps=MAX_STEPS, max_items=MAX_ITEMS):
+        self.max_items = max_items
+        self._undo = deque(maxlen=max_steps)
+        self._redo = []
+        self._items = 0
+
+    def record(self, operation):
+        """Registra una operación recién hecha; descarta lo que había para rehacer."""
+        if len(self._undo) == self._undo.maxlen:
+            self._items -= self._undo[0].size()
+        self._undo.append(operation)
+        self._items += operation.size()
+        self._redo = []
+        while self._items > self.max_items and len(self._undo) > 1:
+            self._items -= self._undo.popleft().size()
+
+    def undo(self):
+        """Saca la última operación para deshacerla (None si no hay)."""
+        if not self._undo:
+            return None
+        operation = self._undo.pop()
+        self._items -= operation.size()
+        self._redo.append(operation)
+        return operation
+
+    def redo(self):
+        """Saca la última operación deshecha para repetirla (None si no hay)."""
+        if not self._redo:
+            return None
+        operation = self._redo.pop()
+        self._undo.append(operation)
+        self._items += operation.size()
+        return operation
+
+    def peek_undo(self):
+        return self._undo[-1] if self._undo else None
+
+    def peek_redo(self):
+        return self._redo[-1] if self._redo else None
+
+    def clear(self):
+        self._undo.clear()
+        self._redo = []
+        self._items = 0
+
+    def __len__(self):
+        return len(self._undo)
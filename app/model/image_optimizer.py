@@ -0,0 +1,428 @@
+import hashlib
+import math
+import multiprocessing
+import re
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import fitz  # PyMuPDF
+
+from .render import default_worker_count
+
+# (dpi_objetivo, calidad_jpeg) de cada modo de calidad
+QUALITY_TARGETS = {
+    'standard': (150, 75),
+    'low': (72, 50),
+}
+
+# Calidad adaptativa ('auto'): (dpi_objetivo, calidad_jpeg) según el tipo de imagen.
+# Los escaneos en grises conservan resolución para que el texto siga legible;
+# las fotos se comprimen menos que en 'low' para no llenarse de artefactos.
+ADAPTIVE_TARGETS = {
+    'scan_gray': (200, 60),
+    'scan_color': (150, 70),
+    'photo': (150, 85),
+}
+
+# Fracción de la página que debe cubrir una imagen para tratarla como escaneo
+SCAN_COVERAGE = 0.7
+
+# En modo adaptativo las imágenes más pequeñas se dejan como están: casi no hay nada que ganar
+MIN_ADAPTIVE_BYTES = 16 * 1024
+
+# Tipos de página, del que más pesa al que menos; una página toma el primero
+# que aparezca entre sus imágenes ('vector' si no tiene ninguna recomprimible)
+PAGE_KINDS = ('photo', 'scan_color', 'scan_gray', 'compressed', 'small', 'vector')
+
+# Diferencia máxima entre canales para considerar que un píxel no tiene color
+NEUTRAL_TOLERANCE = 12
+
+# Solo se reduce una imagen si supera el DPI objetivo en este factor
+DOWNSAMPLE_THRESHOLD = 1.1
+
+# Con pocas imágenes no compensa arrancar procesos
+MIN_IMAGES_FOR_POOL = 4
+
+# Espacios de color cuyas muestras se pueden interpretar directamente
+_DIRECT_COLORSPACES = ("DeviceGray", "DeviceRGB", "DeviceCMYK", "ICCBased")
+
+# Referencias indirectas dentro del texto de un objeto ("12 0 R")
+_REFERENCE = re.compile(rb"(\d+) 0 R")
+
+
+def image_payload(doc, xref, width, height, colorspace):
+    """Prepara los datos de la imagen para decodificarla en otro proceso.
+
+    JPEG/JPEG2000 viajan tal cual. Las muestras sin filtro o con Flate simple
+    viajan crudas y se descomprimen en el trabajador. El resto se convierte
+    aquí con extract_image (camino lento pero general).
+    """
+    filter_type, filter_value = doc.xref_get_key(xref, "Filter")
+    params_type, _ = doc.xref_get_key(xref, "DecodeParms")
+    decode_type, _ = doc.xref_get_key(xref, "Decode")
+    if filter_value in ("/DCTDecode", "/JPXDecode"):
+        return ('encoded', doc.xref_stream_raw(xref))
+    if filter_type == 'null' or (filter_value == "/FlateDecode" and params_type == 'null'):
+        if decode_type == 'null' and colorspace in _DIRECT_COLORSPACES:
+            return ('samples', doc.xref_stream_raw(xref), filter_value == "/FlateDecode", width, height)
+    return ('encoded', doc.extract_image(xref)["image"])
+
+
+def decode_image(payload):
+    """Pixmap sin transparencia, en grises o RGB, a partir de los datos de image_payload.
+
+    Devuelve None si la imagen no se puede tratar.
+    """
+    if payload[0] == 'samples':
+        _, data, compressed, width, height = payload
+        samples = zlib.decompress(data) if compressed else data
+        components = len(samples) // (width * height)
+        colorspaces = {1: fitz.csGRAY, 3: fitz.csRGB, 4: fitz.csCMYK}
+        if components not in colorspaces or components * width * height != len(samples):
+            return None
+        pix = fitz.Pixmap(colorspaces[components], width, height, samples, False)
+    else:
+        pix = fitz.Pixmap(payload[1])
+
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix
+
+
+def encode_image(pix, target_width, target_height, quality, to_gray=False):
+    """Reduce y codifica a JPEG un pixmap de decode_image.
+
+    Con `to_gray`, una imagen en color que no tiene color (un escaneo en
+    grises guardado como RGB) se guarda en grises: un tercio de las muestras.
+    Devuelve (jpeg, ancho, alto, componentes).
+    """
+    if pix.width > target_width * DOWNSAMPLE_THRESHOLD:
+        pix = fitz.Pixmap(pix, target_width, target_height, None)
+    if to_gray and pix.n == 3 and _is_neutral(pix):
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+    return pix.tobytes("jpeg", jpg_quality=quality), pix.width, pix.height, pix.n
+
+
+def _is_neutral(pix):
+    """True si ningún píxel de una muestra reducida de la imagen RGB tiene color."""
+    if pix.width > 128:
+        pix = fitz.Pixmap(pix, 128, max(1, round(pix.height * 128 / pix.width)), None)
+    samples = pix.samples
+    return all(abs(red - green) <= NEUTRAL_TOLERANCE and abs(green - blue) <= NEUTRAL_TOLERANCE
+               for red, green, blue in zip(samples[0::3], samples[1::3], samples[2::3]))
+
+
+def recompress_image(payload, target_width, target_height, quality, to_gray=False):
+    """Decodifica, reduce y recodifica una imagen a JPEG (se ejecuta en un trabajador).
+
+    Devuelve (jpeg, ancho, alto, componentes) o None si la imagen no se puede tratar.
+    """
+    pix = decode_image(payload)
+    if pix is None:
+        return None
+    return encode_image(pix, target_width, target_height, quality, to_gray)
+
+
+def object_digest(doc, xref, memo, depth=3):
+    """Huella del contenido de un objeto: su diccionario y su stream.
+
+    Las referencias a otros objetos se sustituyen por la huella de estos
+    (hasta `depth` niveles), así dos copias de la misma imagen con su perfil
+    de color o su máscara duplicados también coinciden.
+    """
+    if xref in memo:
+        return memo[xref]
+    memo[xref] = b"ciclo:%d" % xref
+    text = doc.xref_object(xref, compressed=True).encode("latin-1", "replace")
+    digest = hashlib.sha1(expand_references(doc, text, memo, depth))
+    if doc.xref_is_stream(xref):
+        digest.update(doc.xref_stream_raw(xref) or b"")
+    memo[xref] = digest.hexdigest().encode("ascii")
+    return memo[xref]
+
+
+def expand_references(doc, text, memo, depth=3):
+    """Sustituye en `text` (bytes) cada referencia "12 0 R" por la huella del objeto (ver object_digest)."""
+    if depth <= 0:
+        return text
+    return _REFERENCE.sub(lambda match: object_digest(doc, int(match.group(1)), memo, depth - 1), text)
+
+
+def dedupe_images(doc):
+    """Hace que las imágenes idénticas de `doc` compartan un único objeto.
+
+    Al unir lotes de escaneo que se solapan, la misma imagen llega copiada
+    desde varios archivos. Las páginas (o formularios) que usan una copia
+    pasan a apuntar a la primera; las copias quedan huérfanas y las
+    descarta la recolección de basura al guardar. Devuelve cuántas
+    referencias se cambiaron.
+    """
+    memo = {}
+    canonical = {} # huella -> xref que se conserva
+    kept = set() # xrefs de canonical
+    replacement = {} # xref duplicado -> xref que se conserva
+    replaced = 0
+    for page in doc:
+        for xref, _, _, _, _, _, _, name, _, referencer in page.get_images(full=True):
+            if xref not in replacement and xref not in kept:
+                target = canonical.setdefault(object_digest(doc, xref, memo), xref)
+                if target == xref:
+                    kept.add(xref)
+                else:
+                    replacement[xref] = target
+            target = replacement.get(xref)
+            if target is None:
+                continue
+            owner, key = _resolve_key(doc, referencer or page.xref, ["Resources", "XObject", name])
+            doc.xref_set_key(owner, key, f"{target} 0 R")
+            replaced += 1
+    return replaced
+
+
+def _resolve_key(doc, xref, path):
+    """Devuelve (xref, ruta) del objeto que contiene realmente la última clave de `path`.
+
+    xref_set_key con una ruta que atraviesa un objeto indirecto vacía el
+    diccionario intermedio, así que se siguen las referencias a mano.
+    """
+    for position in range(len(path) - 1):
+        kind, value = doc.xref_get_key(xref, "/".join(path[:position + 1]))
+        if kind == "xref":
+            return _resolve_key(doc, int(value.split()[0]), path[position + 1:])
+    return xref, "/".join(path)
+
+
+def _placements(doc, page_numbers=None):
+    """Imágenes recomprimibles de cada página.
+
+    Genera (pagina, xref, ancho, alto, espacio_color, ancho_mostrado,
+    fracción_de_página_cubierta); si una imagen se muestra varias veces en
+    la página se toma la aparición mayor.
+    """
+    for page_number in range(len(doc)) if page_numbers is None else page_numbers:
+        page = doc.load_page(page_number)
+        page_images = page.get_images(full=True)
+        if not page_images:
+            continue
+        page_area = abs(page.rect) or 1
+        # Dónde se dibuja cada imagen, identificada por su tamaño en píxeles.
+        # get_image_rects decodifica la imagen para reconocerla por su MD5:
+        # solo se usa si dos imágenes de la página tienen el mismo tamaño.
+        shown = {}
+        for info in page.get_image_info():
+            shown.setdefault((info["width"], info["height"]), []).append(fitz.Rect(info["bbox"]))
+        sizes = Counter((width, height) for _, _, width, height, *_ in page_images)
+        for xref, smask, width, height, bpc, colorspace, *_ in page_images:
+            # Máscaras (transparencia) y bitonales se dejan como están
+            if smask or bpc != 8 or width <= 0 or height <= 0:
+                continue
+            # Una /Mask (de color o de stencil) dejaría de coincidir con el JPEG
+            if doc.xref_get_key(xref, "Mask")[0] != "null":
+                continue
+            if sizes[(width, height)] == 1:
+                rects = shown.get((width, height))
+            else:
+                rects = page.get_image_rects(xref)
+            if not rects:
+                continue
+            coverage = min(1.0, max(abs(rect) for rect in rects) / page_area)
+            yield page_number, xref, width, height, colorspace, max(rect.width for rect in rects), coverage
+
+
+def _target_size(width, height, shown_width, dpi_target):
+    target_width = max(1, min(width, math.ceil(shown_width / 72 * dpi_target)))
+    return target_width, max(1, round(height * target_width / width))
+
+
+def _add_image(images, xref, entry):
+    """Si una imagen se muestra en varios sitios se usa el tamaño mayor."""
+    known = images.get(xref)
+    if known is None or known[3] < entry[3]:
+        images[xref] = entry
+
+
+def collect_images(doc, dpi_target, quality, page_numbers=None):
+    """Busca las imágenes recomprimibles y el tamaño objetivo de cada una.
+
+    Devuelve {xref: (ancho, alto, espacio_color, ancho_objetivo, alto_objetivo,
+    calidad_jpeg, a_grises)}.
+    """
+    images = {}
+    for _, xref, width, height, colorspace, shown_width, _ in _placements(doc, page_numbers):
+        target_width, target_height = _target_size(width, height, shown_width, dpi_target)
+        _add_image(images, xref, (width, height, colorspace, target_width, target_height, quality, False))
+    return images
+
+
+def stream_length(doc, xref):
+    """Bytes que ocupa el stream de un objeto, sin leerlo si el PDF declara su longitud."""
+    kind, value = doc.xref_get_key(xref, "Length")
+    if kind == "int":
+        return int(value)
+    return len(doc.xref_stream_raw(xref) or b"")
+
+
+def _components(doc, xref, colorspace):
+    """Canales de color de una imagen según su diccionario (3 si no se puede saber)."""
+    if colorspace in ("DeviceGray", "DeviceRGB", "DeviceCMYK"):
+        return {"DeviceGray": 1, "DeviceRGB": 3, "DeviceCMYK": 4}[colorspace]
+    kind, value = doc.xref_get_key(xref, "ColorSpace")
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]), compressed=True)
+    match = re.search(r"/ICCBased (\d+) 0 R", value)
+    if match:
+        kind, value = doc.xref_get_key(int(match.group(1)), "N")
+        if kind == "int":
+            return int(value)
+    return 3
+
+
+def classify_image(doc, xref, width, colorspace, target_width, coverage):
+    """Tipo de una imagen para la calidad adaptativa.
+
+    'scan_gray' o 'scan_color' si cubre casi toda la página, 'photo' si no;
+    'compressed' si ya es JPEG y no se reduciría (recodificarla solo
+    empeora su calidad) y 'small' si ocupa muy poco. Las dos últimas no se
+    tocan. `target_width` es el ancho objetivo de su tipo.
+    """
+    _, filter_value = doc.xref_get_key(xref, "Filter")
+    if filter_value in ("/DCTDecode", "/JPXDecode") and width <= target_width * DOWNSAMPLE_THRESHOLD:
+        return 'compressed'
+    if stream_length(doc, xref) < MIN_ADAPTIVE_BYTES:
+        return 'small'
+    if coverage >= SCAN_COVERAGE:
+        return 'scan_gray' if _components(doc, xref, colorspace) == 1 else 'scan_color'
+    return 'photo'
+
+
+def classify_pages(doc, page_numbers=None):
+    """Clasifica páginas e imágenes y elige el objetivo de cada imagen (calidad 'auto').
+
+    Devuelve (tipos_pagina, tipos_imagen, imagenes): {pagina: tipo} (ver
+    PAGE_KINDS), {xref: tipo} de todas las imágenes vistas e imagenes como
+    en collect_images, solo con las que se recomprimen. La clasificación
+    usa solo los diccionarios de las imágenes: no se decodifica ninguna.
+    """
+    if page_numbers is None:
+        page_numbers = range(len(doc))
+    page_kinds = {page_number: 'vector' for page_number in page_numbers}
+    image_kinds = {}
+    images = {}
+    for page_number, xref, width, height, colorspace, shown_width, coverage in _placements(doc, page_numbers):
+        # Los escaneos en color usan un objetivo menor que los grises: se compara con el mayor
+        dpi_target = ADAPTIVE_TARGETS['scan_gray' if coverage >= SCAN_COVERAGE else 'photo'][0]
+        target_width, _ = _target_size(width, height, shown_width, dpi_target)
+        kind = classify_image(doc, xref, width, colorspace, target_width, coverage)
+        if kind in ADAPTIVE_TARGETS:
+            dpi_target, quality = ADAPTIVE_TARGETS[kind]
+            target_width, target_height = _target_size(width, height, shown_width, dpi_target)
+            # Un escaneo en color que resulta no tener color se guarda en grises
+            _add_image(images, xref, (width, height, colorspace, target_width, target_height, quality,
+                                      kind == 'scan_color'))
+        # Una imagen (o página) con varios tipos se queda con el que más pesa
+        if PAGE_KINDS.index(kind) < PAGE_KINDS.index(image_kinds.get(xref, 'vector')):
+            image_kinds[xref] = kind
+        if PAGE_KINDS.index(kind) < PAGE_KINDS.index(page_kinds[page_number]):
+            page_kinds[page_number] = kind
+    return page_kinds, image_kinds, images
+
+
+def plan_images(doc, quality):
+    """Imágenes a recomprimir y su objetivo para un modo de calidad ('standard', 'low' o 'auto')."""
+    if quality == 'auto':
+        return classify_pages(doc)[2]
+    dpi_target, jpeg_quality = QUALITY_TARGETS.get(quality, QUALITY_TARGETS['standard'])
+    return collect_images(doc, dpi_target, jpeg_quality)
+
+
+def optimize_images(doc, images, workers=None, progress=None, is_cancelled=None):
+    """Recomprime en paralelo las imágenes de `doc` y las reescribe en su sitio.
+
+    `images` es el plan de plan_images (o collect_images). Las imágenes que
+    fallan o que no se reducen se dejan intactas. Se informa
+    progress(hechas, total) por cada imagen y se deja de trabajar en cuanto
+    is_cancelled() devuelve True. Devuelve el número de imágenes reemplazadas.
+    """
+    if not images:
+        return 0
+
+    workers = default_worker_count() if workers is None else workers
+    executor = None
+    if workers > 0 and len(images) >= MIN_IMAGES_FOR_POOL:
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    replaced = 0
+    processed = 0
+    total = len(images)
+    pending = list(images.items())
+    in_flight = {} # future -> (xref, tamaño_original)
+    try:
+        while pending or in_flight:
+            if is_cancelled and is_cancelled():
+                break
+            # Limitamos las imágenes en vuelo para acotar la memoria
+            while pending and len(in_flight) < max(1, workers * 2):
+                xref, (width, height, colorspace, target_width, target_height, quality, to_gray) = pending.pop()
+                payload = image_payload(doc, xref, width, height, colorspace)
+                original_size = stream_length(doc, xref)
+                if executor is None:
+                    result = _safe_recompress(payload, target_width, target_height, quality, to_gray)
+                    replaced += _replace_if_smaller(doc, xref, original_size, result)
+                    processed += 1
+                    if progress:
+                        progress(processed, total)
+                    # Una imagen por vuelta para comprobar la cancelación entre cada una
+                    break
+                future = executor.submit(recompress_image, payload, target_width, target_height, quality, to_gray)
+                in_flight[future] = (xref, original_size)
+
+            if not in_flight:
+                continue
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                xref, original_size = in_flight.pop(future)
+                processed += 1
+                if progress:
+                    progress(processed, total)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Advertencia: no se pudo recomprimir la imagen {xref} ({e}).")
+                    continue
+                replaced += _replace_if_smaller(doc, xref, original_size, result)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    return replaced
+
+
+def _safe_recompress(payload, target_width, target_height, quality, to_gray=False):
+    try:
+        return recompress_image(payload, target_width, target_height, quality, to_gray)
+    except Exception as e:
+        print(f"Advertencia: no se pudo recomprimir una imagen ({e}).")
+        return None
+
+
+def _replace_if_smaller(doc, xref, original_size, result):
+    """Escribe el JPEG directamente en el objeto de la imagen si ocupa menos.
+
+    Al reutilizar el mismo xref, todas las páginas que comparten la imagen
+    quedan actualizadas y no queda ningún objeto huérfano.
+    """
+    if not result or len(result[0]) >= original_size:
+        return 0
+    jpeg, width, height, components = result
+    doc.update_stream(xref, jpeg, compress=False)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if components == 1 else "/DeviceRGB")
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    doc.xref_set_key(xref, "DecodeParms", "null")
+    doc.xref_set_key(xref, "Decode", "null")
+    return 1
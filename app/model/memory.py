@@ -0,0 +1,118 @@
+import ctypes
+import os
+import re
+
+import fitz  # PyMuPDF
+
+# Presupuesto de memoria por defecto del espacio de trabajo (MB)
+DEFAULT_BUDGET_MB = 1024
+
+# Parte del presupuesto para los pixmaps de la vista; el resto queda para
+# la caché de MuPDF del proceso principal
+_THUMBNAILS_SHARE = 0.6
+
+# Parte del presupuesto a repartir entre las cachés de los procesos de
+# render, y el mínimo por proceso
+_RENDER_SHARE = 0.4
+_MIN_RENDER_PROCESS_BYTES = 128 * 1024 * 1024
+
+# Última línea de fz_debug_store: "max=..., size=..., actual size=..."
+_STORE_SIZE = re.compile(rb"max=(\d+), size=(\d+)")
+
+# Fuentes abiertas a la vez en el modelo; el resto se reabre al usarlas
+MAX_OPEN_SOURCES = 32
+
+
+class MemoryBudget:
+    """Reparte un presupuesto total (bytes) entre las partes que consumen memoria.
+
+    - thumbnail_bytes: pixmaps de la cuadrícula.
+    - store_bytes: caché de MuPDF del proceso principal.
+    - render_process_bytes(n): caché de MuPDF de cada uno de los n procesos de render.
+    """
+
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.thumbnail_bytes = int(total_bytes * _THUMBNAILS_SHARE)
+        self.store_bytes = total_bytes - self.thumbnail_bytes
+
+    @classmethod
+    def from_mb(cls, megabytes):
+        return cls(int(megabytes) * 1024 * 1024)
+
+    def render_process_bytes(self, workers):
+        return max(_MIN_RENDER_PROCESS_BYTES, int(self.total_bytes * _RENDER_SHARE / max(1, workers)))
+
+
+def _store_sizes():
+    """(máximo, tamaño) de la caché de MuPDF en bytes, o None si no se pueden leer.
+
+    fitz.TOOLS.store_size() devuelve None en PyMuPDF reciente, así que se
+    leen del resumen que MuPDF escribe con fz_debug_store.
+    """
+    try:
+        mupdf = fitz.mupdf
+        buffer = mupdf.fz_new_buffer(4096)
+        output = mupdf.FzOutput(buffer)
+        mupdf.fz_debug_store(output)
+        output.fz_close_output()
+        match = _STORE_SIZE.search(mupdf.fz_buffer_extract(buffer))
+    except (AttributeError, TypeError, RuntimeError):
+        return None
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def trim_store(limit_bytes):
+    """Reduce la caché interna de MuPDF si su tamaño supera `limit_bytes`.
+
+    Si no se puede medir la caché no se toca: la memoria del proceso incluye
+    también documentos y pixmaps, que tienen su propio presupuesto.
+    """
+    if limit_bytes is None:
+        return
+    sizes = _store_sizes()
+    if sizes is None or sizes[1] <= limit_bytes:
+        return
+    # fz_shrink_store deja la caché en un porcentaje de su máximo, no del tamaño actual
+    maximum = sizes[0]
+    keep = limit_bytes * 100 // maximum if maximum else 0
+    fitz.TOOLS.store_shrink(100 - min(100, keep))
+
+
+def process_memory():
+    """Memoria residente del proceso en bytes, o None si no se puede medir."""
+    if os.name == "nt":
+        return _windows_process_memory()
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def _windows_process_memory():
+    try:
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    except (AttributeError, OSError):
+        pass
+    return None
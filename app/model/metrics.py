@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Eventos que se conservan para exportar la traza (los más antiguos se descartan)
+MAX_TRACE_EVENTS = 50000
+
+
+class MetricsRegistry:
+    """Registro ligero de tiempos y medidores, seguro entre hilos.
+
+    - Duraciones (`span`, `record`): por nombre se acumulan cantidad, total,
+      máximo y último valor, y cada medición se guarda como evento de traza.
+    - Medidores (`gauge`): último valor y máximo (profundidad de colas,
+      memoria...).
+
+    La traza se exporta en el formato de Chrome (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, max_events=MAX_TRACE_EVENTS):
+        self.lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._events = deque(maxlen=max_events)
+        self._timings = {}
+        self._gauges = {}
+
+    def _now_us(self):
+        return (time.perf_counter() - self._origin) * 1e6
+
+    @contextmanager
+    def span(self, name, **args):
+        """Mide el bloque `with` y lo registra con el nombre dado."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, start=start, **args)
+
+    def record(self, name, seconds, start=None, **args):
+        """Registra una duración medida fuera del registro (p. ej. en otro proceso)."""
+        if start is None:
+            start = time.perf_counter() - seconds
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 1),
+            "dur": round(seconds * 1e6, 1),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self._events.append(event)
+            stats = self._timings.get(name)
+            if stats is None:
+                stats = self._timings[name] = {"count": 0, "total_s": 0.0, "max_s": 0.0, "last_s": 0.0}
+            stats["count"] += 1
+            stats["total_s"] += seconds
+            stats["max_s"] = max(stats["max_s"], seconds)
+            stats["last_s"] = seconds
+
+    def gauge(self, name, value):
+        """Actualiza un medidor; solo se guarda en la traza cuando cambia."""
+        with self.lock:
+            stats = self._gauges.get(name)
+            if stats is None:
+                stats = self._gauges[name] = {"value": None, "max": value}
+            if stats["value"] == value:
+                return
+            stats["value"] = value
+            stats["max"] = max(stats["max"], value)
+            self._events.append({"name": name, "ph": "C", "ts": round(self._now_us(), 1),
+                                 "tid": threading.get_ident(), "args": {"valor": value}})
+
+    def snapshot(self):
+        """Copia de las estadísticas: {'timings': {...}, 'gauges': {...}}."""
+        with self.lock:
+            return {
+                "timings": {name: dict(stats) for name, stats in self._timings.items()},
+                "gauges": {name: dict(stats) for name, stats in self._gauges.items()},
+            }
+
+    def reset(self):
+        with self.lock:
+            self._events.clear()
+            self._timings.clear()
+            self._gauges.clear()
+
+    def export_chrome_trace(self, path):
+        """Escribe la traza en formato JSON de Chrome. Devuelve el número de eventos."""
+        with self.lock:
+            events = list(self._events)
+        pid = os.getpid()
+        for event in events:
+            event["pid"] = pid
+        trace = {"traceEvents": events, "displayTimeUnit": "ms",
+                 "otherData": {"snapshot": self.snapshot()}}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
+        return len(events)
+
+
+# Registro global de la aplicación
+metrics = MetricsRegistry()
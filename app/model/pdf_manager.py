@@ -1,122 +1,709 @@
 import fitz  # PyMuPDF
 import io
 import os
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict, Counter
+from .memory import MAX_OPEN_SOURCES, trim_store
+from .metrics import metrics
+from .render import default_worker_count
+from .writer import SaveCancelled, save_document
+from .split import safe_filename, unique_names, write_parts
+from .fingerprint import page_digests, current_digests, find_duplicates
+from .project import write_project, read_project, file_stamp, ProjectAtlas
+from .text_index import TextIndex
+from .compression import CompressionAnalysis
+
+# Páginas máximas por llamada a insert_pdf al guardar (granularidad del progreso y la cancelación)
+SAVE_CHUNK_PAGES = 100
+
+# Páginas que se analizan por cada vez que se toma el lock (ver analyze_compression)
+ANALYSIS_BATCH_PAGES = 100
+
 
 class PDFModel:
-    def __init__(self):
-        self.current_doc = fitz.open()
-        self.page_mapping = []  # [(nombre_archivo, numero_pagina_original), ...]
-
-    def load_pdf(self, filepath):
-        """Carga un PDF y registra el origen de sus páginas."""
-        new_doc = fitz.open(filepath)
-        filename = os.path.basename(filepath)
-        page_count = len(new_doc)
-        
-        self.current_doc.insert_pdf(new_doc)
-        
-        for i in range(page_count):
-            self.page_mapping.append((filename, i + 1))
-            
-        new_doc.close()
+    """Espacio de trabajo virtual.
+
+    No se fusiona ningún PDF al cargar: cada archivo queda abierto como
+    "fuente" y el espacio de trabajo es una lista compacta de entradas
+    (id_fuente, pagina_base_0, rotacion_usuario). Borrar o rotar son
+    operaciones sobre esa lista; el PDF real solo se construye al guardar.
+
+    Para acotar la memoria solo se mantienen abiertas las `max_open_sources`
+    fuentes usadas más recientemente; las demás se cierran y se vuelven a
+    abrir desde su archivo cuando se necesitan.
+    """
+
+    def __init__(self, image_workers=None):
+        # Procesos para recomprimir imágenes al guardar (None = núcleos - 1, 0 = sin pool)
+        self.image_workers = image_workers
+        # id_fuente -> {'path': ruta, 'name': nombre_archivo, 'doc': documento_abierto o None, ...}
+        # (ver _register_source)
+        self.sources = {}
+        self._next_source_id = 0
+        # Límites de memoria (ver set_memory_limits)
+        self.max_open_sources = MAX_OPEN_SOURCES
+        self.document_memory_limit = None
+        # Fuentes abiertas, de la menos a la más usada, y las que no se pueden cerrar ahora
+        self._open_sources = OrderedDict()
+        self._pinned = set()
+        # [(id_fuente, pagina_base_0, rotacion_usuario), ...]
+        self.pages = []
+        # Los documentos fuente se leen desde varios hilos: serializamos su acceso
+        self.lock = threading.RLock()
+        # Texto de las páginas para buscar (lo llena el hilo de indexado, ver page_texts)
+        self.text_index = TextIndex()
+
+    def load_pdf(self, filepath, doc=None, digests=None):
+        """Registra un PDF como fuente y agrega sus páginas al espacio de trabajo.
+
+        Si se recibe `doc` (ya abierto por el hilo de carga) se conserva tal
+        cual, sin volver a parsear el archivo. `digests` son las huellas
+        exactas de sus páginas si ya se calcularon (ver fingerprint.page_digests);
+        si no, se calculan al buscar duplicados. Devuelve el rango de índices
+        de las nuevas páginas.
+        """
+        if doc is None:
+            with metrics.span("modelo.abrir", archivo=os.path.basename(filepath)):
+                doc = fitz.open(filepath)
+        page_count = len(doc)
+
+        with self.lock:
+            source_id = self._register_source(filepath, doc, page_count, digests)
+            start_index = len(self.pages)
+            self.pages.extend((source_id, i, 0) for i in range(page_count))
+        return range(start_index, start_index + page_count)
+
+    def _register_source(self, filepath, doc, page_count, digests=None):
+        """Agrega una fuente (llamar con el lock). Con `doc=None` se abrirá al necesitarla."""
+        source_id = self._next_source_id
+        self._next_source_id += 1
+        self.sources[source_id] = {
+            'path': filepath,
+            'name': os.path.basename(filepath),
+            'doc': doc,
+            'page_count': page_count,
+            # Huellas exactas por página y firmas visuales {pagina: firma} (ver fingerprint)
+            'digests': digests,
+            'signatures': {},
+        }
+        if doc is not None:
+            self._open_sources[source_id] = None
+            self._close_idle_sources()
+        return source_id
+
+    def save_project(self, path, order, thumbnails):
+        """Guarda el espacio de trabajo en el orden `order` como proyecto (ver project.py).
+
+        `thumbnails` es {indice: (miniatura_cruda, escala)} con las miniaturas
+        que ya tiene la vista; se guardan en el atlas del proyecto.
+        """
+        with self.lock:
+            positions = {}
+            sources = []
+            pages = []
+            for index in order:
+                source_id, page_number, rotation = self.pages[index]
+                if source_id not in positions:
+                    positions[source_id] = len(sources)
+                    source = self.sources[source_id]
+                    sources.append({'path': source['path'], 'name': source['name'],
+                                    'pages': source['page_count'], 'digests': source['digests']})
+                pages.append((positions[source_id], page_number, rotation))
+        atlas = {position: thumbnails[index] for position, index in enumerate(order) if index in thumbnails}
+        with metrics.span("proyecto.guardar", paginas=len(pages), miniaturas=len(atlas)):
+            write_project(path, sources, pages, atlas)
+
+    def load_project(self, path):
+        """Reemplaza el espacio de trabajo por el de un proyecto.
+
+        Las fuentes se registran sin abrirlas: se abren al renderizar o
+        guardar. Solo se reabre ahora una fuente que cambió desde que se
+        guardó el proyecto, para saber cuántas páginas tiene; sus miniaturas
+        guardadas se descartan. Devuelve (atlas o None, avisos).
+        """
+        header, atlas_offset = read_project(path)
+        self.clear()
+        warnings = []
+        with self.lock, metrics.span("proyecto.abrir", paginas=len(header["pages"])):
+            source_ids = []
+            unchanged = set()
+            for source in header["sources"]:
+                source_path = source["path"]
+                page_count = source["pages"]
+                digests = current_digests(source["digests"])
+                try:
+                    changed = file_stamp(source_path) != source["stamp"]
+                    if changed:
+                        with fitz.open(source_path) as doc:
+                            page_count = len(doc)
+                        digests = None
+                        warnings.append(f"{source['name']} cambió desde que se guardó el proyecto.")
+                except Exception as e:
+                    warnings.append(f"No se pudo abrir {source_path}: {e}")
+                    source_ids.append(None)
+                    continue
+                source_id = self._register_source(source_path, None, page_count, digests)
+                source_ids.append(source_id)
+                if not changed:
+                    unchanged.add(source_id)
+
+            entries = {}
+            stamps = {self.sources[source_ids[position]]['path']: source["stamp"]
+                      for position, source in enumerate(header["sources"]) if source_ids[position] in unchanged}
+            for (position, page_number, rotation), atlas_entry in zip(header["pages"], header["atlas"]):
+                source_id = source_ids[position]
+                if source_id is None or page_number >= self.sources[source_id]['page_count']:
+                    continue
+                self.pages.append((source_id, page_number, rotation))
+                if atlas_entry and source_id in unchanged:
+                    entries[(self.sources[source_id]['path'], page_number, rotation)] = atlas_entry
+        atlas = ProjectAtlas(path, atlas_offset, entries, stamps) if entries else None
+        return atlas, warnings
+
+    def clear(self):
+        """Vacía el espacio de trabajo y cierra las fuentes."""
+        with self.lock:
+            for source in self.sources.values():
+                if source['doc'] is not None:
+                    source['doc'].close()
+            self.sources = {}
+            self._open_sources.clear()
+            self.pages = []
+            self.text_index.clear()
+
+    def set_memory_limits(self, store_bytes, max_open_sources=MAX_OPEN_SOURCES):
+        """Acota la caché de MuPDF (bytes, None = sin límite; ver trim_store) y las fuentes abiertas."""
+        with self.lock:
+            self.document_memory_limit = store_bytes
+            self.max_open_sources = max(1, max_open_sources)
+        self.trim_memory()
+
+    def trim_memory(self):
+        """Cierra las fuentes sobrantes y reduce la caché de MuPDF hasta el límite."""
+        with self.lock:
+            self._close_idle_sources()
+            trim_store(self.document_memory_limit)
+
+    def get_open_source_count(self):
+        return len(self._open_sources)
+
+    def _source_doc(self, source_id):
+        """Documento de una fuente, reabriéndolo si se había cerrado (llamar con el lock)."""
+        source = self.sources[source_id]
+        if source['doc'] is None:
+            source['doc'] = fitz.open(source['path'])
+        self._open_sources[source_id] = None
+        self._open_sources.move_to_end(source_id)
+        self._close_idle_sources()
+        return source['doc']
+
+    def _close_idle_sources(self):
+        for source_id in list(self._open_sources):
+            if len(self._open_sources) <= self.max_open_sources:
+                break
+            if source_id in self._pinned:
+                continue
+            del self._open_sources[source_id]
+            source = self.sources[source_id]
+            source['doc'].close()
+            source['doc'] = None
 
     def get_page_count(self):
-        return len(self.current_doc)
+        return len(self.pages)
 
-    def get_page_image(self, page_index):
-        if page_index < 0 or page_index >= len(self.current_doc):
-            return None
-        page = self.current_doc.load_page(page_index)
-        # Mantenemos la escala 0.3 para optimizar memoria en la vista
-        pix = page.get_pixmap(matrix=fitz.Matrix(0.3, 0.3))
-        return pix.tobytes("png")
+    def get_page_source(self, index):
+        """Devuelve (ruta_archivo, pagina_base_0, rotacion_usuario) para renderizar fuera del modelo."""
+        if 0 <= index < len(self.pages):
+            source_id, page_number, rotation = self.pages[index]
+            return self.sources[source_id]['path'], page_number, rotation
+        return None
 
     def get_page_label(self, index):
         """Genera la etiqueta para la vista."""
-        if 0 <= index < len(self.page_mapping):
-            fname, pnum = self.page_mapping[index]
+        if 0 <= index < len(self.pages):
+            source_id, page_number, _ = self.pages[index]
+            fname = self.sources[source_id]['name']
             if len(fname) > 15:
                 fname = fname[:12] + "..."
-            return f"{fname}\nPág {pnum}"
+            return f"{fname}\nPág {page_number + 1}"
         return f"Pág {index + 1}"
 
-    def reorder_and_save(self, new_order_indices, output_path, quality='standard'):
+    def _source_digests(self, source_id):
+        """Huellas exactas de las páginas de una fuente, calculándolas si faltan (llamar con el lock)."""
+        source = self.sources[source_id]
+        if source['digests'] is None:
+            source['digests'] = page_digests(self._source_doc(source_id))
+        return source['digests']
+
+    def get_missing_digests(self, indices):
+        """Fuentes de `indices` sin huellas exactas: [(id_fuente, ruta), ...]."""
+        with self.lock:
+            source_ids = dict.fromkeys(self.pages[index][0] for index in indices)
+            return [(source_id, self.sources[source_id]['path']) for source_id in source_ids
+                    if self.sources[source_id]['digests'] is None]
+
+    def set_source_digests(self, source_id, digests):
+        with self.lock:
+            source = self.sources.get(source_id)
+            if source is not None and source['digests'] is None:
+                source['digests'] = digests
+
+    def get_missing_signatures(self, indices):
+        """Páginas de `indices` sin firma visual, agrupadas: [(id_fuente, ruta, [paginas]), ...]."""
+        missing = {}
+        with self.lock:
+            for index in indices:
+                source_id, page_number, _ = self.pages[index]
+                source = self.sources[source_id]
+                if page_number not in source['signatures']:
+                    missing.setdefault(source_id, (source['path'], set()))[1].add(page_number)
+        return [(source_id, path, sorted(page_numbers)) for source_id, (path, page_numbers) in missing.items()]
+
+    def set_page_signatures(self, source_id, page_numbers, signatures):
+        with self.lock:
+            source = self.sources.get(source_id)
+            if source is not None:
+                source['signatures'].update(zip(page_numbers, signatures))
+
+    def find_duplicate_pages(self, indices):
+        """Páginas repetidas en el orden `indices` (ver fingerprint.find_duplicates).
+
+        Devuelve [(indice, indice_original, tipo)]: la primera aparición se
+        conserva. La rotación de usuario cuenta: una copia girada no es igual.
         """
-        Guarda el PDF con estrategia de 'Doble Fallback' para archivos corruptos.
+        entries = []
+        with self.lock, metrics.span("modelo.duplicados", paginas=len(indices)):
+            for index in indices:
+                source_id, page_number, rotation = self.pages[index]
+                digest = self._source_digests(source_id)[page_number]
+                signature = self.sources[source_id]['signatures'].get(page_number)
+                if digest is not None:
+                    digest = f"{digest}:{rotation}"
+                if signature is not None:
+                    signature = (signature[0], (signature[1], rotation))
+                entries.append((index, digest, signature))
+            return find_duplicates(entries)
+
+    def find_duplicate_files(self, indices):
+        """Archivos cargados más de una vez: [(nombre, nombre_original)].
+
+        Dos fuentes son el mismo archivo si tienen las mismas huellas de
+        página en el mismo orden. Solo se miran las fuentes usadas en `indices`.
         """
-        new_doc = fitz.open()
-        
-        # 1. Construir nuevo documento
+        duplicates = []
+        seen = {}
+        with self.lock:
+            source_ids = list(dict.fromkeys(self.pages[index][0] for index in indices))
+            for source_id in source_ids:
+                digests = tuple(self._source_digests(source_id))
+                if None in digests:
+                    continue
+                original = seen.setdefault(digests, source_id)
+                if original != source_id:
+                    duplicates.append((self.sources[source_id]['name'], self.sources[original]['name']))
+        return duplicates
+
+    def get_source_ids(self):
+        """Fuentes con páginas en el espacio de trabajo."""
+        with self.lock:
+            return list(dict.fromkeys(source_id for source_id, _, _ in self.pages))
+
+    def get_unindexed_pages(self, source_id):
+        """Páginas de una fuente cuyo texto aún no está en el índice de búsqueda."""
+        with self.lock:
+            source = self.sources.get(source_id)
+            if source is None:
+                return []
+            page_count = source['page_count']
+        indexed = self.text_index.indexed_pages(source_id)
+        return [page_number for page_number in range(page_count) if page_number not in indexed]
+
+    def page_texts(self, source_id, page_numbers):
+        """Texto extraíble de varias páginas de una fuente (usa el documento ya abierto)."""
+        with self.lock:
+            if source_id not in self.sources:
+                return None
+            doc = self._source_doc(source_id)
+            return [doc.load_page(page_number).get_text("text") for page_number in page_numbers]
+
+    def search_text(self, query):
+        """Índices del espacio de trabajo cuyas páginas contienen `query` (ver TextIndex.search).
+
+        Devuelve None si la consulta está vacía. Las páginas aún sin indexar no aparecen.
+        """
+        with metrics.span("busqueda.texto"):
+            keys = self.text_index.search(query)
+            if not keys:
+                return keys if keys is None else []
+            with self.lock:
+                return [index for index, (source_id, page_number, _) in enumerate(self.pages)
+                        if (source_id, page_number) in keys]
+
+    def _page_runs(self, new_order_indices):
+        """Agrupa el orden en tramos que se copian con una sola llamada a insert_pdf.
+
+        Un tramo son páginas consecutivas (hacia adelante o hacia atrás) de la
+        misma fuente y con la misma rotación. Devuelve tuplas
+        (id_fuente, pagina_desde, pagina_hasta, rotacion).
+        """
+        runs = []
         for index in new_order_indices:
-            new_doc.insert_pdf(self.current_doc, from_page=index, to_page=index)
-            
-        # Variables de control
-        warning_msg = ""
-        
-        # Valores por defecto según calidad
-        garbage_level = 0
-        deflate_option = True
-
-        # 2. INTENTO DE OPTIMIZACIÓN (rewrite_images)
-        # Solo intentamos si no es calidad Alta
-        if quality != 'high':
-            try:
-                if quality == 'low':
-                    # 72 DPI, Calidad 50
-                    new_doc.rewrite_images(dpi_target=72, quality=50, bitonal=False)
-                    garbage_level = 4
-                else: # standard
-                    # 150 DPI, Calidad 75
-                    new_doc.rewrite_images(dpi_target=150, quality=75)
-                    garbage_level = 3
-                    
-            except Exception as e:
-                # Si falla la re-compresión, abortamos optimización y bajamos a modo seguro
-                print(f"Advertencia: Falló rewrite_images ({e}). Se usará modo seguro.")
-                warning_msg = " (Sin optimización de imagen por error interno)"
-                garbage_level = 0
-                deflate_option = False # No comprimir si ya dio error
-        else:
-            # Calidad Alta
-            garbage_level = 1
-            deflate_option = True
-
-        # 3. INTENTO DE GUARDADO (save)
-        # Aquí es donde fallaba antes si garbage=4 tocaba el stream roto
+            source_id, page_number, rotation = self.pages[index]
+            if runs:
+                run_source, run_from, run_to, run_rotation = runs[-1]
+                if run_source == source_id and run_rotation == rotation:
+                    if run_from == run_to:
+                        # Tramo de una sola página: admite cualquiera de los dos sentidos
+                        extends = page_number in (run_to + 1, run_to - 1)
+                    elif run_to > run_from:
+                        extends = page_number == run_to + 1
+                    else:
+                        extends = page_number == run_to - 1
+                    if extends:
+                        runs[-1] = (source_id, run_from, page_number, rotation)
+                        continue
+            runs.append((source_id, page_number, page_number, rotation))
+        return runs
+
+    def build_document(self, new_order_indices, progress=None, is_cancelled=None):
+        """Materializa el espacio de trabajo en un documento nuevo con el orden dado.
+
+        Las páginas se copian por tramos (ver `_page_runs`) y los objetos ya
+        copiados de cada fuente se reutilizan entre tramos, así los recursos
+        compartidos (fuentes, imágenes) no se duplican. Los tramos largos se
+        copian en bloques de SAVE_CHUNK_PAGES para poder informar el progreso
+        con progress('pages', hechas, total) y atender la cancelación.
+        """
+        chunks = []
+        for source_id, from_page, to_page, rotation in self._page_runs(new_order_indices):
+            step = 1 if to_page >= from_page else -1
+            while True:
+                chunk_to = from_page + step * (SAVE_CHUNK_PAGES - 1)
+                if (to_page - chunk_to) * step <= 0:
+                    chunks.append((source_id, from_page, to_page, rotation))
+                    break
+                chunks.append((source_id, from_page, chunk_to, rotation))
+                from_page = chunk_to + step
+        last_chunk_of_source = {}
+        for i, chunk in enumerate(chunks):
+            last_chunk_of_source[chunk[0]] = i
+
+        total = len(new_order_indices)
+        started = time.perf_counter()
+        new_doc = fitz.open()
+        # Las fuentes del guardado no se cierran hasta terminar: insert_pdf
+        # reutiliza entre bloques lo ya copiado de cada documento
+        pinned = set(last_chunk_of_source) - self._pinned
+        with self.lock:
+            self._pinned |= pinned
         try:
-            new_doc.save(output_path, garbage=garbage_level, deflate=deflate_option)
-            
-        except Exception as e:
-            # BLOQUE DE SEGURIDAD CRÍTICO
-            print(f"Error al guardar optimizado ({e}). Intentando guardado RAW...")
-            try:
-                # Fallback final: Guardado CRUDO.
-                # garbage=0: No toca estructura.
-                # deflate=False: No intenta descomprimir/recomprimir streams.
-                # clean=False: No intenta sanear el PDF.
-                new_doc.save(output_path, garbage=0, deflate=False, clean=False)
-                warning_msg = " (Guardado en modo RAW por corrupción en archivo original)"
-            except Exception as e2:
-                # Si esto falla, el archivo es insalvable
-                new_doc.close()
-                raise RuntimeError(f"Imposible guardar el archivo: {e2}")
-
-        new_doc.close()
-        
+            for i, (source_id, from_page, to_page, rotation) in enumerate(chunks):
+                if is_cancelled and is_cancelled():
+                    raise SaveCancelled()
+                with self.lock:
+                    start = len(new_doc)
+                    new_doc.insert_pdf(self._source_doc(source_id), from_page=from_page, to_page=to_page,
+                                       final=(last_chunk_of_source[source_id] == i))
+                if rotation:
+                    for page_index in range(start, len(new_doc)):
+                        page = new_doc[page_index]
+                        page.set_rotation((page.rotation + rotation) % 360)
+                if progress:
+                    progress('pages', len(new_doc), total)
+        except BaseException:
+            new_doc.close()
+            raise
+        finally:
+            with self.lock:
+                self._pinned -= pinned
+                self.trim_memory()
+        metrics.record("guardado.montaje", time.perf_counter() - started, start=started,
+                       paginas=total, bloques=len(chunks))
+        return new_doc
+
+    def reorder_and_save(self, new_order_indices, output_path, quality='standard',
+                         progress=None, is_cancelled=None):
+        """
+        Guarda el PDF con estrategia de 'Doble Fallback' para archivos corruptos.
+
+        El guardado avanza por etapas ('pages', 'images', 'write') que se
+        informan con progress(etapa, hechas, total); total 0 indica una etapa
+        sin progreso medible. Si is_cancelled() devuelve True se lanza
+        SaveCancelled. Se escribe en un temporal junto al destino que solo
+        reemplaza al archivo final si todo salió bien.
+        """
+        # 1. Construir nuevo documento a partir de las fuentes
+        new_doc = self.build_document(new_order_indices, progress, is_cancelled)
+        try:
+            # 2. Optimizar y escribir (ver writer.save_document)
+            warning_msg = save_document(new_doc, output_path, quality, self.image_workers,
+                                        progress, is_cancelled)
+        finally:
+            new_doc.close()
+
         return "Archivo guardado correctamente" + warning_msg
 
+    def analyze_compression(self, new_order_indices, progress=None, is_cancelled=None):
+        """Clasifica las páginas a guardar y estima tamaño y tiempo en cada calidad.
+
+        Se leen las fuentes ya abiertas, sin montar el documento. Informa
+        progress('analysis', hechas, total) y lanza SaveCancelled si
+        is_cancelled() devuelve True. Devuelve CompressionAnalysis.report().
+        """
+        by_source = {}
+        with self.lock:
+            for index in new_order_indices:
+                source_id, page_number, _ = self.pages[index]
+                by_source.setdefault(source_id, Counter())[page_number] += 1
+
+        analysis = CompressionAnalysis()
+        total = len(new_order_indices)
+        done = 0
+        with metrics.span("analisis.compresion", paginas=total):
+            for source_id, page_counts in by_source.items():
+                page_numbers = sorted(page_counts)
+                for start in range(0, len(page_numbers), ANALYSIS_BATCH_PAGES):
+                    if is_cancelled and is_cancelled():
+                        raise SaveCancelled()
+                    batch = {page_number: page_counts[page_number]
+                             for page_number in page_numbers[start:start + ANALYSIS_BATCH_PAGES]}
+                    with self.lock:
+                        doc = self._source_doc(source_id)
+                        if start == 0:
+                            path = self.sources[source_id]['path']
+                            analysis.add_file(doc, os.path.getsize(path), len(page_numbers))
+                        samples = analysis.add_pages(source_id, doc, batch)
+                    # Las muestras se recomprimen sin el lock: no frenan las miniaturas
+                    analysis.measure(samples)
+                    done += sum(batch.values())
+                    if progress:
+                        progress('analysis', done, total)
+        workers = default_worker_count() if self.image_workers is None else self.image_workers
+        return analysis.report(workers)
+
+    def split_order(self, order, mode, pages_per_file=1, prefix="parte"):
+        """Parte el orden en documentos de salida según `mode` (ver split.SPLIT_MODES).
+
+        - 'pages': cada `pages_per_file` páginas, con nombres prefijo_001, prefijo_002...
+        - 'bookmarks': un documento por marcador de primer nivel de cada
+          fuente; las páginas previas al primero llevan el nombre del archivo.
+        - 'source': un documento por tramo de páginas seguidas del mismo archivo.
+
+        Devuelve [(nombre_sin_extension, [indices])] con nombres únicos. Lanza
+        ValueError si el orden no se puede dividir de esa forma.
+        """
+        if mode == 'pages':
+            if pages_per_file < 1:
+                raise ValueError("Las partes deben tener al menos una página.")
+            groups = [order[i:i + pages_per_file] for i in range(0, len(order), pages_per_file)]
+            width = max(3, len(str(len(groups))))
+            prefix = safe_filename(prefix)
+            return [(f"{prefix}_{number:0{width}d}", group) for number, group in enumerate(groups, 1)]
+        if mode not in ('bookmarks', 'source'):
+            raise ValueError(f"Forma de dividir desconocida: {mode}")
+
+        groups = []
+        names = []
+        bookmarks = {}
+        current_key = None
+        with self.lock:
+            for index in order:
+                source_id, page_number, _ = self.pages[index]
+                title = None
+                key = (source_id, None)
+                if mode == 'bookmarks':
+                    if source_id not in bookmarks:
+                        bookmarks[source_id] = self._bookmark_starts(source_id)
+                    starts, titles = bookmarks[source_id]
+                    position = bisect_right(starts, page_number) - 1
+                    if position >= 0:
+                        key, title = (source_id, position), titles[position]
+                if groups and key == current_key:
+                    groups[-1].append(index)
+                    continue
+                current_key = key
+                groups.append([index])
+                stem = os.path.splitext(self.sources[source_id]['name'])[0]
+                names.append(safe_filename(title or stem))
+        if mode == 'bookmarks' and not any(starts for starts, _ in bookmarks.values()):
+            raise ValueError("Ninguno de los archivos tiene marcadores.")
+        return list(zip(unique_names(names), groups))
+
+    def _bookmark_starts(self, source_id):
+        """([pagina_base_0], [titulo]) de los marcadores de primer nivel de una fuente, por página."""
+        starts = sorted((page - 1, title) for level, title, page in self._source_doc(source_id).get_toc(simple=True)
+                        if level == 1 and page >= 1)
+        return [page for page, _ in starts], [title for _, title in starts]
+
+    def split_and_save(self, groups, directory, quality='standard', progress=None, is_cancelled=None):
+        """Guarda cada grupo (nombre, índices) de `split_order` como un PDF en `directory`.
+
+        Con más de un proceso disponible las partes se escriben a la vez en
+        un pool (ver split.write_parts): cada trabajador parsea cada fuente
+        una sola vez para todas sus partes. Si no, se montan aquí a partir de
+        las fuentes ya abiertas del modelo. Se aplica la misma calidad que al
+        guardar un solo PDF. Informa progress('files', hechas, total) y lanza
+        SaveCancelled(partes_escritas) si is_cancelled() devuelve True; las
+        partes ya escritas quedan completas en disco.
+        """
+        targets = [(os.path.join(directory, name + ".pdf"), indices) for name, indices in groups]
+        with self.lock:
+            source_paths = set(os.path.normcase(os.path.abspath(source['path'])) for source in self.sources.values())
+        for path, _ in targets:
+            if os.path.normcase(os.path.abspath(path)) in source_paths:
+                raise ValueError(f"{os.path.basename(path)} reemplazaría a uno de los archivos de origen. "
+                                 "Elija otra carpeta.")
+        workers = default_worker_count() if self.image_workers is None else self.image_workers
+        with metrics.span("division.total", partes=len(targets), procesos=workers):
+            if workers > 1 and len(targets) > 1:
+                with self.lock:
+                    parts = [(path, [(self.sources[source_id]['path'], from_page, to_page, rotation)
+                                     for source_id, from_page, to_page, rotation in self._page_runs(indices)])
+                             for path, indices in targets]
+                written, failed = write_parts(parts, quality, workers, progress, is_cancelled)
+            else:
+                written, failed = {}, {}
+                for path, indices in targets:
+                    if is_cancelled and is_cancelled():
+                        raise SaveCancelled(len(written))
+                    try:
+                        new_doc = self.build_document(indices, is_cancelled=is_cancelled)
+                        try:
+                            written[path] = save_document(new_doc, path, quality, self.image_workers,
+                                                          is_cancelled=is_cancelled)
+                        finally:
+                            new_doc.close()
+                    except SaveCancelled:
+                        raise SaveCancelled(len(written))
+                    except Exception as e:
+                        failed[path] = str(e) or type(e).__name__
+                    if progress:
+                        progress('files', len(written) + len(failed), len(targets))
+
+        if failed and not written:
+            raise RuntimeError(f"No se pudo guardar ninguna parte: {next(iter(failed.values()))}")
+        message = f"Se guardaron {len(written)} archivos en {directory}"
+        with_warnings = sum(1 for warning in written.values() if warning)
+        if with_warnings:
+            message += f"\nAdvertencia: {with_warnings} archivos se guardaron sin optimizar."
+        if failed:
+            names = ", ".join(os.path.basename(path) for path in list(failed)[:5])
+            message += f"\nAdvertencia: no se pudieron guardar {len(failed)} archivos ({names})."
+        return message
+
+    def can_save_incrementally(self, new_order_indices):
+        """Indica si el orden se puede guardar como actualización incremental del original.
+
+        Es posible cuando todas las páginas vienen de una sola fuente y
+        conservan su orden original (solo hay rotaciones y páginas borradas).
+        """
+        if not new_order_indices:
+            return False
+        source_ids = set(self.pages[i][0] for i in new_order_indices)
+        if len(source_ids) != 1:
+            return False
+        page_numbers = [self.pages[i][1] for i in new_order_indices]
+        if any(b <= a for a, b in zip(page_numbers, page_numbers[1:])):
+            return False
+        with self.lock:
+            doc = self._source_doc(source_ids.pop())
+        return not doc.is_encrypted and bool(doc.can_save_incrementally())
+
+    def save_incremental(self, new_order_indices, progress=None, is_cancelled=None):
+        """Añade las rotaciones y los borrados al final del PDF original.
+
+        El coste es proporcional a los cambios y no al tamaño del archivo. Las
+        rotaciones quedan incorporadas en el documento, así que el espacio de
+        trabajo se renumera y sus rotaciones de usuario vuelven a 0.
+        """
+        if not self.can_save_incrementally(new_order_indices):
+            raise RuntimeError("Los cambios no se pueden guardar de forma incremental.")
+        if is_cancelled and is_cancelled():
+            raise SaveCancelled()
+
+        with self.lock:
+            source_id = self.pages[new_order_indices[0]][0]
+            source = self.sources[source_id]
+            doc = self._source_doc(source_id)
+            kept = {self.pages[i][1]: self.pages[i][2] for i in new_order_indices}
+            rotated = [(page_number, rotation) for page_number, rotation in kept.items() if rotation]
+            for done, (page_number, rotation) in enumerate(rotated, 1):
+                page = doc[page_number]
+                page.set_rotation((page.rotation + rotation) % 360)
+                if progress:
+                    progress('pages', done, len(rotated))
+            deleted = [page_number for page_number in range(len(doc)) if page_number not in kept]
+            if deleted:
+                doc.delete_pages(deleted)
+
+            # A partir de aquí el original se modifica: ya no se atiende la cancelación
+            if progress:
+                progress('write', 0, 0)
+            try:
+                with metrics.span("guardado.incremental", rotadas=len(rotated), borradas=len(deleted)):
+                    doc.saveIncr()
+            except Exception as e:
+                # El documento en memoria ya tiene los cambios: se recarga desde disco
+                doc.close()
+                source['doc'] = fitz.open(source['path'])
+                raise RuntimeError(f"Imposible guardar el archivo: {e}")
+
+            # Las huellas ya no corresponden a la numeración nueva
+            source['page_count'] = len(doc)
+            source['digests'] = None
+            source['signatures'] = {}
+            new_numbers = {page_number: i for i, page_number in enumerate(sorted(kept))}
+            self.pages = [(sid, new_numbers.get(page_number, page_number), 0) if sid == source_id
+                          else (sid, page_number, rotation)
+                          for sid, page_number, rotation in self.pages]
+            self.text_index.renumber_source(source_id, new_numbers)
+        return f"Cambios guardados en {source['name']}"
+
     def delete_page(self, index):
-        self.current_doc.delete_page(index)
-        if 0 <= index < len(self.page_mapping):
-            self.page_mapping.pop(index)
+        self.delete_pages([index])
 
-    def rotate_page(self, page_index, clockwise=True):
-        if page_index < 0 or page_index >= len(self.current_doc):
+    def delete_pages(self, indices):
+        """Borra varias páginas del espacio de trabajo (índices en el orden del modelo)."""
+        to_delete = sorted(set(i for i in indices if 0 <= i < len(self.pages)), reverse=True)
+        if not to_delete:
             return
-        page = self.current_doc[page_index]
-        current_rot = page.rotation
-        if clockwise:
-            new_rot = (current_rot + 90) % 360
-        else:
-            new_rot = (current_rot - 90) % 360
-        page.set_rotation(new_rot)
\ No newline at end of file
+        with self.lock, metrics.span("modelo.borrar", paginas=len(to_delete)):
+            # Borramos por rangos contiguos, de atrás hacia adelante
+            while to_delete:
+                last = first = to_delete.pop(0)
+                while to_delete and to_delete[0] == first - 1:
+                    first = to_delete.pop(0)
+                del self.pages[first:last + 1]
+
+    def get_pages(self, indices):
+        """Entradas (fuente, página, rotación) de las páginas `indices`, para poder reinsertarlas."""
+        with self.lock:
+            return [self.pages[index] for index in indices]
+
+    def insert_pages(self, indices, pages):
+        """Reinserta páginas quitadas con `delete_pages`, cada una en su índice de entonces."""
+        with self.lock, metrics.span("modelo.insertar", paginas=len(indices)):
+            # Por rangos contiguos y en orden ascendente: cada página cae en su posición final
+            pending = sorted(zip(indices, pages))
+            start = 0
+            while start < len(pending):
+                end = start + 1
+                while end < len(pending) and pending[end][0] == pending[end - 1][0] + 1:
+                    end += 1
+                first = pending[start][0]
+                self.pages[first:first] = [page for _, page in pending[start:end]]
+                start = end
+
+    def rotate_page(self, page_index, clockwise=True):
+        self.rotate_pages([page_index], clockwise)
+
+    def rotate_pages(self, indices, clockwise=True):
+        """Gira 90° varias páginas del espacio de trabajo en una sola operación."""
+        step = 90 if clockwise else -90
+        with self.lock, metrics.span("modelo.rotar", paginas=len(indices)):
+            for page_index in indices:
+                if 0 <= page_index < len(self.pages):
+                    source_id, page_number, rotation = self.pages[page_index]
+                    self.pages[page_index] = (source_id, page_number, (rotation + step) % 360)
\ No newline at end of file
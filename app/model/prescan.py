@@ -0,0 +1,42 @@
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+
+# Archivos por tarea al repartir el pre-escaneo entre procesos
+SCAN_CHUNK = 8
+
+
+def scan_pdf(path):
+    """Lectura rápida de un PDF: número de páginas y cifrado.
+
+    No se carga ninguna página (solo el árbol de páginas), así sirve para
+    dimensionar un trabajo antes de la carga completa. Devuelve un dict con
+    'path', 'pages', 'encrypted', 'needs_pass' y 'error' (None o el mensaje
+    si no se pudo leer).
+    """
+    info = {'path': path, 'pages': 0, 'encrypted': False, 'needs_pass': False, 'error': None}
+    try:
+        with fitz.open(path) as doc:
+            info['encrypted'] = bool(doc.is_encrypted)
+            info['needs_pass'] = bool(doc.needs_pass)
+            if info['needs_pass']:
+                info['error'] = "El PDF está protegido con contraseña"
+                return info
+            info['pages'] = len(doc)
+    except Exception as e:
+        info['error'] = str(e) or type(e).__name__
+    return info
+
+
+def scan_pdfs(paths, executor=None):
+    """Pre-escanea varios PDFs, en paralelo si se recibe un pool de procesos.
+
+    Conserva el orden de `paths`. Si el pool no está disponible se escanea
+    en el hilo que llama.
+    """
+    if executor is not None and len(paths) > 1:
+        try:
+            return list(executor.map(scan_pdf, paths, chunksize=SCAN_CHUNK))
+        except (BrokenProcessPool, RuntimeError) as e:
+            print(f"Pre-escaneo en paralelo no disponible ({e}). Se escanea en el hilo.")
+    return [scan_pdf(path) for path in paths]
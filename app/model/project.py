@@ -0,0 +1,146 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+
+from .thumbnail_cache import default_cache_dir
+
+# Extensión de los archivos de proyecto
+PROJECT_EXTENSION = ".pdfmproj"
+PROJECT_VERSION = 1
+# Compresión zlib del atlas: el nivel 1 comprime ~16 veces más rápido que
+# codificar JPEG y deja guardar miles de miniaturas sin bloquear la interfaz
+ATLAS_COMPRESSION = 1
+
+# Firma y longitud de la cabecera JSON; tras ella va el atlas de miniaturas
+_MAGIC = b"PMPROJ01"
+_PREFIX = struct.Struct("<8sQ")
+
+
+def default_session_path():
+    """Proyecto donde se guarda automáticamente la última sesión."""
+    return os.path.join(os.path.dirname(default_cache_dir()), "ultima_sesion" + PROJECT_EXTENSION)
+
+
+def file_stamp(path):
+    """(tamaño, mtime_ns) del archivo, para saber si cambió desde que se guardó el proyecto."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_project(path, sources, pages, thumbnails):
+    """Escribe un proyecto.
+
+    - `sources`: [{'path', 'name', 'pages', 'digests'}], en el orden en que se referencian.
+    - `pages`: [(indice_fuente, pagina_base_0, rotacion_usuario)] en el orden de la vista.
+    - `thumbnails`: {posicion_en_pages: (miniatura_cruda, escala)}; sus muestras se
+      guardan comprimidas, una tras otra, en el atlas.
+
+    Se escribe en un temporal que luego reemplaza al destino.
+    """
+    blobs = []
+    atlas = []
+    offset = 0
+    for position in range(len(pages)):
+        entry = thumbnails.get(position)
+        if entry is None:
+            atlas.append(None)
+            continue
+        (width, height, stride, samples), scale = entry
+        data = zlib.compress(samples, ATLAS_COMPRESSION)
+        blobs.append(data)
+        atlas.append([offset, len(data), scale, width, height, stride])
+        offset += len(data)
+
+    header = {
+        "version": PROJECT_VERSION,
+        "sources": [{"path": os.path.abspath(source['path']), "name": source['name'],
+                     "stamp": file_stamp(source['path']), "pages": source['pages'],
+                     "digests": source['digests']} for source in sources],
+        "pages": [list(page) for page in pages],
+        "atlas": atlas,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_PREFIX.pack(_MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            for data in blobs:
+                f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_project(path):
+    """Lee la cabecera de un proyecto. Devuelve (cabecera, posición del atlas en el archivo)."""
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) != _PREFIX.size:
+            raise ValueError("El archivo no es un proyecto de PDF Master.")
+        magic, header_size = _PREFIX.unpack(prefix)
+        if magic != _MAGIC:
+            raise ValueError("El archivo no es un proyecto de PDF Master.")
+        header = json.loads(f.read(header_size).decode("utf-8"))
+    if header.get("version") != PROJECT_VERSION:
+        raise ValueError(f"Versión de proyecto no soportada: {header.get('version')}")
+    return header, _PREFIX.size + header_size
+
+
+class ProjectAtlas:
+    """Miniaturas guardadas en un proyecto, leídas bajo demanda.
+
+    El archivo se mapea en memoria: abrir el proyecto no lee el atlas, y
+    cada miniatura se descomprime solo cuando la vista la pide. Las
+    entradas se identifican como en la caché de miniaturas, por archivo,
+    página y rotación, y solo se sirven mientras el archivo conserve la
+    huella (file_stamp) con que se guardó el proyecto: un guardado en el
+    original renumera sus páginas.
+    """
+
+    def __init__(self, path, atlas_offset, entries, stamps):
+        # entries: {(ruta, pagina_base_0, rotacion): [desplazamiento, longitud, escala, ancho, alto, stride]}
+        self.path = path
+        self.entries = entries
+        # ruta -> file_stamp guardado en el proyecto
+        self.stamps = stamps
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offset = atlas_offset
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, path, page_number, rotation):
+        """Devuelve (miniatura_cruda, escala) o None si la página no está en el atlas."""
+        entry = self.entries.get((path, page_number, rotation))
+        if entry is None or self._map is None:
+            return None
+        try:
+            if file_stamp(path) != self.stamps.get(path):
+                return None
+        except OSError:
+            return None
+        offset, length, scale, width, height, stride = entry
+        start = self._offset + offset
+        try:
+            samples = zlib.decompress(self._map[start:start + length])
+        except (zlib.error, ValueError) as e:
+            print(f"Miniatura del proyecto inválida ({e}).")
+            return None
+        if len(samples) != height * stride:
+            return None
+        return (width, height, stride, samples), scale
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
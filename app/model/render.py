@@ -0,0 +1,138 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import fitz  # PyMuPDF
+
+from .memory import trim_store
+
+# Escala de las miniaturas de la vista
+THUMBNAIL_SCALE = 0.3
+
+# Escala del borrador (primera pasada): se muestra al instante y luego se
+# reemplaza por la versión nítida
+DRAFT_SCALE = 0.08
+
+# Altura de página de referencia (carta, en puntos) para pasar de píxeles a escala
+_REFERENCE_PAGE_HEIGHT = 792
+
+# El nivel de antialiasing de MuPDF es global al proceso: sin pool, el hilo de
+# miniaturas y el de duplicados renderizan a la vez, así que cada render lo
+# hace con este lock tomado (PyMuPDF retiene el GIL: no se pierde paralelismo)
+_aa_lock = threading.Lock()
+
+# Documentos que cada proceso mantiene abiertos entre tareas
+_OPEN_DOCS_LIMIT = 8
+_open_docs = OrderedDict()
+
+
+def get_document(path):
+    """Devuelve el documento abierto en este proceso (caché LRU pequeña).
+
+    Si el archivo cambió en disco (p. ej. tras un guardado incremental) se
+    vuelve a abrir.
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    cached = _open_docs.pop(path, None)
+    if cached is not None and cached[0] != stamp:
+        cached[1].close()
+        cached = None
+    if cached is None:
+        cached = (stamp, fitz.open(path))
+        if len(_open_docs) >= _OPEN_DOCS_LIMIT:
+            _, (_, oldest) = _open_docs.popitem(last=False)
+            oldest.close()
+    _open_docs[path] = cached
+    return cached[1]
+
+
+def scale_for_height(pixels):
+    """Escala de render para que una página de referencia mida `pixels` de alto.
+
+    Se redondea hacia arriba a pasos de 0.05 para que zooms parecidos
+    compartan miniaturas en la caché.
+    """
+    return max(0.05, math.ceil(pixels / _REFERENCE_PAGE_HEIGHT * 20) / 20)
+
+
+def render_pages(path, page_numbers, rotations, scale=THUMBNAIL_SCALE, store_limit=None, draft=False):
+    """Renderiza un rango de páginas de un archivo.
+
+    `page_numbers` son índices base 0 y `rotations` la rotación adicional
+    (aplicada por el usuario) de cada una. Devuelve una lista de miniaturas
+    en el mismo orden (ver `pixmap_to_thumbnail`). Se ejecuta tanto en
+    procesos trabajadores como en el hilo de miniaturas cuando no hay pool.
+    Con `store_limit` (bytes) se libera caché de MuPDF al superarlo (ver `trim_store`).
+    Con `draft=True` se renderiza sin anotaciones ni antialiasing (borrador rápido).
+    """
+    doc = get_document(path)
+    images = []
+    with _aa_lock:
+        if draft:
+            aa_level = fitz.TOOLS.show_aa_level()
+            fitz.TOOLS.set_aa_level(0)
+        try:
+            for page_number, rotation in zip(page_numbers, rotations):
+                page = doc.load_page(page_number)
+                matrix = fitz.Matrix(scale, scale).prerotate(rotation)
+                pix = page.get_pixmap(matrix=matrix, alpha=False, annots=not draft)
+                images.append(pixmap_to_thumbnail(pix))
+        finally:
+            if draft:
+                # set_aa_level cambia texto y gráficos: se restaura cada uno
+                fitz.mupdf.fz_set_text_aa_level(aa_level["text"])
+                fitz.mupdf.fz_set_graphics_aa_level(aa_level["graphics"])
+    trim_store(store_limit)
+    return images
+
+
+def pixmap_to_thumbnail(pix):
+    """Convierte un Pixmap RGB en la miniatura cruda (ancho, alto, stride, muestras).
+
+    Las muestras se pasan tal cual a un QImage RGB888 en la vista, sin
+    codificar ni decodificar PNG por el camino.
+    """
+    return (pix.width, pix.height, pix.stride, pix.samples)
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def default_worker_count():
+    """Deja un núcleo libre para la interfaz."""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+class RenderPool:
+    """Pool de procesos para renderizar páginas en paralelo.
+
+    Con `workers=0` no se crean procesos y el trabajo se hace en el hilo que
+    llama (útil en equipos de un solo núcleo o para depurar).
+    """
+
+    def __init__(self, workers=None):
+        self.workers = default_worker_count() if workers is None else workers
+        self.executor = None
+        if self.workers > 0:
+            # 'spawn' evita heredar hilos de Qt con fork y es el modo de Windows
+            context = multiprocessing.get_context("spawn")
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def warm_up(self):
+        """Arranca los procesos por adelantado para que la primera pantalla no espere."""
+        if self.executor:
+            for _ in range(self.workers):
+                self.executor.submit(_warm_up)
+
+    def submit(self, path, page_numbers, rotations, scale=THUMBNAIL_SCALE, store_limit=None, draft=False):
+        return self.executor.submit(render_pages, path, page_numbers, rotations, scale, store_limit, draft)
+
+    def shutdown(self, cancel_pending=True):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=cancel_pending)
+            self.executor = None
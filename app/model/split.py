@@ -0,0 +1,114 @@
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import fitz  # PyMuPDF
+
+from .render import get_document, default_worker_count
+from .writer import SaveCancelled, save_document
+
+# Formas de dividir: cada N páginas, por marcador de primer nivel o por archivo de origen
+SPLIT_MODES = ('pages', 'bookmarks', 'source')
+
+# Caracteres que no pueden ir en un nombre de archivo (Windows incluido)
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+_MAX_NAME_LENGTH = 120
+
+
+def safe_filename(text, fallback="parte"):
+    """Convierte un título (p. ej. de un marcador) en un nombre de archivo válido, sin extensión."""
+    name = _UNSAFE_CHARS.sub("_", text or "").strip(" ._")
+    return name[:_MAX_NAME_LENGTH].rstrip(" ._") or fallback
+
+
+def unique_names(names):
+    """Añade _2, _3... a los nombres repetidos (sin distinguir mayúsculas), conservando el orden."""
+    used = set()
+    result = []
+    for name in names:
+        candidate = name
+        suffix = 2
+        while candidate.lower() in used:
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        used.add(candidate.lower())
+        result.append(candidate)
+    return result
+
+
+def build_part(runs):
+    """Monta un documento a partir de tramos (ruta, desde, hasta, rotación).
+
+    Los archivos se abren con la caché de documentos del proceso (ver
+    render.get_document): un trabajador parsea cada fuente una sola vez
+    para todas las partes que escribe.
+    """
+    last_run_of_path = {}
+    for i, run in enumerate(runs):
+        last_run_of_path[run[0]] = i
+    new_doc = fitz.open()
+    try:
+        for i, (path, from_page, to_page, rotation) in enumerate(runs):
+            start = len(new_doc)
+            new_doc.insert_pdf(get_document(path), from_page=from_page, to_page=to_page,
+                               final=(last_run_of_path[path] == i))
+            if rotation:
+                for page_index in range(start, len(new_doc)):
+                    page = new_doc[page_index]
+                    page.set_rotation((page.rotation + rotation) % 360)
+    except BaseException:
+        new_doc.close()
+        raise
+    return new_doc
+
+
+def write_part(output_path, runs, quality):
+    """Trabajo de un proceso: monta y guarda una parte. Devuelve el aviso del guardado."""
+    new_doc = build_part(runs)
+    try:
+        # El paralelismo es por parte: las imágenes se recomprimen en este mismo proceso
+        return save_document(new_doc, output_path, quality, image_workers=0)
+    finally:
+        new_doc.close()
+
+
+def write_parts(parts, quality, workers=None, progress=None, is_cancelled=None):
+    """Escribe varias partes [(ruta_salida, tramos)] en paralelo, en un pool de procesos.
+
+    Informa progress('files', hechas, total) y, si is_cancelled() devuelve
+    True, deja de repartir trabajo y lanza SaveCancelled con las partes ya
+    escritas (esas quedan completas en disco). Devuelve {ruta: aviso} de las
+    partes escritas y {ruta: error} de las que fallaron.
+    """
+    workers = default_worker_count() if workers is None else workers
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    written = {}
+    failed = {}
+    pending = list(reversed(parts))
+    in_flight = {} # future -> ruta
+    try:
+        while pending or in_flight:
+            if is_cancelled and is_cancelled():
+                # Las partes en curso se terminan: no quedan archivos a medias
+                executor.shutdown(cancel_futures=True)
+                written.update((path, None) for future, path in in_flight.items()
+                               if not future.cancelled() and future.exception() is None)
+                raise SaveCancelled(len(written))
+            # Pocas partes en vuelo: cada una mantiene su documento en memoria
+            while pending and len(in_flight) < workers * 2:
+                output_path, runs = pending.pop()
+                in_flight[executor.submit(write_part, output_path, runs, quality)] = output_path
+            done, _ = wait(in_flight, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                output_path = in_flight.pop(future)
+                try:
+                    written[output_path] = future.result()
+                except Exception as e:
+                    failed[output_path] = str(e) or type(e).__name__
+                if progress:
+                    progress('files', len(written) + len(failed), len(parts))
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return written, failed
+
@@ -0,0 +1,104 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    """Texto en minúsculas, sin tildes y con las palabras separadas por un solo espacio.
+
+    'Contrato Nº CT-2023/0042' -> 'contrato no ct 2023 0042'. Así una
+    búsqueda coincide aunque el PDF use otra puntuación u otros acentos.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    plain = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(_WORD.findall(plain.lower()))
+
+
+class TextIndex:
+    """Índice invertido del texto de las páginas cargadas.
+
+    Las páginas se identifican por (id_fuente, pagina_base_0), que no
+    cambia al borrar, reordenar o deshacer: el índice no se toca en esas
+    operaciones y cada búsqueda se traduce a las páginas actuales del
+    espacio de trabajo (ver PDFModel.search_text). Se llena desde el hilo
+    de indexado y se consulta desde la interfaz.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # palabra -> {(id_fuente, pagina)}
+        self._postings = {}
+        # (id_fuente, pagina) -> texto normalizado (para buscar frases)
+        self._texts = {}
+        # Vocabulario ordenado para buscar por prefijo; se rehace si cambió
+        self._vocabulary = None
+
+    def add(self, source_id, page_numbers, texts):
+        """Indexa el texto de varias páginas de una fuente."""
+        with self.lock:
+            for page_number, text in zip(page_numbers, texts):
+                key = (source_id, page_number)
+                normalized = normalize_text(text)
+                self._texts[key] = normalized
+                for word in set(normalized.split()):
+                    self._postings.setdefault(word, set()).add(key)
+            self._vocabulary = None
+
+    def indexed_pages(self, source_id):
+        """Páginas ya indexadas de una fuente."""
+        with self.lock:
+            return {page_number for sid, page_number in self._texts if sid == source_id}
+
+    def renumber_source(self, source_id, new_numbers):
+        """Aplica una renumeración {pagina_vieja: pagina_nueva} de una fuente; las que faltan se olvidan."""
+        with self.lock:
+            old = {page_number: self._texts.pop((sid, page_number))
+                   for sid, page_number in list(self._texts) if sid == source_id}
+            for word in list(self._postings):
+                keys = self._postings[word]
+                keys.difference_update((source_id, page_number) for page_number in old)
+                if not keys:
+                    del self._postings[word]
+            self._vocabulary = None
+        kept = [page_number for page_number in old if page_number in new_numbers]
+        # El texto ya está normalizado: normalizarlo otra vez no lo cambia
+        self.add(source_id, [new_numbers[page_number] for page_number in kept], [old[page_number] for page_number in kept])
+
+    def clear(self):
+        with self.lock:
+            self._postings = {}
+            self._texts = {}
+            self._vocabulary = None
+
+    def search(self, query):
+        """Páginas (id_fuente, pagina) que contienen `query`.
+
+        Todas las palabras deben aparecer; la última puede estar incompleta
+        (búsqueda mientras se escribe). Con varias palabras, además deben ir
+        seguidas, como en 'CT-2023-0042'. Devuelve None si la consulta no
+        tiene palabras.
+        """
+        words = normalize_text(query).split()
+        if not words:
+            return None
+        with self.lock:
+            if self._vocabulary is None:
+                self._vocabulary = sorted(self._postings)
+            prefix = words[-1]
+            found = set()
+            position = bisect_left(self._vocabulary, prefix)
+            while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+                found |= self._postings[self._vocabulary[position]]
+                position += 1
+            # Se intersecta empezando por la palabra menos frecuente
+            for word in sorted(words[:-1], key=lambda word: len(self._postings.get(word, ()))):
+                if not found:
+                    break
+                found &= self._postings.get(word, set())
+            if len(words) > 1:
+                phrase = " " + " ".join(words)
+                found = {key for key in found if phrase in " " + self._texts[key]}
+            return found
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+# Tamaño máximo por defecto de la caché en disco (bytes)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Cabecera de cada entrada: firma, ancho, alto y stride de las muestras RGB
+_HEADER = struct.Struct("<4sIII")
+_MAGIC = b"PMT1"
+
+
+def default_cache_dir():
+    """Carpeta de caché estándar del sistema operativo."""
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "PDFMaster", "thumbnails")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pdfmaster", "thumbnails")
+
+
+class ThumbnailCache:
+    """Caché persistente de miniaturas con expulsión LRU acotada por tamaño.
+
+    Cada entrada se identifica por el archivo de origen (ruta, tamaño y fecha
+    de modificación), la página, la rotación y la escala, y guarda las
+    muestras RGB crudas de la miniatura (sin PNG). La fecha de
+    modificación de cada fichero de la caché sirve como marca de último uso,
+    así el orden LRU sobrevive entre sesiones sin un índice aparte.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._file_keys = {}
+        self._entries = OrderedDict() # nombre -> tamaño, del menos al más usado
+        self._total_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".thumb"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        for _, name, size in entries:
+            self._entries[name] = size
+            self._total_bytes += size
+
+    def file_key(self, path):
+        """Huella del archivo de origen basada en (ruta, tamaño, mtime)."""
+        stat = os.stat(path)
+        identity = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        key = self._file_keys.get(identity)
+        if key is None:
+            key = hashlib.sha1(repr(identity).encode("utf-8")).hexdigest()
+            self._file_keys[identity] = key
+        return key
+
+    def _entry_name(self, path, page_number, rotation, scale):
+        return f"{self.file_key(path)}-{page_number}-{rotation}-{int(scale * 1000)}.thumb"
+
+    def get(self, path, page_number, rotation, scale):
+        """Devuelve la miniatura guardada o None si no existe."""
+        try:
+            name = self._entry_name(path, page_number, rotation, scale)
+        except OSError:
+            return None
+        with self.lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        entry_path = os.path.join(self.directory, name)
+        try:
+            with open(entry_path, "rb") as f:
+                magic, width, height, stride = _HEADER.unpack(f.read(_HEADER.size))
+                samples = f.read()
+            if magic != _MAGIC or len(samples) != height * stride:
+                raise OSError("entrada de caché inválida")
+            # Marcamos el uso para el orden LRU de la próxima sesión
+            os.utime(entry_path)
+        except (OSError, struct.error):
+            with self.lock:
+                size = self._entries.pop(name, 0)
+                self._total_bytes -= size
+            return None
+        return (width, height, stride, samples)
+
+    def put(self, path, page_number, rotation, scale, thumbnail):
+        """Guarda una miniatura y expulsa las menos usadas si se supera el límite."""
+        try:
+            name = self._entry_name(path, page_number, rotation, scale)
+        except OSError:
+            return
+        width, height, stride, samples = thumbnail
+        entry_path = os.path.join(self.directory, name)
+        tmp_path = entry_path + ".tmp"
+        size = _HEADER.size + len(samples)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, width, height, stride))
+                f.write(samples)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            print(f"No se pudo escribir en la caché de miniaturas: {e}")
+            return
+
+        with self.lock:
+            self._total_bytes -= self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Borra todas las miniaturas guardadas."""
+        with self.lock:
+            for name in self._entries:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
@@ -0,0 +1,99 @@
+import os
+import tempfile
+
+from .image_optimizer import plan_images, optimize_images, dedupe_images
+from .metrics import metrics
+
+
+class SaveCancelled(Exception):
+    """El usuario canceló el guardado."""
+
+
+def save_document(new_doc, output_path, quality='standard', image_workers=None,
+                  progress=None, is_cancelled=None):
+    """Optimiza y escribe un documento ya montado, con 'Doble Fallback' para archivos corruptos.
+
+    Informa las etapas 'images' y 'write' con progress(etapa, hechas, total)
+    y lanza SaveCancelled si is_cancelled() devuelve True. Se escribe en un
+    temporal junto al destino que solo reemplaza al archivo final si todo
+    salió bien. Devuelve el aviso a añadir al mensaje ('' si no hubo).
+    """
+    def check_cancelled():
+        if is_cancelled and is_cancelled():
+            raise SaveCancelled()
+
+    # Variables de control
+    warning_msg = ""
+
+    # Imágenes idénticas copiadas desde varias fuentes: se guardan una sola vez
+    # (y se recomprimen una sola vez)
+    try:
+        with metrics.span("guardado.duplicados"):
+            dedupe_images(new_doc)
+    except Exception as e:
+        print(f"Advertencia: no se pudieron unificar las imágenes repetidas ({e}).")
+
+    # Valores por defecto según calidad
+    garbage_level = 0
+    deflate_option = True
+
+    # 2. INTENTO DE OPTIMIZACIÓN (recompresión de imágenes en paralelo)
+    # Solo intentamos si no es calidad Alta
+    if quality != 'high':
+        try:
+            # standard: 150 DPI, Calidad 75 / low: 72 DPI, Calidad 50 / auto: según el tipo de imagen
+            image_progress = (lambda done, total: progress('images', done, total)) if progress else None
+            with metrics.span("guardado.imagenes", calidad=quality):
+                images = plan_images(new_doc, quality)
+                optimize_images(new_doc, images, workers=image_workers,
+                                progress=image_progress, is_cancelled=is_cancelled)
+            garbage_level = 4 if quality == 'low' else 3
+
+        except Exception as e:
+            # Si falla la re-compresión, abortamos optimización y bajamos a modo seguro
+            print(f"Advertencia: Falló la recompresión de imágenes ({e}). Se usará modo seguro.")
+            warning_msg = " (Sin optimización de imagen por error interno)"
+            garbage_level = 0
+            deflate_option = False # No comprimir si ya dio error
+    else:
+        # Calidad Alta
+        garbage_level = 1
+        deflate_option = True
+    check_cancelled()
+
+    # 3. INTENTO DE GUARDADO (save) sobre un temporal en la carpeta de destino
+    # MuPDF recolecta basura y escribe en una sola llamada: etapa sin progreso medible
+    if progress:
+        progress('write', 0, 0)
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".pdfmaster-", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        try:
+            with metrics.span("guardado.escritura", garbage=garbage_level):
+                new_doc.save(tmp_path, garbage=garbage_level, deflate=deflate_option)
+
+        except Exception as e:
+            # BLOQUE DE SEGURIDAD CRÍTICO
+            print(f"Error al guardar optimizado ({e}). Intentando guardado RAW...")
+            try:
+                # Fallback final: Guardado CRUDO.
+                # garbage=0: No toca estructura.
+                # deflate=False: No intenta descomprimir/recomprimir streams.
+                # clean=False: No intenta sanear el PDF.
+                new_doc.save(tmp_path, garbage=0, deflate=False, clean=False)
+                warning_msg = " (Guardado en modo RAW por corrupción en archivo original)"
+            except Exception as e2:
+                # Si esto falla, el archivo es insalvable
+                raise RuntimeError(f"Imposible guardar el archivo: {e2}")
+        check_cancelled()
+        # Reemplazo atómico: el destino nunca queda a medio escribir
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    return warning_msg
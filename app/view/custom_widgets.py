@@ -1,65 +1,772 @@
 import sys
-from PyQt5.QtWidgets import QListWidget, QAbstractItemView, QListWidgetItem
-from PyQt5.QtCore import Qt, QSize, QTimer, pyqtSignal
-from PyQt5.QtGui import QIcon, QPixmap, QColor, QPainter
+from bisect import bisect_left, bisect_right
+from PyQt5.QtWidgets import QListView, QAbstractItemView, QStyledItemDelegate
+from PyQt5.QtCore import (Qt, QSize, QTimer, QMimeData, QModelIndex, QAbstractListModel, pyqtSignal,
+                          QItemSelection, QItemSelectionModel)
+from PyQt5.QtGui import QPixmap, QColor, QImage, QTransform, QPen
+from app.model.metrics import metrics
 
 ROLE_ORIGINAL_INDEX = Qt.UserRole + 1
 ROLE_IMAGE_DATA = Qt.UserRole + 2
+ROLE_MATCH = Qt.UserRole + 3
 
-class DraggableListWidget(QListWidget):
+# Tamaño del marcador de posición (proporción aproximada de una hoja carta)
+PLACEHOLDER_SIZE = QSize(128, 165)
+
+# Tipo MIME de los arrastres internos: solo viajan números de fila, no imágenes
+ROWS_MIME_TYPE = "application/x-pdfmaster-rows"
+
+# Posiciones dentro de cada fila del modelo
+_COL_INDEX, _COL_LABEL, _COL_PIXMAP, _COL_ROTATION, _COL_SCALE, _COL_NOTE, _COL_MATCH = 0, 1, 2, 3, 4, 5, 6
+
+# Color del texto de las páginas marcadas (p. ej. duplicadas)
+NOTE_COLOR = QColor("#f0a040")
+# Borde de las páginas que coinciden con la búsqueda de texto
+MATCH_COLOR = QColor("#f5d547")
+
+def thumbnail_to_pixmap(thumbnail):
+    """Convierte una miniatura cruda (ancho, alto, stride, muestras RGB) en QPixmap.
+
+    El QImage envuelve las muestras sin copiarlas; la única copia es la
+    subida a QPixmap, que es la que se dibuja.
+    """
+    width, height, stride, samples = thumbnail
+    image = QImage(samples, width, height, stride, QImage.Format_RGB888)
+    return QPixmap.fromImage(image)
+
+def pixmap_to_thumbnail(pixmap):
+    """Inverso de thumbnail_to_pixmap: copia los píxeles de un QPixmap a una miniatura cruda."""
+    image = pixmap.toImage().convertToFormat(QImage.Format_RGB888)
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    return (image.width(), image.height(), image.bytesPerLine(), bytes(bits))
+
+def _pixmap_size(pixmap):
+    """Bytes aproximados que ocupa un pixmap (0 si no hay)."""
+    if pixmap is None:
+        return 0
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+class PageListModel(QAbstractListModel):
+    """Modelo de la cuadrícula de páginas.
+
+    Cada fila es [indice_original, etiqueta, pixmap, giro_pendiente, escala, nota, coincide].
+    La escala es la de render del pixmap (0 si no hay), para saber cuándo un
+    borrador o una miniatura de un zoom menor debe reemplazarse. La nota
+    (None o texto) marca la página y se muestra como tooltip; `coincide`
+    resalta las páginas encontradas por la búsqueda de texto. El
+    giro pendiente (grados) se aplica al pixmap la primera vez que se dibuja,
+    así rotar muchas páginas no transforma las que no están a la vista. Mover o borrar filas
+    usa beginMoveRows/beginRemoveRows, así el coste depende de las filas
+    afectadas y no del tamaño del documento. Se lleva la cuenta de los
+    bytes que ocupan los pixmaps para poder acotar la memoria.
+
+    También se mantienen la fila de cada índice original y los índices de
+    las filas con pixmap: cada miniatura que llega y el presupuesto de
+    memoria los consultan sin recorrer todas las filas.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._placeholder = None
+        self.pixmap_bytes = 0
+        self._row_of = {} # indice_original -> fila
+        self._with_pixmap = set() # índices originales de las filas con pixmap
+
+    def _get_placeholder(self):
+        if self._placeholder is None:
+            self._placeholder = QPixmap(PLACEHOLDER_SIZE)
+            self._placeholder.fill(QColor("#5a5a5a"))
+        return self._placeholder
+
+    # --- Interfaz de QAbstractListModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return row[_COL_LABEL]
+        if role == Qt.DecorationRole:
+            return self._current_pixmap(row) or self._get_placeholder()
+        if role == ROLE_ORIGINAL_INDEX:
+            return row[_COL_INDEX]
+        if role == ROLE_IMAGE_DATA:
+            return self._current_pixmap(row)
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.ToolTipRole:
+            return row[_COL_NOTE]
+        if role == Qt.ForegroundRole and row[_COL_NOTE]:
+            return NOTE_COLOR
+        if role == ROLE_MATCH:
+            return row[_COL_MATCH]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        if self._rows[index.row()][_COL_INDEX] < 0:
+            # Marcador de una página aún no cargada: no se selecciona ni se arrastra
+            return Qt.ItemIsEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDragActions(self):
+        return Qt.CopyAction | Qt.MoveAction
+
+    def mimeTypes(self):
+        return [ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        # Evitamos que Qt serialice los pixmaps de la selección al arrastrar
+        mime = QMimeData()
+        rows = sorted(index.row() for index in indexes)
+        mime.setData(ROWS_MIME_TYPE, ",".join(map(str, rows)).encode("ascii"))
+        return mime
+
+    # --- Operaciones sobre filas ---
+
+    def append_pages(self, records):
+        """Agrega filas (pixmap_o_None, etiqueta, indice_original) en un único bloque."""
+        self.insert_pages(len(self._rows), records)
+
+    def insert_pages(self, position, records):
+        """Inserta filas (pixmap_o_None, etiqueta, indice_original) antes de `position`."""
+        if not records:
+            return
+        self.beginInsertRows(QModelIndex(), position, position + len(records) - 1)
+        self._rows[position:position] = [[original_index, label, pixmap, 0, 0, None, False]
+                                         for pixmap, label, original_index in records]
+        self.pixmap_bytes += sum(_pixmap_size(pixmap) for pixmap, _, _ in records)
+        self._with_pixmap.update(original_index for pixmap, _, original_index in records if pixmap is not None)
+        self._reindex(position)
+        self.endInsertRows()
+
+    def replace_pages(self, rows, records):
+        """Reemplaza en su sitio las filas `rows` por `records` (misma cantidad)."""
+        for row, (pixmap, label, original_index) in zip(rows, records):
+            old = self._rows[row]
+            self.pixmap_bytes += _pixmap_size(pixmap) - _pixmap_size(old[_COL_PIXMAP])
+            self._row_of.pop(old[_COL_INDEX], None)
+            self._with_pixmap.discard(old[_COL_INDEX])
+            self._rows[row] = [original_index, label, pixmap, 0, 0, None, False]
+            self._row_of[original_index] = row
+            if pixmap is not None:
+                self._with_pixmap.add(original_index)
+        if rows:
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)))
+
+    def reset_pages(self, records):
+        self.beginResetModel()
+        self._rows = [[original_index, label, pixmap, 0, 0, None, False] for pixmap, label, original_index in records]
+        self.pixmap_bytes = sum(_pixmap_size(pixmap) for pixmap, _, _ in records)
+        self._rebuild_index()
+        self.endResetModel()
+
+    def _reindex(self, start=0, stop=None):
+        """Actualiza la fila de cada índice original en las filas [start, stop)."""
+        stop = len(self._rows) if stop is None else stop
+        for row in range(start, stop):
+            self._row_of[self._rows[row][_COL_INDEX]] = row
+
+    def _rebuild_index(self):
+        self._row_of = {}
+        self._with_pixmap = {data[_COL_INDEX] for data in self._rows if data[_COL_PIXMAP] is not None}
+        self._reindex()
+
+    def move_rows(self, rows, target):
+        """Mueve las filas indicadas (conservando su orden) antes de la fila `target`.
+
+        Las filas se procesan en bloques contiguos; cada bloque es un solo
+        beginMoveRows. Devuelve la posición final de la primera fila movida.
+        """
+        rows = sorted(set(rows))
+        if not rows:
+            return target
+        blocks = []
+        for row in rows:
+            # Un bloque no puede cruzar el destino: se trata distinto a cada lado
+            if blocks and row == blocks[-1][1] + 1 and (row < target) == (blocks[-1][0] < target):
+                blocks[-1][1] = row
+            else:
+                blocks.append([row, row])
+
+        moved_before = 0
+        insert = target
+        for first, last in blocks:
+            size = last - first + 1
+            if first < target:
+                # Bloque por encima del destino: al sacarlo, el destino se desplaza
+                first -= moved_before
+                if self.beginMoveRows(QModelIndex(), first, first + size - 1, QModelIndex(), target):
+                    block = self._rows[first:first + size]
+                    del self._rows[first:first + size]
+                    self._rows[target - size:target - size] = block
+                    self.endMoveRows()
+                moved_before += size
+            else:
+                if first != insert and self.beginMoveRows(QModelIndex(), first, last, QModelIndex(), insert):
+                    block = self._rows[first:last + 1]
+                    del self._rows[first:last + 1]
+                    self._rows[insert:insert] = block
+                    self.endMoveRows()
+                insert += size
+        # Solo cambian de fila las que están entre la primera movida y el destino
+        self._reindex(min(rows[0], target), max(rows[-1] + 1, target))
+        return target - moved_before
+
+    def restore_rows(self, position, rows):
+        """Deshace `move_rows`: lleva el bloque que empieza en `position` de vuelta a `rows`.
+
+        `rows` son las posiciones de origen. Se recorren en orden ascendente
+        por rangos contiguos, sacando cada vez el principio del bloque; lo que
+        queda del bloque sigue junto.
+        """
+        rows = sorted(set(rows))
+        current = position
+        remaining = len(rows)
+        start = 0
+        while start < len(rows):
+            end = start + 1
+            while end < len(rows) and rows[end] == rows[end - 1] + 1:
+                end += 1
+            first, size = rows[start], end - start
+            if current >= first:
+                self._move_block(current, size, first)
+                current += size
+            else:
+                # El resto del bloque sigue por delante del destino
+                self._move_block(current, size, first + remaining)
+            remaining -= size
+            start = end
+
+    def _move_block(self, first, size, target):
+        """Mueve las filas [first, first + size) antes de la fila `target` (contada antes de mover)."""
+        if first <= target <= first + size:
+            return
+        if not self.beginMoveRows(QModelIndex(), first, first + size - 1, QModelIndex(), target):
+            return
+        block = self._rows[first:first + size]
+        del self._rows[first:first + size]
+        insert = target - size if target > first else target
+        self._rows[insert:insert] = block
+        self._reindex(min(first, target), max(first + size, target))
+        self.endMoveRows()
+
+    def remove_rows(self, rows):
+        """Elimina filas en bloques contiguos, de abajo hacia arriba."""
+        rows = sorted(set(rows), reverse=True)
+        if not rows:
+            return
+        lowest = rows[-1]
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for data in self._rows[first:last + 1]:
+                self.pixmap_bytes -= _pixmap_size(data[_COL_PIXMAP])
+                self._row_of.pop(data[_COL_INDEX], None)
+                self._with_pixmap.discard(data[_COL_INDEX])
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+        self._reindex(lowest)
+
+    def remap_indices(self, deleted_indices):
+        """Ajusta los índices originales tras borrar `deleted_indices` del modelo PDF."""
+        deleted = sorted(set(deleted_indices))
+        for row in self._rows:
+            row[_COL_INDEX] -= bisect_left(deleted, row[_COL_INDEX])
+        self._rebuild_index()
+
+    def remap_inserted(self, inserted_indices):
+        """Inverso de `remap_indices`: ajusta los índices tras reinsertar `inserted_indices`."""
+        inserted = sorted(inserted_indices)
+        # Posición de cada página reinsertada en la lista que aún no la tiene
+        positions = [index - offset for offset, index in enumerate(inserted)]
+        for row in self._rows:
+            row[_COL_INDEX] += bisect_right(positions, row[_COL_INDEX])
+        self._rebuild_index()
+
+    def clear(self):
+        self.reset_pages([])
+
+    def get_original_index(self, row):
+        return self._rows[row][_COL_INDEX]
+
+    def row_of(self, original_index):
+        """Fila actual del índice original (None si no está en la lista)."""
+        return self._row_of.get(original_index)
+
+    def rows_by_original_index(self):
+        """{indice_original: fila} de las páginas cargadas (sin marcadores)."""
+        return {original_index: row for original_index, row in self._row_of.items() if original_index >= 0}
+
+    def pixmap_rows(self):
+        """Filas que tienen pixmap."""
+        return [self._row_of[original_index] for original_index in self._with_pixmap]
+
+    def get_pixmap(self, row):
+        return self._rows[row][_COL_PIXMAP]
+
+    def get_scale(self, row):
+        return self._rows[row][_COL_SCALE]
+
+    def set_pixmap(self, row, pixmap, scale=0):
+        self.pixmap_bytes += _pixmap_size(pixmap) - _pixmap_size(self._rows[row][_COL_PIXMAP])
+        if pixmap is None:
+            self._with_pixmap.discard(self._rows[row][_COL_INDEX])
+        else:
+            self._with_pixmap.add(self._rows[row][_COL_INDEX])
+        self._rows[row][_COL_PIXMAP] = pixmap
+        self._rows[row][_COL_ROTATION] = 0
+        self._rows[row][_COL_SCALE] = scale if pixmap is not None else 0
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole, ROLE_IMAGE_DATA])
+
+    def set_notes(self, notes):
+        """Reemplaza las notas de todas las filas por `notes` {fila: texto}."""
+        for row, data in enumerate(self._rows):
+            data[_COL_NOTE] = notes.get(row)
+        if self._rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1), [Qt.ToolTipRole, Qt.ForegroundRole])
+
+    def set_labels(self, labels):
+        """Cambia la etiqueta de las filas cuyo índice original está en `labels` {indice: texto}."""
+        for data in self._rows:
+            label = labels.get(data[_COL_INDEX])
+            if label is not None:
+                data[_COL_LABEL] = label
+        if self._rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1), [Qt.DisplayRole])
+
+    def set_matches(self, rows):
+        """Resalta exactamente las filas `rows` (resultado de una búsqueda)."""
+        rows = set(rows)
+        for row, data in enumerate(self._rows):
+            data[_COL_MATCH] = row in rows
+        if self._rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1), [ROLE_MATCH])
+
+    def rotate_pixmaps(self, rows, degrees):
+        """Marca un giro pendiente en las filas con imagen; devuelve las filas sin imagen."""
+        without_pixmap = []
+        for row in rows:
+            data = self._rows[row]
+            if data[_COL_PIXMAP] is None:
+                without_pixmap.append(row)
+            else:
+                data[_COL_ROTATION] = (data[_COL_ROTATION] + degrees) % 360
+        if len(without_pixmap) < len(rows):
+            # Un único aviso para todo el rango: la vista repinta solo lo visible
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), [Qt.DecorationRole, ROLE_IMAGE_DATA])
+        return without_pixmap
+
+    def _current_pixmap(self, row):
+        """Pixmap de la fila con su giro pendiente ya aplicado (giro exacto de 90°)."""
+        if row[_COL_ROTATION] and row[_COL_PIXMAP] is not None:
+            transform = QTransform().rotate(row[_COL_ROTATION])
+            row[_COL_PIXMAP] = row[_COL_PIXMAP].transformed(transform)
+            row[_COL_ROTATION] = 0
+        return row[_COL_PIXMAP]
+
+    def get_thumbnails(self):
+        """{indice_original: (miniatura_cruda, escala)} de las filas con imagen renderizada."""
+        thumbnails = {}
+        for row in self._rows:
+            if row[_COL_INDEX] >= 0 and row[_COL_SCALE] > 0 and row[_COL_PIXMAP] is not None:
+                thumbnails[row[_COL_INDEX]] = (pixmap_to_thumbnail(self._current_pixmap(row)), row[_COL_SCALE])
+        return thumbnails
+
+    def get_order(self):
+        # Los marcadores de páginas aún no cargadas no forman parte del documento
+        return [row[_COL_INDEX] for row in self._rows if row[_COL_INDEX] >= 0]
+
+class PageDelegate(QStyledItemDelegate):
+    """Delegado ligero: tamaño fijo por celda, sin medir texto ni iconos."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cell_size = QSize(150, 260)
+
+    def sizeHint(self, option, index):
+        return self.cell_size
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        option.decorationSize = option.widget.iconSize() if option.widget else option.decorationSize
+        option.displayAlignment = Qt.AlignCenter
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        if index.data(ROLE_MATCH):
+            # Se dibuja encima: el fondo de la celda lo fija la hoja de estilos
+            painter.save()
+            painter.setPen(QPen(MATCH_COLOR, 3))
+            painter.drawRoundedRect(option.rect.adjusted(2, 2, -2, -2), 5, 5)
+            painter.restore()
+
+class DraggableListWidget(QListView):
     filesDropped = pyqtSignal(list)
+    thumbnailsRequested = pyqtSignal(int, float, list, list) # (generacion, escala, borradores, nítidas)
+    pagesMoved = pyqtSignal(list, int, int) # (filas de origen, destino, posición final)
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        
-        self.setViewMode(QListWidget.IconMode)
-        self.setResizeMode(QListWidget.Adjust)
-        self.setMovement(QListWidget.Free)
-        
+        self.setObjectName("pagesList")
+
+        self.page_model = PageListModel(self)
+        self.setModel(self.page_model)
+        self.delegate = PageDelegate(self)
+        self.setItemDelegate(self.delegate)
+
+        self.setViewMode(QListView.IconMode)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Free)
+        # Todas las celdas miden lo mismo: el layout no consulta cada fila
+        self.setUniformItemSizes(True)
+
         # --- CORRECCIÓN DE ESPACIO PARA VERTICALES ---
-        
+
         # 1. GridSize: Aumentamos la altura total de la celda a 270 (antes 240)
         #    Esto da mucho aire abajo.
-        self.setGridSize(QSize(160, 270)) 
-        
+        self.setGridSize(QSize(160, 270))
+
         self.setSpacing(10)
-        
+
         # 2. IconSize: Limitamos la altura de la imagen a 180 (antes 190)
         #    Cálculo: 270 (Total) - 180 (Imagen) = 90px libres para texto.
         self.setIconSize(QSize(140, 180))
-        
+
         self.setWordWrap(True)
-        
+
         self.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.setDragEnabled(True)
         self.setAcceptDrops(True)
         self.setDropIndicatorShown(True)
 
-    def add_pdf_page(self, img_data, label_text, original_index):
-        item = QListWidgetItem()
-        
-        if not img_data:
+        # --- RENDERIZADO PEREZOSO DE MINIATURAS ---
+        # La generación cambia cada vez que se vacía la lista, así se descartan
+        # las miniaturas que llegan tarde de una petición anterior.
+        self.generation = 0
+        # Próxima clave de marcador (negativa: nunca coincide con una página del modelo)
+        self._next_reserved_key = -1
+        # Escala de render nítida para el zoom actual (ver set_zoom)
+        self.thumbnail_scale = 0.3
+        # Presupuesto de memoria de los pixmaps (bytes, None = sin límite). Al
+        # superarlo se descartan los más alejados de la vista; se recuperan
+        # desde la caché de miniaturas en disco al volver a ellos.
+        self.pixmap_budget = None
+
+        # Agrupamos los eventos de scroll/resize para no saturar al renderizador
+        self._visible_timer = QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.setInterval(30)
+        self._visible_timer.timeout.connect(self.request_visible_thumbnails)
+
+        self.verticalScrollBar().valueChanged.connect(self._schedule_visible_update)
+        self.page_model.rowsInserted.connect(self._schedule_visible_update)
+        self.page_model.rowsRemoved.connect(self._schedule_visible_update)
+        self.page_model.modelReset.connect(self._schedule_visible_update)
+
+    # --- Acceso a las páginas ---
+
+    def count(self):
+        return self.page_model.rowCount()
+
+    def clear(self):
+        self.generation += 1
+        self.page_model.clear()
+
+    def add_pdf_pages(self, records):
+        """Agrega varias páginas (pixmap, etiqueta, indice_original) de una vez."""
+        prepared = []
+        for pixmap, label_text, original_index in records:
+            if isinstance(pixmap, tuple):
+                pixmap = thumbnail_to_pixmap(pixmap)
+            if pixmap is not None and pixmap.isNull():
+                pixmap = None
+            prepared.append((pixmap, label_text, original_index))
+        self.page_model.append_pages(prepared)
+
+    def reserve_pages(self, count, label_text="Cargando..."):
+        """Agrega `count` marcadores de páginas que aún se están cargando.
+
+        Devuelve sus claves (índices negativos) para rellenarlos luego con
+        `fill_reserved_pages` o quitarlos con `release_reserved_pages`.
+        """
+        keys = list(range(self._next_reserved_key, self._next_reserved_key - count, -1))
+        self._next_reserved_key -= count
+        self.page_model.append_pages([(None, label_text, key) for key in keys])
+        return keys
+
+    def _reserved_rows(self, keys):
+        """Filas actuales de los marcadores `keys`, en el orden de `keys`."""
+        rows = (self.page_model.row_of(key) for key in keys)
+        return [row for row in rows if row is not None]
+
+    def fill_reserved_pages(self, keys, records):
+        """Reemplaza los marcadores `keys` por las páginas cargadas (pixmap, etiqueta, indice_original).
+
+        Si el archivo resultó tener otro número de páginas que el
+        pre-escaneado, las sobrantes se insertan tras el último marcador y los
+        marcadores de más se quitan. Devuelve las filas de las páginas.
+        """
+        rows = self._reserved_rows(keys)
+        if not rows:
+            self.add_pdf_pages(records)
+            return list(range(self.count() - len(records), self.count()))
+        filled = min(len(rows), len(records))
+        filled_rows = rows[:filled]
+        self.page_model.replace_pages(filled_rows, records[:filled])
+        if len(records) > filled:
+            position = rows[filled - 1] + 1
+            self.page_model.insert_pages(position, records[filled:])
+            filled_rows += range(position, position + len(records) - filled)
+        elif len(rows) > filled:
+            self.page_model.remove_rows(rows[filled:])
+        self._schedule_visible_update()
+        return filled_rows
+
+    def release_reserved_pages(self, keys):
+        """Quita los marcadores de un archivo que no se pudo cargar."""
+        self.page_model.remove_rows(self._reserved_rows(keys))
+
+    def remove_pages(self, rows, deleted_indices):
+        """Quita las filas borradas y renumera el resto sin tocar sus miniaturas."""
+        # Las miniaturas en curso usan los índices viejos: las descartamos
+        self.generation += 1
+        self.page_model.remove_rows(rows)
+        self.page_model.remap_indices(deleted_indices)
+
+    def restore_pages(self, rows, records, inserted_indices):
+        """Vuelve a poner páginas quitadas: `records[i]` (pixmap, etiqueta, indice_original) en la fila `rows[i]`.
+
+        `inserted_indices` son los índices que se reinsertaron en el modelo
+        PDF; el resto de las filas se renumera antes de insertar.
+        """
+        self.generation += 1
+        self.page_model.remap_inserted(inserted_indices)
+        pending = sorted(zip(rows, records), key=lambda pair: pair[0])
+        start = 0
+        while start < len(pending):
+            end = start + 1
+            while end < len(pending) and pending[end][0] == pending[end - 1][0] + 1:
+                end += 1
+            # En orden ascendente cada fila cae en su posición final
+            position = min(pending[start][0], self.count())
+            self.page_model.insert_pages(position, [record for _, record in pending[start:end]])
+            start = end
+
+    def relabel_pages(self, labels):
+        """Actualiza las etiquetas tras renumerar las páginas (guardado en el original).
+
+        Las miniaturas en curso se pidieron con la numeración anterior: se
+        descartan y se vuelven a pedir.
+        """
+        self.page_model.set_labels(labels)
+        self.generation += 1
+        self._schedule_visible_update()
+
+    def move_pages(self, rows, target):
+        """Mueve las filas antes de `target`; devuelve la posición final de la primera."""
+        with metrics.span("accion.reordenar", paginas=len(rows)):
+            return self.page_model.move_rows(rows, target)
+
+    def unmove_pages(self, position, rows):
+        """Deshace `move_pages`: las filas que empiezan en `position` vuelven a `rows`."""
+        with metrics.span("accion.reordenar", paginas=len(rows)):
+            self.page_model.restore_rows(position, rows)
+
+    def selected_rows(self):
+        return sorted(index.row() for index in self.selectionModel().selectedIndexes())
+
+    def select_rows(self, rows):
+        """Selecciona exactamente `rows` (en rangos contiguos, una sola notificación)."""
+        selection = QItemSelection()
+        rows = sorted(set(rows))
+        start = 0
+        while start < len(rows):
+            end = start
+            while end + 1 < len(rows) and rows[end + 1] == rows[end] + 1:
+                end += 1
+            selection.select(self.page_model.index(rows[start]), self.page_model.index(rows[end]))
+            start = end + 1
+        self.selectionModel().select(selection, QItemSelectionModel.ClearAndSelect)
+        if rows:
+            self.scrollTo(self.page_model.index(rows[0]))
+
+    def rows_by_original_index(self):
+        """{indice_original: fila} de las páginas cargadas."""
+        return self.page_model.rows_by_original_index()
+
+    def get_thumbnails(self):
+        return self.page_model.get_thumbnails()
+
+    def highlight_rows(self, rows):
+        """Resalta las filas encontradas por la búsqueda y quita el resaltado anterior."""
+        self.page_model.set_matches(rows)
+
+    def mark_pages(self, notes):
+        """Marca las filas de `notes` {fila: texto} y quita las marcas anteriores."""
+        self.page_model.set_notes(notes)
+
+    def get_original_index(self, row):
+        return self.page_model.get_original_index(row)
+
+    def get_current_order(self):
+        return self.page_model.get_order()
+
+    # --- Miniaturas visibles ---
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._schedule_visible_update()
+
+    def _schedule_visible_update(self, *args):
+        self._visible_timer.start()
+
+    def _row_rect(self, row):
+        return self.visualRect(self.page_model.index(row))
+
+    def _visible_row_range(self):
+        """Devuelve (primera, última) fila visible mediante búsqueda binaria.
+
+        En IconMode las filas se disponen en orden de lectura, por lo que la
+        coordenada Y de cada celda es monótona respecto a la fila.
+        """
+        count = self.count()
+        if count == 0:
+            return None
+        height = self.viewport().height()
+
+        low, high = 0, count - 1
+        while low < high:
+            mid = (low + high) // 2
+            if self._row_rect(mid).bottom() < 0:
+                low = mid + 1
+            else:
+                high = mid
+        first = low
+
+        low, high = first, count - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self._row_rect(mid).top() > height:
+                high = mid - 1
+            else:
+                low = mid
+        return first, low
+
+    def request_visible_thumbnails(self):
+        """Pide las miniaturas que faltan: primero las visibles, luego las cercanas."""
+        visible = self._visible_row_range()
+        if visible is None:
             return
+        first, last = visible
+        margin = last - first + 1
+
+        ordered_rows = list(range(first, last + 1))
+        ordered_rows += range(last + 1, min(self.count(), last + 1 + margin))
+        ordered_rows += reversed(range(max(0, first - margin), first))
+
+        drafts, sharps = [], []
+        for row in ordered_rows:
+            original_index = self.page_model.get_original_index(row)
+            if original_index < 0:
+                # Marcador de una página que aún se está cargando
+                continue
+            if self.page_model.get_pixmap(row) is None:
+                # Sin imagen: borrador inmediato y luego la versión nítida
+                drafts.append(original_index)
+                sharps.append(original_index)
+            elif first <= row <= last and self.page_model.get_scale(row) < self.thumbnail_scale:
+                # Borrador o zoom anterior: solo se mejora lo visible
+                sharps.append(original_index)
+
+        # Siempre emitimos (aunque esté vacía) para cancelar la cola anterior
+        self.thumbnailsRequested.emit(self.generation, self.thumbnail_scale, drafts, sharps)
 
-        pixmap = QPixmap()
-        if not pixmap.loadFromData(img_data):
+    def set_thumbnail(self, generation, original_index, thumbnail, scale):
+        """Recibe una miniatura renderizada en segundo plano (borrador o nítida)."""
+        if generation != self.generation:
             return
 
-        icon = QIcon(pixmap)
-        item.setIcon(icon)
-        
-        item.setText(label_text)
-        item.setTextAlignment(Qt.AlignCenter)
-        
-        # 3. SizeHint: Debe coincidir casi con el GridSize para reservar el espacio
-        item.setSizeHint(QSize(150, 260))
-        
-        item.setData(ROLE_ORIGINAL_INDEX, original_index)
-        item.setData(ROLE_IMAGE_DATA, img_data)
-        
-        self.addItem(item)
-
-    # --- Drag & Drop (Código intacto) ---
+        row = self.page_model.row_of(original_index)
+        # Solo se reemplaza una imagen por otra más nítida
+        if row is None or (self.page_model.get_pixmap(row) is not None and scale <= self.page_model.get_scale(row)):
+            return
+        pixmap = thumbnail_to_pixmap(thumbnail)
+        if scale < self.thumbnail_scale:
+            # QIcon no amplía: el borrador se estira al tamaño de la celda
+            pixmap = pixmap.scaled(self.iconSize(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.page_model.set_pixmap(row, pixmap, scale)
+        self._enforce_pixmap_budget()
+
+    def rotate_pages(self, rows, clockwise):
+        """Gira las miniaturas de las filas a partir de sus píxeles, sin rasterizar.
+
+        Las miniaturas en camino (pendientes o versiones nítidas de un
+        borrador) se renderizaron con la rotación anterior: se descartan y se
+        vuelven a pedir.
+        """
+        self.page_model.rotate_pixmaps(rows, 90 if clockwise else -90)
+        self.generation += 1
+        self._schedule_visible_update()
+
+    def set_zoom(self, icon_height, scale):
+        """Cambia el tamaño de las miniaturas y la escala de render nítida.
+
+        Solo las filas visibles se vuelven a renderizar; el resto se mejora al
+        hacerse visible.
+        """
+        icon_width = round(icon_height * 140 / 180)
+        self.setIconSize(QSize(icon_width, icon_height))
+        self.setGridSize(QSize(icon_width + 20, icon_height + 90))
+        self.delegate.cell_size = QSize(icon_width + 10, icon_height + 80)
+        self.thumbnail_scale = scale
+        self._schedule_visible_update()
+
+    def set_pixmap_budget(self, budget_bytes):
+        self.pixmap_budget = budget_bytes
+        self._enforce_pixmap_budget()
+
+    def pixmap_bytes(self):
+        return self.page_model.pixmap_bytes
+
+    def _enforce_pixmap_budget(self):
+        """Descarta los pixmaps más lejanos a la vista hasta bajar al 80% del presupuesto.
+
+        La pantalla visible y sus vecinas (las que se piden por adelantado)
+        nunca se descartan, aunque superen el presupuesto por sí solas.
+        """
+        if self.pixmap_budget is None or self.page_model.pixmap_bytes <= self.pixmap_budget:
+            return
+        visible = self._visible_row_range()
+        if visible is None:
+            return
+        first, last = visible
+        margin = last - first + 1
+        keep_first, keep_last = first - margin, last + margin
+
+        # Solo se miran las filas con pixmap, no todo el documento
+        candidates = sorted(((min(abs(row - first), abs(row - last)), row)
+                             for row in self.page_model.pixmap_rows()
+                             if row < keep_first or row > keep_last), reverse=True)
+
+        target = self.pixmap_budget * 0.8
+        for _, row in candidates:
+            if self.page_model.pixmap_bytes <= target:
+                break
+            self.page_model.set_pixmap(row, None)
+
+    # --- Drag & Drop ---
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls() or event.source() == self:
@@ -86,72 +793,36 @@ class DraggableListWidget(QListWidget):
                 self.filesDropped.emit(file_paths)
 
         elif event.source() == self:
+            # CopyAction: así Qt no intenta borrar las filas de origen al terminar
             event.setDropAction(Qt.CopyAction)
             event.accept()
-            
-            selected_items = self.selectedItems()
-            if not selected_items: return
+
+            moving_rows = self.selected_rows()
+            if not moving_rows: return
 
             cursor_pos = event.pos()
-            item_under_mouse = self.itemAt(cursor_pos)
-            
+            index_under_mouse = self.indexAt(cursor_pos)
+
             target_index = -1
-            if item_under_mouse:
-                target_index = self.row(item_under_mouse)
-                rect = self.visualItemRect(item_under_mouse)
+            if index_under_mouse.isValid():
+                target_index = index_under_mouse.row()
+                rect = self.visualRect(index_under_mouse)
                 if cursor_pos.x() > rect.x() + (rect.width() / 2):
                     target_index += 1
             else:
-                if self.count() > 0 and cursor_pos.y() > self.visualItemRect(self.item(self.count()-1)).y():
+                if self.count() > 0 and cursor_pos.y() > self._row_rect(self.count() - 1).y():
                     target_index = self.count()
                 else:
                     target_index = 0
 
-            current_state = []
-            moved_indices = []
-            for i in range(self.count()):
-                item = self.item(i)
-                data = {
-                    'img': item.data(ROLE_IMAGE_DATA),
-                    'idx': item.data(ROLE_ORIGINAL_INDEX),
-                    'label': item.text(), 
-                    'selected': item.isSelected()
-                }
-                current_state.append(data)
-                if item.isSelected():
-                    moved_indices.append(i)
-            
-            QTimer.singleShot(0, lambda: self._perform_reorder(current_state, moved_indices, target_index))
+            QTimer.singleShot(0, lambda: self._perform_reorder(moving_rows, target_index))
 
         else:
             super().dropEvent(event)
 
-    def _perform_reorder(self, all_data, moving_indices, target_index):
-        items_moving = [all_data[i] for i in moving_indices]
-        items_staying = [all_data[i] for i in range(len(all_data)) if i not in moving_indices]
-        
-        adjustment = sum(1 for x in moving_indices if x < target_index)
-        insert_pos = max(0, target_index - adjustment)
-        
-        for item_data in reversed(items_moving):
-            items_staying.insert(insert_pos, item_data)
-            
-        self.clear()
-        
-        for data in items_staying:
-            self.add_pdf_page(data['img'], data['label'], data['idx'])
-            
-            if data['selected']:
-                new_item = self.item(self.count() - 1)
-                new_item.setSelected(True)
-        
+    def _perform_reorder(self, moving_rows, target_index):
+        insert_pos = self.move_pages(moving_rows, target_index)
+        self.pagesMoved.emit(sorted(set(moving_rows)), target_index, insert_pos)
+        # La selección sigue a las filas movidas (índices persistentes)
         if insert_pos < self.count():
-            self.scrollToItem(self.item(insert_pos))
-
-    def update_item_image_data(self, item_row, new_img_bytes):
-        item = self.item(item_row)
-        if not item: return
-        pixmap = QPixmap()
-        pixmap.loadFromData(new_img_bytes)
-        item.setIcon(QIcon(pixmap))
-        item.setData(ROLE_IMAGE_DATA, new_img_bytes)
\ No newline at end of file
+            self.scrollTo(self.page_model.index(insert_pos))
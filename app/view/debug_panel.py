@@ -0,0 +1,65 @@
+from PyQt5.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import Qt
+
+_COLUMNS = ["Métrica", "Cantidad", "Media (ms)", "Máx (ms)", "Último (ms)"]
+
+
+class DebugPanel(QDockWidget):
+    """Panel de rendimiento (oculto por defecto, se abre con Ctrl+Shift+D).
+
+    Muestra las duraciones y los medidores del registro de métricas y
+    permite exportar la traza o reiniciar las mediciones.
+    """
+
+    def __init__(self, controller, parent=None):
+        super().__init__("Rendimiento", parent)
+        self.setObjectName("debugPanel")
+        self.setAllowedAreas(Qt.BottomDockWidgetArea | Qt.RightDockWidgetArea)
+
+        content = QWidget()
+        layout = QVBoxLayout(content)
+
+        self.table = QTableWidget(0, len(_COLUMNS))
+        self.table.setHorizontalHeaderLabels(_COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        btn_export = QPushButton("Exportar traza...")
+        btn_export.clicked.connect(controller.handle_export_trace)
+        btn_reset = QPushButton("Reiniciar")
+        btn_reset.clicked.connect(controller.handle_reset_metrics)
+        buttons.addStretch()
+        buttons.addWidget(btn_export)
+        buttons.addWidget(btn_reset)
+        layout.addLayout(buttons)
+
+        self.setWidget(content)
+
+    def show_snapshot(self, snapshot):
+        """Vuelca una copia del registro (ver MetricsRegistry.snapshot) en la tabla."""
+        rows = []
+        for name, stats in sorted(snapshot["timings"].items()):
+            mean_ms = stats["total_s"] / stats["count"] * 1000 if stats["count"] else 0
+            rows.append((name, str(stats["count"]), f"{mean_ms:.2f}",
+                         f"{stats['max_s'] * 1000:.2f}", f"{stats['last_s'] * 1000:.2f}"))
+        for name, stats in sorted(snapshot["gauges"].items()):
+            rows.append((name, "", "", f"máx {_format_value(stats['max'])}", _format_value(stats["value"])))
+
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+
+def _format_value(value):
+    """Los medidores de memoria se muestran en MB."""
+    if isinstance(value, int) and value >= 1024 * 1024:
+        return f"{value / (1024 * 1024):.0f} MB"
+    return str(value)
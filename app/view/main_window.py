@@ -1,13 +1,42 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QLabel, QFileDialog, QMessageBox, QComboBox)
+                             QPushButton, QLabel, QFileDialog, QMessageBox, QComboBox,
+                             QProgressDialog, QInputDialog, QSlider, QLineEdit)
+from PyQt5.QtWidgets import QShortcut
 from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QKeySequence
 from .styles import DARK_THEME
 from .custom_widgets import DraggableListWidget
+from .debug_panel import DebugPanel
+from .split_dialog import SplitDialog
+from app.model.project import PROJECT_EXTENSION
+
+PROJECT_FILTER = f"Proyecto PDF Master (*{PROJECT_EXTENSION})"
+
+# Texto mostrado para cada etapa del guardado
+SAVE_STAGE_LABELS = {
+    'pages': "Ensamblando páginas...",
+    'images': "Recomprimiendo imágenes...",
+    'write': "Escribiendo archivo...",
+    'files': "Escribiendo archivos...",
+    'analysis': "Analizando páginas...",
+}
+
+# Nombre de cada calidad y de cada tipo de página del análisis de compresión
+QUALITY_LABELS = {'high': "Alta", 'standard': "Standard", 'low': "Baja", 'auto': "Adaptativa"}
+PAGE_KIND_LABELS = {
+    'vector': "de texto o vectoriales",
+    'scan_gray': "escaneadas en grises",
+    'scan_color': "escaneadas en color",
+    'photo': "con fotos",
+    'compressed': "con imágenes ya comprimidas",
+    'small': "con imágenes pequeñas",
+}
 
 class MainWindow(QMainWindow):
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
+        self.save_progress = None
         self.setWindowTitle("PDF Master - Combinar y Editar")
         self.resize(1000, 700)
         self.setStyleSheet(DARK_THEME)
@@ -19,18 +48,82 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(main_widget)
         main_layout = QVBoxLayout(main_widget)
 
+        # --- Menú de Proyecto ---
+        project_menu = self.menuBar().addMenu("Proyecto")
+        action_open_project = project_menu.addAction("Abrir proyecto...")
+        action_open_project.setShortcut(QKeySequence.Open)
+        action_open_project.triggered.connect(self.controller.handle_open_project)
+        action_save_project = project_menu.addAction("Guardar proyecto...")
+        action_save_project.setShortcut(QKeySequence.Save)
+        action_save_project.triggered.connect(self.controller.handle_save_project)
+        project_menu.addSeparator()
+        action_restore = project_menu.addAction("Restaurar última sesión")
+        action_restore.triggered.connect(self.controller.handle_restore_session)
+
+        # --- Menú de Edición ---
+        edit_menu = self.menuBar().addMenu("Editar")
+        self.action_undo = edit_menu.addAction("Deshacer")
+        self.action_undo.setShortcut(QKeySequence.Undo)
+        self.action_undo.triggered.connect(self.controller.handle_undo)
+        self.action_redo = edit_menu.addAction("Rehacer")
+        self.action_redo.setShortcut(QKeySequence.Redo)
+        self.action_redo.triggered.connect(self.controller.handle_redo)
+        self.set_history_actions(None, None)
+
+        # --- Menú de Opciones ---
+        options_menu = self.menuBar().addMenu("Opciones")
+        action_cache_dir = options_menu.addAction("Carpeta de caché de miniaturas...")
+        action_cache_dir.triggered.connect(self.controller.handle_choose_cache_dir)
+        action_clear_cache = options_menu.addAction("Vaciar caché de miniaturas")
+        action_clear_cache.triggered.connect(self.controller.handle_clear_cache)
+        options_menu.addSeparator()
+        action_memory = options_menu.addAction("Presupuesto de memoria...")
+        action_memory.triggered.connect(self.controller.handle_memory_budget)
+
+        # --- Menú de Herramientas ---
+        tools_menu = self.menuBar().addMenu("Herramientas")
+        action_duplicates = tools_menu.addAction("Buscar páginas duplicadas...")
+        action_duplicates.triggered.connect(self.controller.handle_find_duplicates)
+        action_split = tools_menu.addAction("Dividir / extraer en varios PDFs...")
+        action_split.triggered.connect(self.controller.handle_split)
+        action_analyze = tools_menu.addAction("Analizar compresión...")
+        action_analyze.triggered.connect(self.controller.handle_analyze_compression)
+
         # --- Header ---
         header_layout = QHBoxLayout()
         title = QLabel("Editor de PDF")
         title.setStyleSheet("font-size: 24px; font-weight: bold; color: #ffffff;")
         header_layout.addWidget(title)
         header_layout.addStretch()
+
+        # Búsqueda en el texto de las páginas: resalta las que coinciden, Enter salta a la siguiente
+        self.edit_search = QLineEdit()
+        self.edit_search.setPlaceholderText("Buscar texto (Ctrl+F)")
+        self.edit_search.setClearButtonEnabled(True)
+        self.edit_search.setFixedWidth(240)
+        self.edit_search.textChanged.connect(self.controller.handle_search)
+        self.edit_search.returnPressed.connect(self.controller.handle_search_next)
+        header_layout.addWidget(self.edit_search)
+        self.label_search = QLabel()
+        header_layout.addWidget(self.label_search)
+        header_layout.addSpacing(20)
+
+        # Zoom: alto de las miniaturas en píxeles
+        header_layout.addWidget(QLabel("Zoom"))
+        self.slider_zoom = QSlider(Qt.Horizontal)
+        self.slider_zoom.setRange(80, 480)
+        self.slider_zoom.setSingleStep(20)
+        self.slider_zoom.setPageStep(60)
+        self.slider_zoom.setFixedWidth(160)
+        header_layout.addWidget(self.slider_zoom)
         main_layout.addLayout(header_layout)
 
         # --- Área Principal ---
         self.pages_list = DraggableListWidget()
         self.pages_list.filesDropped.connect(self.controller.handle_dropped_files)
+        self.pages_list.pagesMoved.connect(self.controller.on_pages_moved)
         main_layout.addWidget(self.pages_list)
+        self.slider_zoom.valueChanged.connect(self.controller.handle_zoom)
 
         # --- Barra de Herramientas ---
         toolbar_layout = QHBoxLayout()
@@ -53,7 +146,8 @@ class MainWindow(QMainWindow):
         self.combo_quality.addItems([
             "Calidad: Standard (Balanceado)",
             "Calidad: Alta (Original)",
-            "Calidad: Baja (Archivo Pequeño)"
+            "Calidad: Baja (Archivo Pequeño)",
+            "Calidad: Adaptativa (Según contenido)"
         ])
         
         # MODIFICACIÓN: Estilo explícito para la lista desplegable
@@ -92,6 +186,10 @@ class MainWindow(QMainWindow):
         
         self.btn_save = QPushButton("💾 Guardar Nuevo PDF")
         self.btn_save.clicked.connect(self.controller.handle_save_pdf)
+
+        self.btn_save_in_place = QPushButton("📝 Guardar en Original")
+        self.btn_save_in_place.setToolTip("Añade rotaciones y borrados al final del PDF original (guardado incremental)")
+        self.btn_save_in_place.clicked.connect(self.controller.handle_save_in_place)
         
         self.btn_clear = QPushButton("🔄 Limpiar Todo")
         self.btn_clear.clicked.connect(self.controller.handle_clear)
@@ -105,6 +203,7 @@ class MainWindow(QMainWindow):
         
         toolbar_layout.addWidget(self.combo_quality)
         toolbar_layout.addWidget(self.btn_save)
+        toolbar_layout.addWidget(self.btn_save_in_place)
         toolbar_layout.addWidget(self.btn_clear)
         
         main_layout.addLayout(toolbar_layout)
@@ -116,6 +215,22 @@ class MainWindow(QMainWindow):
         self.lbl_copyright.setStyleSheet("font-size: 11px; color: #808080; margin-bottom: 5px;")
         main_layout.addWidget(self.lbl_copyright)
 
+        # Uso de memoria en la barra de estado
+        self.lbl_memory = QLabel()
+        self.lbl_memory.setStyleSheet("font-size: 11px; color: #808080;")
+        self.statusBar().addPermanentWidget(self.lbl_memory)
+
+        # Panel de rendimiento oculto (Ctrl+Shift+D)
+        self.debug_panel = DebugPanel(self.controller, self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.debug_panel)
+        self.debug_panel.hide()
+        shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        shortcut.activated.connect(self.toggle_debug_panel)
+        shortcut_find = QShortcut(QKeySequence.Find, self)
+        shortcut_find.activated.connect(self.focus_search)
+        shortcut_next = QShortcut(QKeySequence.FindNext, self)
+        shortcut_next.activated.connect(self.controller.handle_search_next)
+
     # --- Diálogos y Helpers ---
     def show_file_dialog(self):
         files, _ = QFileDialog.getOpenFileNames(self, "Seleccionar PDFs", "", "PDF Files (*.pdf)")
@@ -125,11 +240,25 @@ class MainWindow(QMainWindow):
         path, _ = QFileDialog.getSaveFileName(self, "Guardar PDF", "nuevo_documento.pdf", "PDF Files (*.pdf)")
         return path
 
+    def show_project_open_dialog(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Abrir proyecto", "", PROJECT_FILTER)
+        return path
+
+    def show_project_save_dialog(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Guardar proyecto", "proyecto" + PROJECT_EXTENSION, PROJECT_FILTER)
+        if path and not path.endswith(PROJECT_EXTENSION):
+            path += PROJECT_EXTENSION
+        return path
+
+    def show_directory_dialog(self, title, current=""):
+        return QFileDialog.getExistingDirectory(self, title, current)
+
     def get_selected_quality_code(self):
         """Traduce la selección del usuario a un código interno."""
         index = self.combo_quality.currentIndex()
         if index == 1: return 'high'
         if index == 2: return 'low'
+        if index == 3: return 'auto'
         return 'standard'
 
     def show_message(self, title, text, type="info"):
@@ -138,21 +267,117 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.information(self, title, text)
             
-    def update_pages_view(self, pages_data):
-        self.pages_list.clear()
-        for idx, (img_bytes, label) in enumerate(pages_data):
-            self.pages_list.add_pdf_page(img_bytes, label, idx)
-            
+    def ask_integer(self, title, label, value, minimum, maximum):
+        """Pide un número entero; devuelve None si el usuario cancela."""
+        number, ok = QInputDialog.getInt(self, title, label, value, minimum, maximum)
+        return number if ok else None
+
+    def ask_split_options(self, has_selection):
+        """Pide cómo dividir; devuelve las opciones (ver SplitDialog.options) o None si se cancela."""
+        dialog = SplitDialog(has_selection, self)
+        if dialog.exec_() != SplitDialog.Accepted:
+            return None
+        return dialog.options()
+
+    def show_compression_report(self, report, selected, ask=False):
+        """Muestra el análisis de compresión (ver CompressionAnalysis.report).
+
+        Con `ask`, pregunta si se guarda con la calidad `selected` y devuelve la respuesta.
+        """
+        mb = 1024 * 1024
+        lines = [f"{report['pages']} páginas:"]
+        for kind, label in PAGE_KIND_LABELS.items():
+            if report['page_kinds'].get(kind):
+                lines.append(f"    {report['page_kinds'][kind]} {label}")
+        kept = report['image_kinds'].get('compressed', 0) + report['image_kinds'].get('small', 0)
+        if report['images']:
+            lines.append(f"\n{report['images']} imágenes; la calidad adaptativa deja {kept} como están "
+                         "(ya comprimidas o pequeñas).")
+        lines.append("\nEstimación del archivo guardado:")
+        for quality, (size, seconds) in report['estimates'].items():
+            marker = "  ◀" if quality == selected else ""
+            lines.append(f"    {QUALITY_LABELS[quality]}: {size / mb:.1f} MB, ~{max(1, round(seconds))} s{marker}")
+        text = "\n".join(lines)
+        if not ask:
+            self.show_message("Análisis de compresión", text)
+            return False
+        return self.ask_confirmation("Análisis de compresión",
+                                     f"{text}\n\n¿Guardar con calidad {QUALITY_LABELS[selected]}?")
+
+    def show_search_result(self, text):
+        self.label_search.setText(text)
+
+    def focus_search(self):
+        self.edit_search.setFocus()
+        self.edit_search.selectAll()
+
+    def show_status(self, text):
+        """Mensaje de la barra de estado (vacío para borrarlo)."""
+        if text:
+            self.statusBar().showMessage(text)
+        else:
+            self.statusBar().clearMessage()
+
+    def show_memory_usage(self, thumbnail_bytes, open_sources, process_bytes, budget_bytes):
+        mb = 1024 * 1024
+        text = (f"Miniaturas: {thumbnail_bytes // mb} MB · PDFs abiertos: {open_sources}"
+                f" · Presupuesto: {budget_bytes // mb} MB")
+        if process_bytes is not None:
+            text += f" · Proceso: {process_bytes // mb} MB"
+        self.lbl_memory.setText(text)
+
+    def toggle_debug_panel(self):
+        self.debug_panel.setVisible(not self.debug_panel.isVisible())
+        if self.debug_panel.isVisible():
+            self.controller.update_debug_panel()
+
+    def show_trace_dialog(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Exportar traza", "traza_pdfmaster.json",
+                                              "Traza de Chrome (*.json)")
+        return path
+
+    def ask_confirmation(self, title, text):
+        answer = QMessageBox.question(self, title, text, QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        return answer == QMessageBox.Yes
+
+    def show_save_progress(self, on_cancel, title="Guardando PDF"):
+        """Diálogo modal con el avance del guardado y botón para cancelarlo."""
+        self.save_progress = QProgressDialog("Preparando guardado...", "Cancelar", 0, 0, self)
+        self.save_progress.setWindowTitle(title)
+        self.save_progress.setWindowModality(Qt.WindowModal)
+        self.save_progress.setMinimumDuration(0)
+        self.save_progress.setAutoClose(False)
+        self.save_progress.setAutoReset(False)
+        self.save_progress.canceled.connect(on_cancel)
+        self.save_progress.show()
+
+    def update_save_progress(self, stage, done, total):
+        if self.save_progress is None or self.save_progress.wasCanceled():
+            return
+        text = SAVE_STAGE_LABELS.get(stage, stage)
+        if total:
+            text += f" {done}/{total}"
+        self.save_progress.setLabelText(text)
+        # total 0: barra indeterminada
+        self.save_progress.setMaximum(total)
+        self.save_progress.setValue(done)
+
+    def close_save_progress(self):
+        if self.save_progress is not None:
+            self.save_progress.close()
+            self.save_progress.deleteLater()
+            self.save_progress = None
+
+    def set_history_actions(self, undo_label, redo_label):
+        """Habilita Deshacer/Rehacer y nombra la operación de cada uno (None = nada que hacer)."""
+        self.action_undo.setEnabled(undo_label is not None)
+        self.action_undo.setText(f"Deshacer {undo_label}" if undo_label else "Deshacer")
+        self.action_redo.setEnabled(redo_label is not None)
+        self.action_redo.setText(f"Rehacer {redo_label}" if redo_label else "Rehacer")
+
+    def closeEvent(self, event):
+        self.controller.shutdown()
+        super().closeEvent(event)
+
     def get_current_order(self):
-        count = self.pages_list.count()
-        order = []
-        for i in range(count):
-            item = self.pages_list.item(i)
-            original_index = item.data(Qt.UserRole + 1)
-            order.append(original_index)
-        return order
-        
-    def get_selected_indices(self):
-        rows = [self.pages_list.row(item) for item in self.pages_list.selectedItems()]
-        rows.sort(reverse=True)
-        return rows
\ No newline at end of file
+        return self.pages_list.get_current_order()
@@ -0,0 +1,57 @@
+from PyQt5.QtWidgets import (QDialog, QFormLayout, QComboBox, QSpinBox, QLineEdit, QCheckBox,
+                             QDialogButtonBox)
+
+# (código de split.SPLIT_MODES, texto)
+_MODES = [
+    ('pages', "Cada N páginas"),
+    ('bookmarks', "Por marcadores (primer nivel)"),
+    ('source', "Por archivo de origen"),
+]
+
+
+class SplitDialog(QDialog):
+    """Opciones para dividir o extraer páginas en varios PDFs."""
+
+    def __init__(self, has_selection, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Dividir / extraer")
+        layout = QFormLayout(self)
+
+        self.combo_mode = QComboBox()
+        for _, text in _MODES:
+            self.combo_mode.addItem(text)
+        layout.addRow("Dividir:", self.combo_mode)
+
+        self.spin_pages = QSpinBox()
+        self.spin_pages.setRange(1, 100000)
+        layout.addRow("Páginas por archivo:", self.spin_pages)
+
+        self.edit_prefix = QLineEdit("parte")
+        layout.addRow("Nombre de los archivos:", self.edit_prefix)
+
+        # Extraer: solo las páginas seleccionadas, en el orden de la lista
+        self.check_selected = QCheckBox("Solo las páginas seleccionadas")
+        self.check_selected.setChecked(has_selection)
+        self.check_selected.setEnabled(has_selection)
+        layout.addRow(self.check_selected)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+        self.combo_mode.currentIndexChanged.connect(self._update_fields)
+        self._update_fields()
+
+    def _update_fields(self):
+        by_pages = _MODES[self.combo_mode.currentIndex()][0] == 'pages'
+        self.spin_pages.setEnabled(by_pages)
+        self.edit_prefix.setEnabled(by_pages)
+
+    def options(self):
+        return {
+            'mode': _MODES[self.combo_mode.currentIndex()][0],
+            'pages_per_file': self.spin_pages.value(),
+            'prefix': self.edit_prefix.text(),
+            'selected_only': self.check_selected.isChecked(),
+        }
@@ -23,20 +23,39 @@ QMessageBox QPushButton {
     padding: 5px 15px;
 }
 
-QListWidget {
+QMenuBar {
+    background-color: #2b2b2b;
+    color: #ffffff;
+}
+QMenuBar::item:selected, QMenu::item:selected {
+    background-color: #3a7ca5;
+}
+QMenu {
+    background-color: #3c3f41;
+    color: #ffffff;
+    border: 1px solid #555;
+}
+QStatusBar {
+    background-color: #2b2b2b;
+}
+QProgressDialog, QInputDialog {
+    background-color: #3c3f41; /* Fondo oscuro: el texto del tema es claro */
+}
+
+QListView#pagesList {
     background-color: #3c3f41;
     border: 2px dashed #555;
     border-radius: 8px;
     padding: 10px;
 }
-QListWidget::item {
+QListView#pagesList::item {
     background-color: #4b4b4b;
     margin: 5px;
     border-radius: 5px;
     /* Un poco de padding interno para que el texto no toque el borde */
     padding: 5px; 
 }
-QListWidget::item:selected {
+QListView#pagesList::item:selected {
     background-color: #3a7ca5;
     border: 1px solid #6db3df;
 }
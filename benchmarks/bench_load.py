@@ -0,0 +1,134 @@
+"""
+Benchmark de carga: compara el pipeline anterior (doble apertura y fusión en
+el hilo de la UI) con el actual (una sola apertura y fusión en segundo plano).
+
+Uso:
+    python -m benchmarks.bench_load archivo1.pdf archivo2.pdf ...
+    python -m benchmarks.bench_load --pages 2000   # genera un PDF sintético
+
+Se reporta, para cada pipeline:
+  - tiempo total de carga,
+  - tiempo que el hilo de la UI pasa ejecutando trabajo de carga,
+  - la pausa más larga que sufre un "latido" de 1 ms en el hilo principal
+    (refleja también la contención del GIL).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import fitz  # PyMuPDF
+
+from app.model.pdf_manager import PDFModel
+
+
+def make_synthetic_pdf(path, pages):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Página sintética {i + 1}", fontsize=20)
+        page.draw_rect(fitz.Rect(50, 100, 300, 400), color=(1, 0, 0), fill=(0, 0, 1))
+    doc.save(path)
+    doc.close()
+
+
+class LegacyModel:
+    """Estado del modelo anterior: un documento fusionado y el mapa de sus páginas.
+
+    PDFModel ya no tiene `current_doc` ni `page_mapping`; el pipeline
+    anterior los necesita para medirse tal como era.
+    """
+
+    def __init__(self):
+        self.current_doc = fitz.open()
+        self.page_mapping = []
+
+    def get_page_count(self):
+        return len(self.page_mapping)
+
+
+def legacy_load(model, path):
+    """Réplica de PDFModel.load_pdf anterior: reabre y fusiona en una sola llamada."""
+    new_doc = fitz.open(path)
+    model.current_doc.insert_pdf(new_doc)
+    filename = os.path.basename(path)
+    model.page_mapping.extend((filename, i + 1) for i in range(len(new_doc)))
+    new_doc.close()
+
+
+def legacy_pipeline(model, paths, gui_queue):
+    """Hilo de carga anterior: abre el archivo solo para contar páginas."""
+    for path in paths:
+        doc = fitz.open(path)
+        len(doc)
+        doc.close()
+        # La UI vuelve a abrir y fusiona el archivo (on_file_processed)
+        gui_queue.append(lambda path=path: legacy_load(model, path))
+
+
+def current_pipeline(model, paths, gui_queue):
+    """Hilo de carga actual: abre una vez y fusiona fuera de la UI."""
+    for path in paths:
+        doc = fitz.open(path)
+        # El modelo conserva el documento abierto como fuente
+        page_range = model.load_pdf(path, doc=doc)
+        # La UI solo recibe el rango para crear marcadores
+        gui_queue.append(lambda page_range=page_range: list(page_range))
+
+
+def run_pipeline(pipeline, paths, model_class):
+    model = model_class()
+    gui_queue = []
+    worker = threading.Thread(target=pipeline, args=(model, paths, gui_queue))
+
+    blocked = 0.0
+    max_gap = 0.0
+    start = time.perf_counter()
+    worker.start()
+    last = time.perf_counter()
+    # Bucle que imita al event loop de Qt procesando señales encoladas
+    while worker.is_alive() or gui_queue:
+        while gui_queue:
+            callback = gui_queue.pop(0)
+            t0 = time.perf_counter()
+            callback()
+            blocked += time.perf_counter() - t0
+        time.sleep(0.001)
+        now = time.perf_counter()
+        max_gap = max(max_gap, now - last)
+        last = now
+    total = time.perf_counter() - start
+    return total, blocked, max_gap, model.get_page_count()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="PDFs a cargar")
+    parser.add_argument("--pages", type=int, default=2000, help="páginas del PDF sintético")
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por pipeline")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    paths = args.files
+    if not paths:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, "sintetico.pdf")
+        make_synthetic_pdf(path, args.pages)
+        paths = [path]
+
+    print(f"{'pipeline':<10} {'total (s)':>10} {'UI (s)':>10} {'pausa máx (s)':>14} {'páginas':>8}")
+    for name, pipeline, model_class in (("anterior", legacy_pipeline, LegacyModel),
+                                        ("actual", current_pipeline, PDFModel)):
+        results = [run_pipeline(pipeline, paths, model_class) for _ in range(args.repeat)]
+        total, blocked, max_gap, pages = min(results)
+        print(f"{name:<10} {total:>10.3f} {blocked:>10.3f} {max_gap:>14.3f} {pages:>8}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Benchmark de guardado: tiempo de `reorder_and_save` según el número de páginas
+y el orden de salida (identidad, invertido y aleatorio), comparando la copia
+página a página anterior con la copia por tramos actual.
+
+Uso:
+    python -m benchmarks.bench_save
+    python -m benchmarks.bench_save --pages 100 1000 3000 --quality high
+
+Se mide el montaje del documento (insert_pdf) y el guardado completo, y se
+verifica que el contenido de cada página de salida sea el esperado.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from app.model.pdf_manager import PDFModel
+from benchmarks.bench_load import make_synthetic_pdf
+
+
+def legacy_build(model, order):
+    """Réplica del montaje anterior: una llamada a insert_pdf por página."""
+    new_doc = fitz.open()
+    for index in order:
+        source_id, page_number, rotation = model.pages[index]
+        new_doc.insert_pdf(model.sources[source_id]['doc'], from_page=page_number, to_page=page_number)
+        if rotation:
+            page = new_doc[-1]
+            page.set_rotation((page.rotation + rotation) % 360)
+    return new_doc
+
+
+def make_orders(pages, seed=0):
+    shuffled = list(range(pages))
+    random.Random(seed).shuffle(shuffled)
+    return {
+        "identidad": list(range(pages)),
+        "invertido": list(range(pages - 1, -1, -1)),
+        "aleatorio": shuffled,
+    }
+
+
+def check_output(path, model, order):
+    """Comprueba que cada página de salida proviene de la página esperada."""
+    doc = fitz.open(path)
+    assert len(doc) == len(order), "número de páginas incorrecto"
+    for out_index in (0, len(order) // 2, len(order) - 1):
+        expected = model.pages[order[out_index]][1] + 1
+        assert f"Página sintética {expected}" in doc[out_index].get_text(), "página fuera de orden"
+    doc.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 1000, 3000])
+    parser.add_argument("--quality", default="high", choices=["high", "standard", "low", "auto"])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'páginas':>8} {'orden':<10} {'montaje ant. (s)':>17} {'montaje act. (s)':>17} "
+              f"{'guardado act. (s)':>18}")
+        for pages in args.pages:
+            source = os.path.join(tmp_dir, f"fuente_{pages}.pdf")
+            make_synthetic_pdf(source, pages)
+            model = PDFModel()
+            model.load_pdf(source)
+
+            for name, order in make_orders(pages).items():
+                t0 = time.perf_counter()
+                legacy_build(model, order).close()
+                legacy = time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                model.build_document(order).close()
+                current = time.perf_counter() - t0
+
+                output = os.path.join(tmp_dir, "salida.pdf")
+                t0 = time.perf_counter()
+                model.reorder_and_save(order, output, args.quality)
+                save = time.perf_counter() - t0
+                check_output(output, model, order)
+
+                print(f"{pages:>8} {name:<10} {legacy:>17.3f} {current:>17.3f} {save:>18.3f}")
+            model.clear()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Corpus sintético para los benchmarks, generado con PyMuPDF.
+
+Conjuntos:
+  - texto:    páginas con varios párrafos de texto.
+  - imagenes: una imagen grande (tipo escaneo) distinta por página.
+  - miles:    miles de páginas ligeras (texto y un rectángulo).
+  - muchos:   muchos archivos pequeños.
+
+Los archivos se reutilizan si ya existen en la carpeta del corpus, así
+varias ejecuciones miden exactamente los mismos PDFs.
+"""
+import os
+import random
+
+import fitz  # PyMuPDF
+
+from benchmarks.bench_load import make_synthetic_pdf
+
+# nombre -> (número de archivos, páginas por archivo); `quick` usa la segunda tupla
+CORPUS_SIZES = {
+    "texto": ((1, 300), (1, 30)),
+    "imagenes": ((1, 40), (1, 6)),
+    "miles": ((1, 3000), (1, 300)),
+    "muchos": ((200, 3), (20, 3)),
+}
+
+_WORDS = ("documento página archivo sección informe contrato anexo plano revisión "
+          "fecha firma cliente proyecto capítulo tabla figura nota resumen").split()
+
+
+def make_text_pdf(path, pages, seed=0):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Página sintética {i + 1}", fontsize=16)
+        text = "\n\n".join(" ".join(rng.choice(_WORDS) for _ in range(90)) for _ in range(5))
+        page.insert_textbox(fitz.Rect(72, 80, page.rect.width - 72, page.rect.height - 72), text, fontsize=10)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def _scan_like_image(seed, width=1700, height=2200):
+    """Imagen suave y distinta por semilla (ruido ampliado), codificada en JPEG."""
+    rng = random.Random(seed)
+    small = fitz.Pixmap(fitz.csRGB, 48, 62, bytes(rng.randrange(256) for _ in range(48 * 62 * 3)), False)
+    return fitz.Pixmap(small, width, height, None).tobytes("jpeg", jpg_quality=90)
+
+
+def make_image_pdf(path, pages, seed=0):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_image(page.rect, stream=_scan_like_image(seed * 100000 + i))
+        page.insert_text((72, 60), f"Página sintética {i + 1}", fontsize=16)
+    doc.save(path)
+    doc.close()
+
+
+_MAKERS = {
+    "texto": make_text_pdf,
+    "imagenes": make_image_pdf,
+    "miles": lambda path, pages, seed=0: make_synthetic_pdf(path, pages),
+    "muchos": lambda path, pages, seed=0: make_synthetic_pdf(path, pages),
+}
+
+
+def build_corpus(directory, quick=False, names=None):
+    """Genera (o reutiliza) los conjuntos pedidos. Devuelve {nombre: [rutas]}."""
+    corpus = {}
+    for name in names or CORPUS_SIZES:
+        files, pages = CORPUS_SIZES[name][1 if quick else 0]
+        folder = os.path.join(directory, f"{name}-{files}x{pages}")
+        os.makedirs(folder, exist_ok=True)
+        paths = []
+        for i in range(files):
+            path = os.path.join(folder, f"{name}_{i:04d}.pdf")
+            if not os.path.exists(path):
+                tmp_path = path + ".tmp"
+                _MAKERS[name](tmp_path, pages, seed=i)
+                os.replace(tmp_path, path)
+            paths.append(path)
+        corpus[name] = paths
+    return corpus
@@ -0,0 +1,272 @@
+"""
+Suite de rendimiento: mide las operaciones principales sobre el corpus
+sintético (ver benchmarks/corpus.py) y guarda los resultados en JSON para
+comparar versiones y equipos.
+
+Uso:
+    python -m benchmarks.suite --output resultados.json
+    python -m benchmarks.suite --quick --repeat 1
+    python -m benchmarks.suite --output nueva.json --compare anterior.json
+
+Operaciones medidas en cada conjunto:
+  - render:       miniaturas en este proceso (lo que hace el hilo de miniaturas sin pool).
+  - render_pool:  miniaturas en el pool de procesos.
+  - load_pdf:     registro de todos los archivos en un PDFModel.
+  - prescan:      pre-escaneo (páginas y cifrado) de todos los archivos en el pool.
+  - delete_page:  borrados sueltos de páginas del medio.
+  - rotate_page:  giros sueltos de páginas.
+  - reorder_and_save[calidad]: guardado en orden inverso en cada calidad.
+  - split_and_save: división en archivos de SPLIT_PAGES páginas (calidad standard),
+                    con tantos procesos como el pool.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from app.model.pdf_manager import PDFModel
+from app.model.prescan import scan_pdfs
+from app.model.render import RenderPool, render_pages
+from benchmarks.corpus import CORPUS_SIZES, build_corpus
+
+QUALITIES = ("high", "standard", "low", "auto")
+
+# Límites para que cada medición dure segundos y no minutos
+MAX_RENDER_PAGES = 200
+EDIT_OPERATIONS = 100
+RENDER_BATCH = 4
+SPLIT_PAGES = 10
+
+
+def _loaded_model(paths, image_workers=None):
+    model = PDFModel(image_workers=image_workers)
+    for path in paths:
+        model.load_pdf(path)
+    return model
+
+
+def _page_sources(paths, limit):
+    sources = []
+    for path in paths:
+        with fitz.open(path) as doc:
+            sources.extend((path, i) for i in range(len(doc)))
+        if len(sources) >= limit:
+            break
+    return sources[:limit]
+
+
+def bench_render(paths):
+    sources = _page_sources(paths, MAX_RENDER_PAGES)
+    start = time.perf_counter()
+    for path, page_number in sources:
+        render_pages(path, [page_number], [0])
+    return time.perf_counter() - start, len(sources)
+
+
+def bench_render_pool(paths, pool):
+    if pool.executor is None:
+        # Sin procesos (--workers 0) el pool renderiza en el propio hilo
+        return bench_render(paths)
+    sources = _page_sources(paths, MAX_RENDER_PAGES)
+    batches = []
+    for path, page_number in sources:
+        if batches and batches[-1][0] == path and len(batches[-1][1]) < RENDER_BATCH:
+            batches[-1][1].append(page_number)
+        else:
+            batches.append((path, [page_number]))
+    start = time.perf_counter()
+    futures = [pool.submit(path, numbers, [0] * len(numbers)) for path, numbers in batches]
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start, len(sources)
+
+
+def bench_load(paths):
+    start = time.perf_counter()
+    model = _loaded_model(paths)
+    elapsed = time.perf_counter() - start
+    pages = model.get_page_count()
+    model.clear()
+    return elapsed, pages
+
+
+def bench_prescan(paths, pool):
+    start = time.perf_counter()
+    infos = scan_pdfs(paths, pool.executor)
+    return time.perf_counter() - start, len(infos)
+
+
+def bench_delete(paths):
+    model = _loaded_model(paths)
+    count = min(EDIT_OPERATIONS, model.get_page_count() - 1)
+    start = time.perf_counter()
+    for _ in range(count):
+        model.delete_page(model.get_page_count() // 2)
+    elapsed = time.perf_counter() - start
+    model.clear()
+    return elapsed, count
+
+
+def bench_rotate(paths):
+    model = _loaded_model(paths)
+    total = model.get_page_count()
+    count = min(EDIT_OPERATIONS, total)
+    start = time.perf_counter()
+    for i in range(count):
+        model.rotate_page(i * total // count, clockwise=True)
+    elapsed = time.perf_counter() - start
+    model.clear()
+    return elapsed, count
+
+
+def bench_save(paths, quality, tmp_dir):
+    model = _loaded_model(paths)
+    order = list(range(model.get_page_count() - 1, -1, -1))
+    output = os.path.join(tmp_dir, "salida.pdf")
+    start = time.perf_counter()
+    model.reorder_and_save(order, output, quality)
+    elapsed = time.perf_counter() - start
+    model.clear()
+    return elapsed, len(order)
+
+
+def bench_split(paths, tmp_dir, workers):
+    model = _loaded_model(paths, image_workers=workers)
+    groups = model.split_order(list(range(model.get_page_count())), 'pages', SPLIT_PAGES)
+    directory = tempfile.mkdtemp(prefix="division-", dir=tmp_dir)
+    start = time.perf_counter()
+    model.split_and_save(groups, directory, 'standard')
+    elapsed = time.perf_counter() - start
+    model.clear()
+    return elapsed, len(groups)
+
+
+def measure(function, repeat):
+    """Ejecuta `function` `repeat` veces; devuelve (tiempos, unidades procesadas)."""
+    times = []
+    units = 0
+    for _ in range(repeat):
+        elapsed, units = function()
+        times.append(elapsed)
+    return times, units
+
+
+def run_suite(corpus, repeat, tmp_dir, pool):
+    results = []
+    for name, paths in corpus.items():
+        operations = [
+            ("render", None, lambda: bench_render(paths)),
+            ("render_pool", None, lambda: bench_render_pool(paths, pool)),
+            ("load_pdf", None, lambda: bench_load(paths)),
+            ("prescan", None, lambda: bench_prescan(paths, pool)),
+            ("delete_page", None, lambda: bench_delete(paths)),
+            ("rotate_page", None, lambda: bench_rotate(paths)),
+        ]
+        for quality in QUALITIES:
+            operations.append(("reorder_and_save", quality, lambda q=quality: bench_save(paths, q, tmp_dir)))
+        operations.append(("split_and_save", None, lambda: bench_split(paths, tmp_dir, pool.workers)))
+
+        for operation, quality, function in operations:
+            times, units = measure(function, repeat)
+            median = statistics.median(times)
+            result = {
+                "corpus": name,
+                "operation": operation,
+                "quality": quality,
+                "units": units,
+                "median_s": round(median, 6),
+                "min_s": round(min(times), 6),
+                "runs_s": [round(t, 6) for t in times],
+                "units_per_s": round(units / median, 2) if median else None,
+            }
+            results.append(result)
+            label = f"{operation}[{quality}]" if quality else operation
+            print(f"{name:<9} {label:<28} {median:>9.3f} s  {units:>6} u  {result['units_per_s'] or 0:>10.1f} u/s")
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _result_key(result):
+    return result["corpus"], result["operation"], result["quality"]
+
+
+def compare(results, baseline_path):
+    """Muestra la relación de tiempos (actual / anterior) de cada medición común."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {_result_key(r): r for r in json.load(f)["results"]}
+    print(f"\nComparación con {baseline_path} (>1 = más lento)")
+    for result in results:
+        previous = baseline.get(_result_key(result))
+        if not previous or not previous["median_s"]:
+            continue
+        ratio = result["median_s"] / previous["median_s"]
+        label = f"{result['operation']}[{result['quality']}]" if result["quality"] else result["operation"]
+        print(f"{result['corpus']:<9} {label:<28} {previous['median_s']:>9.3f} -> {result['median_s']:>9.3f} s  x{ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="archivo JSON de resultados")
+    parser.add_argument("--compare", metavar="JSON", help="resultados anteriores con los que comparar")
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones de cada medición (se usa la mediana)")
+    parser.add_argument("--quick", action="store_true", help="corpus reducido (prueba rápida)")
+    parser.add_argument("--corpus", nargs="+", choices=list(CORPUS_SIZES), help="conjuntos a medir")
+    parser.add_argument("--corpus-dir", help="carpeta donde generar/reutilizar el corpus")
+    parser.add_argument("--workers", type=int, default=None, help="procesos del pool de render")
+    args = parser.parse_args(argv)
+
+    corpus_dir = args.corpus_dir or os.path.join(tempfile.gettempdir(), "pdfmaster-bench-corpus")
+    print(f"Generando corpus en {corpus_dir}...")
+    corpus = build_corpus(corpus_dir, quick=args.quick, names=args.corpus)
+
+    pool = RenderPool(args.workers)
+    pool.warm_up()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results = run_suite(corpus, max(1, args.repeat), tmp_dir, pool)
+    finally:
+        pool.shutdown()
+
+    report = {
+        "environment": environment(),
+        "settings": {"repeat": args.repeat, "quick": args.quick, "workers": pool.workers},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
 import sys
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from app.model.pdf_manager import PDFModel
 from app.view.main_window import MainWindow
 from app.controller.main_controller import MainController
+from app.model.project import PROJECT_EXTENSION
 
 def main():
     app = QApplication(sys.argv)
@@ -20,7 +22,15 @@ def main():
     controller.set_view(view)
 
     view.show()
+
+    # Proyecto pasado como argumento (p. ej. al abrirlo desde el explorador de archivos)
+    projects = [arg for arg in sys.argv[1:] if arg.endswith(PROJECT_EXTENSION)]
+    if projects:
+        controller.open_project(projects[0])
+
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos de miniaturas en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
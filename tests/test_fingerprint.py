@@ -0,0 +1,35 @@
+import fitz  # PyMuPDF
+
+from app.model.fingerprint import find_duplicates, page_digests, page_signatures
+
+
+def _form_pages_pdf(path):
+    """PDF cuyas páginas dibujan su texto a través de un formulario (show_pdf_page).
+
+    Las páginas 1 a 3 tienen textos distintos; la 4 repite la 1.
+    """
+    source = fitz.open()
+    for number in range(3):
+        source.new_page().insert_text((72, 72), f"Página sintética {number + 1}", fontsize=20)
+    doc = fitz.open()
+    for number in (0, 1, 2, 0):
+        doc.new_page().show_pdf_page(fitz.Rect(0, 0, 595, 842), source, number)
+    doc.save(path)
+
+
+def test_form_pages_with_different_text_are_not_identical(tmp_path):
+    path = str(tmp_path / "formularios.pdf")
+    _form_pages_pdf(path)
+    with fitz.open(path) as doc:
+        digests = page_digests(doc)
+    signatures = page_signatures(path, list(range(len(digests))))
+
+    assert len(set(digests[:3])) == 3
+    assert digests[3] == digests[0]
+    entries = [(index, digest, signature) for index, (digest, signature) in enumerate(zip(digests, signatures))]
+    assert find_duplicates(entries) == [(3, 0, 'identica')]
+
+
+def test_same_digest_with_different_text_is_not_identical():
+    entries = [(0, "huella", (0x0F0F, "texto 1")), (1, "huella", (0x0F0F, "texto 2"))]
+    assert find_duplicates(entries) == []